@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "256"))
+
+
+class CacheEntry:
+    __slots__ = ("value", "etag", "expires_at")
+
+    def __init__(self, value: Any, ttl: float):
+        self.value = value
+        body = json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.expires_at = time.monotonic() + ttl
+
+
+class TTLCache:
+    # LRU com expiração por TTL; invalidação por prefixo de chave
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL, max_entries: int = REFERENCE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Geração por prefixo invalidado: um load que cruzou uma invalidação não é gravado
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    @staticmethod
+    def _prefixes(key: str):
+        parts = key.split(":")
+        return [":".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    def generation(self, key: str) -> int:
+        # Lido antes do loader e repassado ao set()
+        with self._lock:
+            return sum(self._generations.get(prefix, 0) for prefix in self._prefixes(key))
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None) -> CacheEntry:
+        entry = CacheEntry(value, self.ttl)
+        with self._lock:
+            if generation is not None and \
+                    generation != sum(self._generations.get(prefix, 0) for prefix in self._prefixes(key)):
+                # Houve invalidate() durante o load: serve o valor, mas não guarda
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._entries if k == prefix or k.startswith(prefix + ":")]:
+                del self._entries[key]
+            self._generations[prefix] = self._generations.get(prefix, 0) + 1
+            self.invalidations += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        entry = self.get(key)
+        if entry is None:
+            generation = self.generation(key)
+            entry = self.set(key, loader(), generation)
+        return entry.value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+reference_cache = TTLCache()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_response(request: Request, key: str, loader: Callable[[], Awaitable[Any]]) -> Response:
+    # Serve do cache com ETag; 304 quando o cliente já tem a versão atual
+    entry = reference_cache.get(key)
+    if entry is None:
+        generation = reference_cache.generation(key)
+        entry = reference_cache.set(key, await loader(), generation)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=entry.value, headers=headers)
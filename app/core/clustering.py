@@ -0,0 +1,297 @@
+import heapq
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+CLUSTER_WINDOW_HOURS = float(os.getenv("CLUSTER_WINDOW_HOURS", "24"))
+CLUSTER_MAX_ENTRIES = int(os.getenv("CLUSTER_MAX_ENTRIES", "200000"))
+CLUSTER_BANDS = int(os.getenv("CLUSTER_BANDS", "16"))
+CLUSTER_ROWS = int(os.getenv("CLUSTER_ROWS", "4"))
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", "0.5"))
+CLUSTER_SHINGLE_SIZE = int(os.getenv("CLUSTER_SHINGLE_SIZE", "3"))
+CLUSTER_MIN_TOKENS = int(os.getenv("CLUSTER_MIN_TOKENS", "5"))
+# Limite de vizinhos verificados por mensagem: um bucket muito cheio (texto
+# padrão repetido por um canal) não pode tornar a inserção linear
+CLUSTER_MAX_CANDIDATES = int(os.getenv("CLUSTER_MAX_CANDIDATES", "200"))
+
+MERSENNE_PRIME = (1 << 61) - 1
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def normalize_text(text: Optional[str]) -> List[str]:
+    # Minúsculas, sem acentos, sem links e só palavras
+    if not text:
+        return []
+    text = URL_PATTERN.sub(" ", text.lower())
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return WORD_PATTERN.findall(text)
+
+
+def shingles(tokens: Sequence[str], size: int = CLUSTER_SHINGLE_SIZE) -> Set[int]:
+    if len(tokens) <= size:
+        grams = [" ".join(tokens)]
+    else:
+        grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+class MinHasher:
+    # MinHash com permutações (a*x + b) mod p; a semente fixa mantém as
+    # assinaturas comparáveis entre reinícios
+    def __init__(self, permutations: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                       for _ in range(permutations)]
+
+    def signature(self, features: Iterable[int]) -> Tuple[int, ...]:
+        features = list(features)
+        return tuple(min((a * x + b) % MERSENNE_PRIME for x in features) for a, b in self.params)
+
+
+def similarity(left: Sequence[int], right: Sequence[int]) -> float:
+    # Fração de posições iguais estima a similaridade de Jaccard
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+class ClusterEntry:
+    __slots__ = ("id", "channel_id", "country_id", "timestamp", "text", "signature", "neighbors")
+
+    def __init__(self, row: Dict[str, Any], signature: Tuple[int, ...]):
+        self.id = row["id"]
+        self.channel_id = row["channel_id"]
+        self.country_id = row.get("country_id")
+        self.timestamp = row["timestamp"]
+        self.text = row["text"]
+        self.signature = signature
+        self.neighbors: Set[int] = set()
+
+
+class ClusterComponent:
+    # Componente conexo do grafo de vizinhos, mantido a cada inserção
+    __slots__ = ("members", "first_timestamp", "last_timestamp")
+
+    def __init__(self):
+        self.members: Set[int] = set()
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+
+    def add(self, entry: ClusterEntry):
+        self.members.add(entry.id)
+        if self.first_timestamp is None or entry.timestamp < self.first_timestamp:
+            self.first_timestamp = entry.timestamp
+        if self.last_timestamp is None or entry.timestamp > self.last_timestamp:
+            self.last_timestamp = entry.timestamp
+
+
+class ClusterIndex:
+    # Índice LSH (bandas de MinHash) das mensagens recentes. Cada mensagem nova
+    # consulta só os buckets das suas bandas, então o custo por inserção não
+    # depende do tamanho do índice. Os componentes do grafo de vizinhos são
+    # unidos na inserção (o menor entra no maior) e refeitos só quando uma
+    # mensagem sai da janela, então clusters() percorre os grupos, não o índice.
+    def __init__(self, bands: int = CLUSTER_BANDS, rows: int = CLUSTER_ROWS,
+                 threshold: float = CLUSTER_THRESHOLD, window_hours: float = CLUSTER_WINDOW_HOURS,
+                 max_entries: int = CLUSTER_MAX_ENTRIES):
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        self.window = window_hours * 3600
+        self.max_entries = max_entries
+        self.hasher = MinHasher(bands * rows)
+        self.entries: Dict[int, ClusterEntry] = {}
+        # (timestamp, id): a mensagem mais antiga sai primeiro
+        self._expiry: List[Tuple[str, int]] = []
+        self._buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._components: Set[ClusterComponent] = set()
+        self._component_of: Dict[int, ClusterComponent] = {}
+        self._lock = threading.Lock()
+        # Só uma thread por vez lê mensagens novas do banco
+        self.sync_lock = threading.Lock()
+        self.last_id = 0
+        self.loaded = False
+        self.indexed = 0
+        self.skipped = 0
+        self.comparisons = 0
+        self.evicted = 0
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, int]]:
+        rows = self.rows
+        return [(band, hash(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        # row: id, channel_id, country_id, timestamp, text (ids crescentes)
+        tokens = normalize_text(row.get("text"))
+        with self._lock:
+            self.last_id = max(self.last_id, row["id"])
+            if len(tokens) < CLUSTER_MIN_TOKENS or row["id"] in self.entries:
+                self.skipped += 1
+                return False
+        signature = self.hasher.signature(shingles(tokens))
+        entry = ClusterEntry(row, signature)
+
+        with self._lock:
+            keys = self._band_keys(signature)
+            candidates: Set[int] = set()
+            for key in keys:
+                candidates.update(self._buckets[key][-CLUSTER_MAX_CANDIDATES:])
+                if len(candidates) >= CLUSTER_MAX_CANDIDATES:
+                    break
+            for candidate_id in candidates:
+                other = self.entries.get(candidate_id)
+                if other is None:
+                    continue
+                self.comparisons += 1
+                if similarity(signature, other.signature) >= self.threshold:
+                    entry.neighbors.add(candidate_id)
+                    other.neighbors.add(entry.id)
+            for key in keys:
+                self._buckets[key].append(entry.id)
+            self.entries[entry.id] = entry
+            heapq.heappush(self._expiry, (entry.timestamp, entry.id))
+            if entry.neighbors:
+                self._join(entry)
+            self.indexed += 1
+            self._evict()
+        return True
+
+    def _join(self, entry: ClusterEntry):
+        # Une a mensagem nova e os componentes dos vizinhos no maior deles
+        ids = [entry.id, *entry.neighbors]
+        components = {self._component_of[i] for i in ids if i in self._component_of}
+        if components:
+            target = max(components, key=lambda component: len(component.members))
+        else:
+            target = ClusterComponent()
+            self._components.add(target)
+        for component in components:
+            if component is target:
+                continue
+            self._components.discard(component)
+            for member in component.members:
+                self._component_of[member] = target
+            target.members |= component.members
+            target.first_timestamp = min(target.first_timestamp, component.first_timestamp)
+            target.last_timestamp = max(target.last_timestamp, component.last_timestamp)
+        for i in ids:
+            if i not in target.members:
+                target.add(self.entries[i])
+                self._component_of[i] = target
+
+    def _connected(self, ids: Set[int]) -> List[List[int]]:
+        # Componentes (com 2+ mensagens) do grafo de vizinhos restrito a ids
+        seen: Set[int] = set()
+        groups = []
+        for start in ids:
+            if start in seen:
+                continue
+            seen.add(start)
+            group, stack = [start], [start]
+            while stack:
+                for neighbor in self.entries[stack.pop()].neighbors:
+                    if neighbor in ids and neighbor not in seen:
+                        seen.add(neighbor)
+                        group.append(neighbor)
+                        stack.append(neighbor)
+            if len(group) > 1:
+                groups.append(group)
+        return groups
+
+    def _evict(self):
+        # Remove pelo timestamp da mensagem: o que saiu da janela ou excede o limite
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.window)).isoformat()
+        affected: Set[ClusterComponent] = set()
+        while self._expiry and (len(self.entries) > self.max_entries or self._expiry[0][0] < cutoff):
+            _, entry_id = heapq.heappop(self._expiry)
+            entry = self.entries.pop(entry_id)
+            for key in self._band_keys(entry.signature):
+                bucket = self._buckets[key]
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+            for neighbor in entry.neighbors:
+                self.entries[neighbor].neighbors.discard(entry_id)
+            component = self._component_of.pop(entry_id, None)
+            if component is not None:
+                component.members.discard(entry_id)
+                affected.add(component)
+            self.evicted += 1
+        # Sem a mensagem o componente pode ter se partido: refaz só ele
+        for component in affected:
+            self._components.discard(component)
+            for member in component.members:
+                del self._component_of[member]
+            for group in self._connected(component.members):
+                rebuilt = ClusterComponent()
+                for member in group:
+                    rebuilt.add(self.entries[member])
+                    self._component_of[member] = rebuilt
+                self._components.add(rebuilt)
+
+    def clusters(self, since: Optional[str] = None, until: Optional[str] = None, country_id: Optional[int] = None,
+                 min_size: int = 2, min_channels: int = 1) -> List[Dict[str, Any]]:
+        groups: List[List[ClusterEntry]] = []
+        with self._lock:
+            self._evict()
+            for component in self._components:
+                if (len(component.members) < min_size
+                        or (since is not None and component.last_timestamp < since)
+                        or (until is not None and component.first_timestamp > until)):
+                    continue
+                if ((since is None or component.first_timestamp >= since)
+                        and (until is None or component.last_timestamp <= until) and country_id is None):
+                    groups.append([self.entries[member] for member in component.members])
+                    continue
+                # Filtro corta o componente: refaz a conectividade só com as mensagens selecionadas
+                selected = {
+                    member for member in component.members
+                    if (since is None or self.entries[member].timestamp >= since)
+                    and (until is None or self.entries[member].timestamp <= until)
+                    and (country_id is None or self.entries[member].country_id == country_id)
+                }
+                if len(selected) >= min_size:
+                    groups += [[self.entries[member] for member in group] for group in self._connected(selected)]
+
+        result = []
+        for members in groups:
+            channels = {entry.channel_id for entry in members}
+            if len(members) < min_size or len(channels) < min_channels:
+                continue
+            members.sort(key=lambda entry: entry.id)
+            result.append({
+                "size": len(members),
+                "channels": len(channels),
+                "first_timestamp": min(entry.timestamp for entry in members),
+                "last_timestamp": max(entry.timestamp for entry in members),
+                "message_ids": [entry.id for entry in members],
+                "channel_ids": sorted(channels),
+                "country_ids": sorted({entry.country_id for entry in members if entry.country_id is not None}),
+                "text": members[0].text,
+            })
+        result.sort(key=lambda cluster: (-cluster["channels"], -cluster["size"], cluster["message_ids"][0]))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "buckets": len(self._buckets),
+                "last_id": self.last_id,
+                "indexed": self.indexed,
+                "skipped": self.skipped,
+                "comparisons": self.comparisons,
+                "evicted": self.evicted,
+                "clusters": len(self._components),
+                "bands": self.bands,
+                "rows": self.rows,
+                "threshold": self.threshold,
+            }
+
+
+cluster_index = ClusterIndex()
@@ -0,0 +1,84 @@
+import asyncio
+import os
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Set
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+# Ids publicados lembrados por tópico, para descartar a segunda publicação
+EVENT_RECENT_IDS = int(os.getenv("EVENT_RECENT_IDS", "4096"))
+
+
+class Subscription:
+    def __init__(self, topic: str, filters: Dict[str, Any], maxsize: int = EVENT_QUEUE_SIZE):
+        self.topic = topic
+        # Apenas filtros informados (valor None = sem filtro)
+        self.filters = {key: value for key, value in filters.items() if value is not None}
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return all(event.get(key) == value for key, value in self.filters.items())
+
+
+class EventBroker:
+    # Pub/sub em processo. publish() roda sempre no event loop (após o await
+    # da escrita no banco), então não há concorrência entre threads aqui.
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._recent: Dict[str, "OrderedDict[int, None]"] = defaultdict(OrderedDict)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str, filters: Dict[str, Any]) -> Subscription:
+        subscription = Subscription(topic, filters)
+        self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions[subscription.topic].discard(subscription)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscriptions[topic])
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> bool:
+        # A mesma linha pode chegar pela rota que a inseriu e pela leitura do
+        # banco (tail_messages): só a primeira publicação vale. Retorna False
+        # para a repetida
+        recent = self._recent[topic]
+        if event["id"] in recent:
+            return False
+        recent[event["id"]] = None
+        if len(recent) > EVENT_RECENT_IDS:
+            recent.popitem(last=False)
+        self.published += 1
+        for subscription in list(self._subscriptions[topic]):
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscription)
+        return True
+
+    def _drop(self, subscription: Subscription):
+        # Consumidor lento: descarta a fila e encerra; o cliente reconecta
+        # com o último id recebido e recupera o restante do banco.
+        subscription.dropped = True
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": {topic: len(subs) for topic, subs in self._subscriptions.items()},
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped,
+        }
+
+
+broker = EventBroker()
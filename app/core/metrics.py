@@ -0,0 +1,118 @@
+import bisect
+import contextvars
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Limites dos buckets de latência, em segundos
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[str, Dict[str, Any]] = {}
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            series["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    @staticmethod
+    def _quantile_ms(buckets: tuple, counts: List[int], total: int, q: float) -> Optional[float]:
+        # Limite superior do bucket que contém o quantil (None = acima do último)
+        target = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return buckets[i] * 1000 if i < len(buckets) else None
+        return None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for key, series in self._series.items():
+                total = series["count"]
+                result[key] = {
+                    "count": total,
+                    "avg_ms": round(series["sum"] * 1000 / total, 3) if total else 0.0,
+                    "p50_le_ms": self._quantile_ms(self.buckets, series["counts"], total, 0.5),
+                    "p99_le_ms": self._quantile_ms(self.buckets, series["counts"], total, 0.99),
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], series["counts"])),
+                }
+            return result
+
+    def prometheus(self, name: str, label: str) -> List[str]:
+        # Formato de exposição de texto do Prometheus (buckets cumulativos)
+        with self._lock:
+            series = {key: (list(value["counts"]), value["sum"], value["count"]) for key, value in self._series.items()}
+        lines = [f"# TYPE {name} histogram"]
+        for key, (counts, total_sum, total) in sorted(series.items()):
+            value = prometheus_label(key)
+            cumulative = 0
+            for bound, count in zip([str(b) for b in self.buckets] + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {total_sum}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {total}')
+        return lines
+
+
+class LabeledCounter:
+    # Contadores por (nome, rótulo), ex.: ("sql_statements", "GET /messages/get")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, str], float] = {}
+
+    def incr(self, name: str, key: str, value: float = 1):
+        with self._lock:
+            self._values[(name, key)] = self._values.get((name, key), 0) + value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result: Dict[str, Dict[str, float]] = {}
+            for (name, key), value in self._values.items():
+                result.setdefault(name, {})[key] = value
+            return result
+
+    def prometheus(self, prefix: str, label: str) -> List[str]:
+        lines = []
+        for name, series in sorted(self.snapshot().items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for key, value in sorted(series.items()):
+                lines.append(f'{prefix}_{name}_total{{{label}="{prometheus_label(key)}"}} {value}')
+        return lines
+
+
+class QueryStats:
+    # SQL executado durante uma requisição; preenchido pelo cursor do pool,
+    # possivelmente a partir de várias threads do executor ao mesmo tempo
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.seconds = 0.0
+
+    def record(self, seconds: float, statements: int = 1):
+        with self._lock:
+            self.statements += statements
+            self.seconds += seconds
+
+
+current_query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def prometheus_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_latency = LatencyHistogram()
+request_db_time = LatencyHistogram()
+request_counters = LabeledCounter()
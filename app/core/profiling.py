@@ -0,0 +1,147 @@
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))          # 0 = desligado
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))  # fração das requisições amostradas
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "profiles/slow_requests.txt")
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "50"))
+# Perfis aguardando gravação; acima disso são descartados em vez de acumular memória
+PROFILE_MAX_PENDING = int(os.getenv("PROFILE_MAX_PENDING", "100"))
+
+# Threads paradas nestes módulos estão ociosas (fila, select, lock) e só poluem o perfil
+IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+logger = logging.getLogger(__name__)
+
+
+def collapse_stack(frame) -> str:
+    # Formato "collapsed" (flamegraph.pl / speedscope): raiz;...;folha
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    # Enquanto houver requisição amostrada em andamento, uma thread lê as pilhas
+    # de todas as threads (loop do asyncio + executor do banco) a cada intervalo.
+    # Requisições concorrentes recebem as mesmas amostras: o perfil mostra o que
+    # o processo fazia durante a requisição lenta, não só ela.
+    def __init__(self, slow_ms: float = PROFILE_SLOW_MS, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 interval: float = PROFILE_INTERVAL, output: str = PROFILE_OUTPUT):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output = output
+        self._lock = threading.Lock()
+        self._active: Dict[int, Counter] = {}
+        self._next_token = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # A gravação em disco fica numa thread própria: finish_request roda no loop do asyncio
+        self._pending: "queue.Queue[str]" = queue.Queue(maxsize=PROFILE_MAX_PENDING)
+        self._writer: Optional[threading.Thread] = None
+        self.dumps = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0
+
+    def should_profile(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def start_request(self) -> int:
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._active[token] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def finish_request(self, token: int, elapsed: float, label: str, details: str = ""):
+        with self._lock:
+            samples = self._active.pop(token, None)
+        if samples and elapsed * 1000 >= self.slow_ms:
+            self._dump(samples, elapsed, label, details)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                    continue
+                stacks.append(collapse_stack(frame))
+            with self._lock:
+                for samples in active:
+                    samples.update(stacks)
+            time.sleep(self.interval)
+
+    def _dump(self, samples: Counter, elapsed: float, label: str, details: str):
+        # Só monta o texto aqui; o arquivo é escrito pela thread de gravação
+        header = (f"# {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {label} {elapsed * 1000:.1f}ms "
+                  f"{details} samples={sum(samples.values())} interval={self.interval}s\n")
+        lines = [f"{stack} {count}\n" for stack, count in samples.most_common(PROFILE_MAX_STACKS)]
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write, name="profile-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._pending.put_nowait(header + "".join(lines) + "\n")
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _write(self):
+        while True:
+            block = self._pending.get()
+            try:
+                folder = os.path.dirname(self.output)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                with open(self.output, "a", encoding="utf-8") as f:
+                    f.write(block)
+                with self._lock:
+                    self.dumps += 1
+            except OSError:
+                logger.exception("Falha ao gravar perfil em %s", self.output)
+            finally:
+                self._pending.task_done()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "slow_ms": self.slow_ms,
+                "sample_rate": self.sample_rate,
+                "interval_s": self.interval,
+                "output": self.output,
+                "active": len(self._active),
+                "dumps": self.dumps,
+                "pending": self._pending.qsize(),
+                "dropped": self.dropped,
+            }
+
+
+profiler = SamplingProfiler()
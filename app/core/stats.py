@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+STATS_RING_MINUTES = int(os.getenv("STATS_RING_MINUTES", "1440"))
+STATS_SYNC_INTERVAL = float(os.getenv("STATS_SYNC_INTERVAL", "5"))
+STATS_RESYNC_MINUTES = int(os.getenv("STATS_RESYNC_MINUTES", "5"))
+STATS_FULL_SYNC_INTERVAL = float(os.getenv("STATS_FULL_SYNC_INTERVAL", "600"))
+
+Key = Tuple[int, ...]
+
+
+def current_minute() -> int:
+    return int(time.time() // 60)
+
+
+def minute_of(timestamp: Optional[str]) -> int:
+    # Mesmo critério do trigger: ISO sem fuso é tratado como UTC
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return current_minute()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() // 60)
+
+
+class RollingCounters:
+    # Anel de N minutos; cada posição guarda {(dimensões): contagem} de um minuto.
+    # Consultas custam O(minutos da janela x chaves por minuto), nunca O(linhas).
+    # A tabela de resumo é a fonte da verdade: os minutos recentes são relidos
+    # periodicamente (pega inserções de outros processos) e tudo é recarregado
+    # de tempos em tempos (pega um rebuild feito pela CLI). Um desvio momentâneo
+    # entre o incremento local e a releitura se corrige na sincronização seguinte.
+    def __init__(self, dimensions: Sequence[str], minutes: int = STATS_RING_MINUTES):
+        self.dimensions = tuple(dimensions)
+        self.size = minutes
+        self._slots: List[Optional[Tuple[int, Dict[Key, int]]]] = [None] * minutes
+        self._lock = threading.Lock()
+        self.loaded_from: Optional[int] = None
+        self.synced_at = 0.0
+        self.full_synced_at = 0.0
+        self.recorded = 0
+
+    def _slot(self, minute: int) -> Dict[Key, int]:
+        index = minute % self.size
+        slot = self._slots[index]
+        if slot is None or slot[0] != minute:
+            slot = (minute, defaultdict(int))
+            self._slots[index] = slot
+        return slot[1]
+
+    def record(self, minute: int, key: Key, count: int = 1):
+        with self._lock:
+            if self.loaded_from is None or minute <= current_minute() - self.size:
+                return
+            self._slot(minute)[key] += count
+            self.recorded += count
+
+    def load(self, rows: Iterable[Tuple[int, ...]], since_minute: int):
+        # Substitui os minutos >= since_minute pelo conteúdo da tabela
+        fresh: Dict[int, Dict[Key, int]] = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            fresh[row[0]][tuple(row[1:-1])] += row[-1]
+        now = time.monotonic()
+        with self._lock:
+            for minute in range(since_minute, current_minute() + 1):
+                self._slots[minute % self.size] = (minute, fresh.get(minute, defaultdict(int)))
+            full = self.loaded_from is None or since_minute <= current_minute() - self.size + 1
+            if full:
+                self.loaded_from = since_minute
+                self.full_synced_at = now
+            self.synced_at = now
+
+    def sync_from(self) -> Optional[int]:
+        # Minuto a partir do qual recarregar, ou None se ainda está fresco
+        now = time.monotonic()
+        oldest = current_minute() - self.size + 1
+        if self.loaded_from is None or now - self.full_synced_at >= STATS_FULL_SYNC_INTERVAL:
+            return oldest
+        if now - self.synced_at >= STATS_SYNC_INTERVAL:
+            return max(oldest, current_minute() - STATS_RESYNC_MINUTES)
+        return None
+
+    def covers(self, start_minute: int) -> bool:
+        return self.loaded_from is not None and start_minute > current_minute() - self.size
+
+    def query(self, start_minute: int, end_minute: int, group_by: Sequence[str],
+              filters: Dict[str, int]) -> Dict[Key, int]:
+        positions = [self.dimensions.index(name) for name in group_by]
+        wanted = [(self.dimensions.index(name), value) for name, value in filters.items()]
+        totals: Dict[Key, int] = defaultdict(int)
+        with self._lock:
+            for minute in range(start_minute, end_minute + 1):
+                slot = self._slots[minute % self.size]
+                if slot is None or slot[0] != minute:
+                    continue
+                for key, count in slot[1].items():
+                    if all(key[i] == value for i, value in wanted):
+                        totals[tuple(key[i] for i in positions)] += count
+        return totals
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            keys = sum(len(slot[1]) for slot in self._slots if slot is not None)
+        return {
+            "ring_minutes": self.size,
+            "keys": keys,
+            "loaded_from": self.loaded_from,
+            "recorded": self.recorded,
+            "synced_age_s": round(time.monotonic() - self.synced_at, 3) if self.synced_at else None,
+        }
+
+
+counters: Dict[str, RollingCounters] = {
+    "messages": RollingCounters(("country_id", "channel_id")),
+    "alerts": RollingCounters(("country_id", "priority_id")),
+}
+
+
+def record_event(topic: str, event: Dict[str, object]):
+    # Chamado junto com broker.publish: mantém o anel atualizado entre as sincronizações
+    ring = counters[topic]
+    key = tuple(int(event.get(name) or 0) for name in ring.dimensions)
+    ring.record(minute_of(event.get("timestamp")), key)
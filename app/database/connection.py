@@ -1,81 +1,211 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
 
-DB_NAME = "newsApi.db"
+from app.core.metrics import current_query_stats
+from .migrations import migrate
+
+DB_NAME = os.getenv("DB_NAME", "newsApi.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Ajustes aplicados em toda conexão aberta pelo pool
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL;",  # só vale para bancos novos; ver retention.py
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-16000;",      # ~16 MB por conexão
+    "PRAGMA mmap_size=268435456;",    # 256 MB
+    "PRAGMA busy_timeout=5000;",
+    "PRAGMA temp_store=MEMORY;",
+)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class TracedCursor(sqlite3.Cursor):
+    # Conta statements e tempo de execute() na requisição corrente (se houver).
+    # O tempo de fetch das linhas seguintes não entra na conta.
+    def execute(self, sql, parameters=()):
+        stats = current_query_stats.get()
+        if stats is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            stats.record(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        stats = current_query_stats.get()
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            stats.record(time.perf_counter() - started)
+
+
+class PooledConnection(sqlite3.Connection):
+    # close() devolve a conexão ao pool em vez de fechá-la,
+    # para que o código que já chama conn.close() continue funcionando.
+    pool: Optional["ConnectionPool"] = None
+    leased: bool = False
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute* do C não passam por cursor(); redireciona para o cursor rastreado
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, database: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=5.0,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Nenhuma conexão livre após {self.timeout}s (pool={self.size})"
+                    )
+
+        conn.leased = True
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn: PooledConnection):
+        if not conn.leased:
+            return
+        conn.leased = False
+        # Transação esquecida aberta não pode vazar para o próximo usuário
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "database": self.database,
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close_for_real()
+            with self._lock:
+                self._created -= 1
+
+
+pool = ConnectionPool(DB_NAME)
+
+
+def create_connection() -> PooledConnection:
+    return pool.acquire()
+
+
+def get_db() -> Iterator[sqlite3.Connection]:
+    # Dependência FastAPI: uma conexão do pool por requisição
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
 
-def create_connection():
-    return sqlite3.connect(DB_NAME)
 
 def initialize_database():
+    # Aplica as migrações pendentes (ver app/database/migrations.py)
     conn = create_connection()
-    cursor = conn.cursor()
-
-    # Países
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS countrys (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL
-        );
-    """)
-
-    # Prioridades
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS priorities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
-        );
-    """)
-
-    # Canais
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            link TEXT NOT NULL UNIQUE,
-            country_id INTEGER,
-            FOREIGN KEY (country_id) REFERENCES countrys(id)
-        );
-    """)
-
-    # Categorias de alerta
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS alert_categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL
-        );
-    """)
-
-   # Mensagens coletadas
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_id INTEGER NOT NULL,
-            timestamp TEXT NOT NULL,
-            text TEXT,
-            links TEXT,
-            images TEXT,
-            video TEXT,
-            FOREIGN KEY (channel_id) REFERENCES channels(id)
-        );
-    """)
-
-
-    # Alertas
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS alerts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message_ids TEXT, -- armazenado como JSON ou CSV
-            priority_id INTEGER,
-            country_id INTEGER,
-            title TEXT,
-            short_description TEXT,
-            alert_body TEXT, -- pode conter JSON
-            images TEXT,     -- longtext simulada
-            video TEXT,      -- novo campo
-            timestamp TEXT,
-            coordinates TEXT,
-            FOREIGN KEY (priority_id) REFERENCES alert_categories(id),
-            FOREIGN KEY (country_id) REFERENCES countrys(id)
-        );
-    """)
-
-    conn.commit()
-    conn.close()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import create_connection, initialize_database
+from app.database.migrations import parse_message_ids
+from app.database.queries import message_content_hash
+
+
+def find_duplicates(cursor) -> Tuple[Dict[int, int], List[Tuple[str, int]]]:
+    # Retorna {id_duplicado: id_mantido} e os hashes a gravar nas mensagens mantidas
+    keep_by_post: Dict[Tuple[int, int], int] = {}
+    keep_by_hash: Dict[Tuple[int, str], int] = {}
+    remap: Dict[int, int] = {}
+    hashes: List[Tuple[str, int]] = []
+
+    cursor.execute("SELECT id, channel_id, text, source_post_id, content_hash FROM messages ORDER BY id")
+    for message_id, channel_id, text, source_post_id, content_hash in cursor:
+        if source_post_id is not None:
+            key = (channel_id, source_post_id)
+            if key in keep_by_post:
+                remap[message_id] = keep_by_post[key]
+            else:
+                keep_by_post[key] = message_id
+            continue
+
+        new_hash = content_hash or message_content_hash(text)
+        if new_hash is None:
+            continue
+        key = (channel_id, new_hash)
+        if key in keep_by_hash:
+            remap[message_id] = keep_by_hash[key]
+            continue
+        keep_by_hash[key] = message_id
+        if content_hash is None:
+            hashes.append((new_hash, message_id))
+
+    return remap, hashes
+
+
+def remap_alerts(cursor, remap: Dict[int, int]) -> int:
+    # Alertas passam a apontar para a mensagem mantida
+    cursor.execute("SELECT id, message_ids FROM alerts")
+    updates = []
+    for alert_id, message_ids in cursor.fetchall():
+        if not message_ids:
+            continue
+        ids = parse_message_ids(message_ids)
+        new_ids = list(dict.fromkeys(remap.get(i, i) for i in ids))
+        if new_ids != ids:
+            updates.append((json.dumps(new_ids), alert_id))
+    cursor.executemany("UPDATE alerts SET message_ids = ? WHERE id = ?", updates)
+    cursor.executemany(
+        "UPDATE OR IGNORE alert_messages SET message_id = ? WHERE message_id = ?",
+        [(keep, duplicate) for duplicate, keep in remap.items()]
+    )
+    cursor.executemany("DELETE FROM alert_messages WHERE message_id = ?", [(i,) for i in remap])
+    return len(updates)
+
+
+def compact_messages(dry_run: bool = False, vacuum: bool = False) -> Dict[str, Any]:
+    initialize_database()
+    conn = create_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        remap, hashes = find_duplicates(cursor)
+        report = {"duplicates": len(remap), "hashed": len(hashes), "alerts_updated": 0, "dry_run": dry_run}
+        if dry_run:
+            conn.rollback()
+            return report
+
+        cursor.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in remap])
+        cursor.executemany("UPDATE messages SET content_hash = ? WHERE id = ?", hashes)
+        report["alerts_updated"] = remap_alerts(cursor, remap)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if vacuum:
+        conn = create_connection()
+        conn.execute("VACUUM")
+        conn.close()
+    return report
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Remove mensagens duplicadas do banco.")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Apenas conta as duplicatas")
+    arg_parser.add_argument("--vacuum", action="store_true", help="Executa VACUUM ao final")
+    args = arg_parser.parse_args()
+
+    report = compact_messages(dry_run=args.dry_run, vacuum=args.vacuum)
+    print(f"🧹 {report['duplicates']} duplicadas, {report['hashed']} hashes gravados, "
+          f"{report['alerts_updated']} alertas atualizados{' (dry-run)' if report['dry_run'] else ''}")
@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from .connection import pool, DB_POOL_SIZE
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", str(DB_POOL_SIZE)))
+DB_MAX_QUEUE = int(os.getenv("DB_MAX_QUEUE", "64"))
+DB_RETRY_AFTER = int(os.getenv("DB_RETRY_AFTER", "1"))
+
+T = TypeVar("T")
+
+
+class DatabaseBusyError(Exception):
+    def __init__(self, retry_after: int = DB_RETRY_AFTER):
+        super().__init__("Banco de dados sobrecarregado, tente novamente.")
+        self.retry_after = retry_after
+
+
+class DatabaseExecutor:
+    # Threads dedicadas ao SQLite, separadas do threadpool do FastAPI/anyio.
+    # A fila é limitada: acima de workers + max_queue a chamada é recusada
+    # na hora (DatabaseBusyError -> 503) em vez de acumular latência.
+    def __init__(self, workers: int = DB_WORKERS, max_queue: int = DB_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                return False
+            self._pending += 1
+            return True
+
+    def _call(self, fn: Callable[..., T], args: tuple, submitted: float) -> T:
+        with self._lock:
+            self._active += 1
+            self._queue_wait_total += time.perf_counter() - submitted
+        try:
+            with pool.connection() as conn:
+                return fn(conn, *args)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        # Executa fn(conn, *args) com uma conexão do pool numa thread do executor
+        if not self._reserve():
+            raise DatabaseBusyError()
+        loop = asyncio.get_running_loop()
+        # run_in_executor não propaga contextvars; copia o contexto para o SQL
+        # executado na thread ser atribuído à requisição que o pediu
+        call = functools.partial(contextvars.copy_context().run, self._call, fn, args, time.perf_counter())
+        try:
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": max(self._pending - self._active, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._queue_wait_total * 1000 / self._completed, 3) if self._completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+db = DatabaseExecutor()
+
+
+async def run_db(fn: Callable[..., T], *args: Any) -> T:
+    return await db.run(fn, *args)
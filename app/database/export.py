@@ -0,0 +1,247 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import initialize_database, pool
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+EXPORT_FORMATS = ("parquet", "arrow")
+
+# Cada dataset: schema Arrow e SELECT já com os joins de canal/país.
+# A leitura é por faixa de id (keyset), então a memória fica limitada ao lote.
+DATASETS: Dict[str, Dict[str, Any]] = {
+    "messages": {
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("timestamp", pa.string()),
+            ("channel_id", pa.int64()),
+            ("channel_link", pa.string()),
+            ("country_id", pa.int64()),
+            ("country_name", pa.string()),
+            ("text", pa.string()),
+            ("links", pa.string()),
+            ("images", pa.string()),
+            ("video", pa.string()),
+            ("source_post_id", pa.int64()),
+        ]),
+        "sql": """
+            SELECT m.id, m.timestamp, m.channel_id, ch.link, ch.country_id, co.name,
+                   m.text, m.links, m.images, m.video, m.source_post_id
+            FROM messages m
+            LEFT JOIN channels ch ON ch.id = m.channel_id
+            LEFT JOIN countrys co ON co.id = ch.country_id
+        """,
+        "alias": "m",
+        "country": "ch.country_id",
+    },
+    "alerts": {
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("timestamp", pa.string()),
+            ("priority_id", pa.int64()),
+            ("priority_name", pa.string()),
+            ("country_id", pa.int64()),
+            ("country_name", pa.string()),
+            ("title", pa.string()),
+            ("short_description", pa.string()),
+            ("alert_body", pa.string()),
+            ("message_ids", pa.string()),
+            ("images", pa.string()),
+            ("video", pa.string()),
+            ("coordinates", pa.string()),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+        ]),
+        "sql": """
+            SELECT a.id, a.timestamp, a.priority_id, ac.name, a.country_id, co.name,
+                   a.title, a.short_description, a.alert_body, a.message_ids, a.images, a.video, a.coordinates,
+                   a.latitude, a.longitude
+            FROM alerts a
+            LEFT JOIN alert_categories ac ON ac.id = a.priority_id
+            LEFT JOIN countrys co ON co.id = a.country_id
+        """,
+        "alias": "a",
+        "country": "a.country_id",
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class ChunkSink:
+    # Destino em memória para o writer: os bytes são retirados a cada lote,
+    # o que permite enviar o arquivo pela rede enquanto ele é escrito
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def build_filters(dataset: str, since: Optional[str], until: Optional[str],
+                  country_id: Optional[int], after_id: int) -> Tuple[str, List[Any]]:
+    spec = DATASETS[dataset]
+    alias = spec["alias"]
+    clauses, params = [f"{alias}.id > ?"], [after_id]
+    if since:
+        clauses.append(f"{alias}.timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{alias}.timestamp < ?")
+        params.append(until)
+    if country_id is not None:
+        clauses.append(f"{spec['country']} = ?")
+        params.append(country_id)
+    return " AND ".join(clauses), params
+
+
+def fetch_batch(conn: sqlite3.Connection, dataset: str, since: Optional[str], until: Optional[str],
+                country_id: Optional[int], after_id: int, batch_size: int) -> List[tuple]:
+    spec = DATASETS[dataset]
+    where, params = build_filters(dataset, since, until, country_id, after_id)
+    return conn.execute(
+        f"{spec['sql']} WHERE {where} ORDER BY {spec['alias']}.id LIMIT ?", (*params, batch_size)
+    ).fetchall()
+
+
+def iter_batches(dataset: str, since: Optional[str] = None, until: Optional[str] = None,
+                 country_id: Optional[int] = None, after_id: int = 0,
+                 batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    # Uma conexão do pool por lote: um download lento não prende a conexão
+    # entre lotes, e o keyset (id > último) retoma de onde parou
+    schema: pa.Schema = DATASETS[dataset]["schema"]
+    last_id = after_id
+    while True:
+        with pool.connection() as conn:
+            rows = fetch_batch(conn, dataset, since, until, country_id, last_id, batch_size)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        yield pa.record_batch([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                              schema=schema)
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            return
+
+
+def open_writer(sink: Any, schema: pa.Schema, fmt: str):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression=EXPORT_COMPRESSION)
+    if fmt == "arrow":
+        options = pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+        return pa.ipc.new_stream(sink, schema, options=options)
+    raise ExportError(f"Formato inválido: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+
+
+def get_watermark(conn: sqlite3.Connection, name: str, dataset: str) -> int:
+    row = conn.execute("SELECT dataset, last_id FROM export_watermarks WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return 0
+    if row[0] != dataset:
+        raise ExportError(f"Watermark '{name}' pertence ao dataset {row[0]}")
+    return row[1]
+
+
+def save_watermark(conn: sqlite3.Connection, name: str, dataset: str, last_id: int):
+    conn.execute("""
+        INSERT INTO export_watermarks (name, dataset, last_id, updated_at)
+        VALUES (?, ?, ?, datetime('now'))
+        ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+        WHERE excluded.last_id > export_watermarks.last_id
+    """, (name, dataset, last_id))
+    conn.commit()
+
+
+def stream_export(dataset: str, fmt: str = "parquet", since: Optional[str] = None, until: Optional[str] = None,
+                  country_id: Optional[int] = None, watermark: Optional[str] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE, stats: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    # Gera o arquivo em pedaços (um por lote); o watermark só avança se o
+    # consumidor leu até o fim
+    if dataset not in DATASETS:
+        raise ExportError(f"Dataset inválido: {dataset} (use {', '.join(DATASETS)})")
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Formato inválido: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+    stats = stats if stats is not None else {}
+    stats.update({"rows": 0, "batches": 0, "bytes": 0, "last_id": None})
+
+    after_id = 0
+    if watermark:
+        with pool.connection() as conn:
+            after_id = get_watermark(conn, watermark, dataset)
+    sink = ChunkSink()
+    writer = open_writer(sink, DATASETS[dataset]["schema"], fmt)
+    for batch in iter_batches(dataset, since, until, country_id, after_id, batch_size):
+        writer.write_batch(batch)
+        stats["rows"] += batch.num_rows
+        stats["batches"] += 1
+        stats["last_id"] = batch.column(0)[-1].as_py()
+        chunk = sink.take()
+        stats["bytes"] += len(chunk)
+        yield chunk
+    writer.close()
+    chunk = sink.take()
+    stats["bytes"] += len(chunk)
+    yield chunk
+    if watermark and stats["last_id"] is not None:
+        with pool.connection() as conn:
+            save_watermark(conn, watermark, dataset, stats["last_id"])
+
+
+def export_to_file(path: str, dataset: str, fmt: str, **options) -> Dict[str, Any]:
+    started = time.perf_counter()
+    stats: Dict[str, Any] = {}
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for chunk in stream_export(dataset, fmt, stats=stats, **options):
+            f.write(chunk)
+    os.replace(tmp, path)
+    stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Exporta mensagens/alertas em Parquet ou Arrow IPC.")
+    arg_parser.add_argument("dataset", choices=list(DATASETS))
+    arg_parser.add_argument("output", help="Arquivo de saída")
+    arg_parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    arg_parser.add_argument("--since", help="Timestamp inicial (inclusive), ex.: 2025-01-01")
+    arg_parser.add_argument("--until", help="Timestamp final (exclusivo)")
+    arg_parser.add_argument("--country", type=int, help="ID do país")
+    arg_parser.add_argument("--watermark", help="Nome da exportação incremental (só linhas novas desde a última)")
+    arg_parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Linhas por lote/row group")
+    args = arg_parser.parse_args()
+
+    initialize_database()
+    stats = export_to_file(args.output, args.dataset, args.format, since=args.since, until=args.until,
+                           country_id=args.country, watermark=args.watermark, batch_size=args.batch_size)
+    print(f"📦 {stats['rows']} linhas em {stats['batches']} lotes, {stats['bytes']} bytes "
+          f"({stats['elapsed_s']}s) -> {args.output}")
@@ -0,0 +1,151 @@
+import json
+import math
+import os
+import sqlite3
+from typing import Any, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 20000.0
+# Teto de candidatos que a busca por raio carrega para calcular a distância exata
+MAX_NEAR_CANDIDATES = int(os.getenv("MAX_NEAR_CANDIDATES", "10000"))
+
+# (min_lat, min_lon, max_lat, max_lon)
+Box = Tuple[float, float, float, float]
+
+ALERT_GEO_COLUMNS = """
+    a.id, a.message_ids, a.priority_id, a.country_id, a.title,
+    a.short_description, a.alert_body, a.images, a.video,
+    a.timestamp, a.coordinates, a.latitude, a.longitude
+"""
+
+
+class GeoQueryError(ValueError):
+    pass
+
+
+def parse_coordinates(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    # alerts.coordinates é texto livre: "lat, lon", "lat lon", "lat;lon",
+    # JSON [lat, lon], {"lat": .., "lon"/"lng": ..} ou GeoJSON Point ([lon, lat])
+    if not value or not value.strip():
+        return None
+    pair: Any = None
+    try:
+        data = json.loads(value)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        if data.get("type") == "Point" and isinstance(data.get("coordinates"), list):
+            pair = list(reversed(data["coordinates"][:2]))
+        else:
+            pair = [data.get("lat", data.get("latitude")),
+                    data.get("lon", data.get("lng", data.get("longitude")))]
+    elif isinstance(data, list):
+        pair = data[:2]
+    else:
+        parts = value.replace(";", ",").replace(",", " ").split()
+        pair = parts if len(parts) == 2 else None
+    try:
+        lat, lon = float(pair[0]), float(pair[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def split_antimeridian(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Box]:
+    # Caixa que cruza o antimeridiano (min_lon > max_lon) vira duas
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise GeoQueryError("Latitudes inválidas: use -90 <= min_lat <= max_lat <= 90.")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise GeoQueryError("Longitudes devem estar entre -180 e 180.")
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def radius_boxes(lat: float, lon: float, radius_km: float) -> List[Box]:
+    # Caixa que contém o círculo; o filtro exato é feito depois com haversine
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise GeoQueryError("Coordenadas inválidas.")
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat, max_lat = lat - math.degrees(angular), lat + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        # Círculo engloba um polo: todas as longitudes
+        return [(max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)]
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    west, east = lon - delta_lon, lon + delta_lon
+    if west < -180:
+        return split_antimeridian(min_lat, west + 360, max_lat, east)
+    if east > 180:
+        return split_antimeridian(min_lat, west, max_lat, east - 360)
+    return [(min_lat, west, max_lat, east)]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    h = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def alerts_in_boxes(conn: sqlite3.Connection, boxes: Sequence[Box], since: Optional[str] = None,
+                    until: Optional[str] = None, country_id: Optional[int] = None,
+                    priority_id: Optional[int] = None, after_id: int = 0,
+                    limit: Optional[int] = None) -> List[tuple]:
+    # O R*Tree resolve a parte espacial; tempo e demais filtros vêm do alerts.
+    # O rtree guarda float32 arredondado para fora, então um ponto na borda pode
+    # ter a caixa um pouco maior que ele: busca por interseção e confirma com as
+    # coordenadas exatas do alerts
+    spatial = " OR ".join(
+        "(g.max_lat >= ? AND g.min_lat <= ? AND g.max_lon >= ? AND g.min_lon <= ?"
+        " AND a.latitude BETWEEN ? AND ? AND a.longitude BETWEEN ? AND ?)" for _ in boxes
+    )
+    params: List[Any] = []
+    for min_lat, min_lon, max_lat, max_lon in boxes:
+        params += [min_lat, max_lat, min_lon, max_lon] * 2
+    filters = [f"({spatial})", "a.id > ?"]
+    params.append(after_id)
+    if since:
+        filters.append("a.timestamp >= ?")
+        params.append(since)
+    if until:
+        filters.append("a.timestamp <= ?")
+        params.append(until)
+    if country_id:
+        filters.append("a.country_id = ?")
+        params.append(country_id)
+    if priority_id:
+        filters.append("a.priority_id = ?")
+        params.append(priority_id)
+
+    sql = f"""
+        SELECT {ALERT_GEO_COLUMNS}
+        FROM alerts_geo g
+        JOIN alerts a ON a.id = g.id
+        WHERE {' AND '.join(filters)}
+        ORDER BY a.id
+    """
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def alerts_near(conn: sqlite3.Connection, lat: float, lon: float, radius_km: float, since: Optional[str] = None,
+                until: Optional[str] = None, country_id: Optional[int] = None,
+                priority_id: Optional[int] = None) -> List[Tuple[float, tuple]]:
+    # Candidatos pela caixa do raio, depois distância exata; ordenado do mais próximo.
+    # A ordenação por distância precisa de todos os candidatos, então eles são
+    # limitados em vez de carregar a área inteira na memória
+    rows = alerts_in_boxes(conn, radius_boxes(lat, lon, radius_km), since, until, country_id, priority_id,
+                           limit=MAX_NEAR_CANDIDATES + 1)
+    if len(rows) > MAX_NEAR_CANDIDATES:
+        raise GeoQueryError(f"Mais de {MAX_NEAR_CANDIDATES} alertas na área; reduza radius_km ou use since/window.")
+    matches = []
+    for row in rows:
+        distance = haversine_km(lat, lon, row[11], row[12])
+        if distance <= radius_km:
+            matches.append((distance, row))
+    matches.sort(key=lambda match: (match[0], match[1][0]))
+    return matches
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import create_connection, initialize_database
+
+MEDIA_JOB_MAX_ATTEMPTS = int(os.getenv("MEDIA_JOB_MAX_ATTEMPTS", "8"))
+MEDIA_JOB_BACKOFF = float(os.getenv("MEDIA_JOB_BACKOFF", "5"))
+MEDIA_JOB_MAX_BACKOFF = float(os.getenv("MEDIA_JOB_MAX_BACKOFF", "3600"))
+MEDIA_JOB_LEASE = float(os.getenv("MEDIA_JOB_LEASE", "300"))
+MEDIA_JOB_DEFER = float(os.getenv("MEDIA_JOB_DEFER", "30"))
+# Jobs 'waiting' cuja mensagem nunca foi inserida (duplicata) são apagados após este tempo;
+# jobs prontos cuja mensagem sumiu vão para a dead-letter
+MEDIA_JOB_ORPHAN_TTL = float(os.getenv("MEDIA_JOB_ORPHAN_TTL", "86400"))
+
+PENDING_PREFIX = "pending:"
+MEDIA_COLUMNS = {"image": "images", "video": "video"}
+
+
+def pending_ref(job_id: int) -> str:
+    return f"{PENDING_PREFIX}{job_id}"
+
+
+def enqueue_media_jobs(conn: sqlite3.Connection, channel_id: int, source_post_id: Optional[int],
+                       content_hash: Optional[str], media: List[Dict[str, str]]) -> List[str]:
+    # Enfileira os downloads e devolve as referências pendentes na mesma ordem.
+    # Os jobs nascem 'waiting': o trigger da migração 10 só os libera quando a
+    # mensagem com essas referências é de fato inserida (duplicatas nunca baixam)
+    now = time.time()
+    refs = []
+    for item in media:
+        cursor = conn.execute("""
+            INSERT INTO media_jobs (channel_id, source_post_id, content_hash, kind, url, status,
+                                    next_attempt_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'waiting', ?, ?, ?)
+        """, (channel_id, source_post_id, content_hash, item["kind"], item["url"], now, now, now))
+        refs.append(pending_ref(cursor.lastrowid))
+    return refs
+
+
+def claim_media_jobs(conn: sqlite3.Connection, limit: int, lease: float = MEDIA_JOB_LEASE) -> List[Dict[str, Any]]:
+    # Pega jobs vencidos (ou com lease expirado de um worker que morreu) de forma atômica
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("""
+            UPDATE media_jobs
+            SET status = 'running', locked_until = ?, attempts = attempts + 1, updated_at = ?
+            WHERE id IN (
+                SELECT id FROM media_jobs
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'running' AND locked_until < ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+            RETURNING id, channel_id, source_post_id, content_hash, kind, url, attempts, created_at
+        """, (now + lease, now, now, now, limit)).fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    keys = ["id", "channel_id", "source_post_id", "content_hash", "kind", "url", "attempts", "created_at"]
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def find_job_message(cursor: sqlite3.Cursor, job: Dict[str, Any]) -> Optional[sqlite3.Row]:
+    column = MEDIA_COLUMNS[job["kind"]]
+    if job["source_post_id"] is not None:
+        cursor.execute(f"SELECT id, {column} FROM messages WHERE channel_id = ? AND source_post_id = ?",
+                       (job["channel_id"], job["source_post_id"]))
+    else:
+        cursor.execute(f"""
+            SELECT id, {column} FROM messages
+            WHERE channel_id = ? AND source_post_id IS NULL AND content_hash = ?
+        """, (job["channel_id"], job["content_hash"]))
+    return cursor.fetchone()
+
+
+def patch_message_media(cursor: sqlite3.Cursor, job: Dict[str, Any], filename: str) -> bool:
+    # Troca "pending:<id>" pelo arquivo baixado na lista de mídia da mensagem
+    row = find_job_message(cursor, job)
+    if row is None:
+        return False
+    message_id, value = row
+    ref = pending_ref(job["id"])
+    items = json.loads(value) if value else []
+    patched = [filename if item == ref else item for item in items]
+    if patched != items:
+        column = MEDIA_COLUMNS[job["kind"]]
+        cursor.execute(f"UPDATE messages SET {column} = ? WHERE id = ?", (json.dumps(patched), message_id))
+    return True
+
+
+def complete_media_job(conn: sqlite3.Connection, job: Dict[str, Any], filename: str) -> bool:
+    # Retorna False se a mensagem não está no banco (o job é adiado, sem gastar tentativa)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if not patch_message_media(cursor, job, filename):
+            conn.rollback()
+            defer_media_job(conn, job, "mensagem não encontrada")
+            return False
+        cursor.execute("""
+            UPDATE media_jobs
+            SET status = 'done', filename = ?, locked_until = NULL, last_error = NULL, updated_at = ?
+            WHERE id = ?
+        """, (filename, time.time(), job["id"]))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def defer_media_job(conn: sqlite3.Connection, job: Dict[str, Any], reason: str) -> str:
+    # Atraso de ordenação não é falha: devolve a tentativa consumida pelo claim.
+    # Só desiste (dead) se a mensagem continuar ausente depois de MEDIA_JOB_ORPHAN_TTL
+    now = time.time()
+    if now - (job.get("created_at") or now) >= MEDIA_JOB_ORPHAN_TTL:
+        conn.execute("""
+            UPDATE media_jobs SET status = 'dead', locked_until = NULL, last_error = ?, updated_at = ?
+            WHERE id = ?
+        """, (reason, now, job["id"]))
+        conn.commit()
+        return "dead"
+    conn.execute("""
+        UPDATE media_jobs
+        SET status = 'pending', attempts = MAX(attempts - 1, 0), locked_until = NULL,
+            last_error = ?, next_attempt_at = ?, updated_at = ?
+        WHERE id = ?
+    """, (reason, now + MEDIA_JOB_DEFER, now, job["id"]))
+    conn.commit()
+    return "pending"
+
+
+def purge_waiting_jobs(conn: sqlite3.Connection, ttl: float = MEDIA_JOB_ORPHAN_TTL) -> int:
+    # Jobs de posts que a API recusou como duplicados nunca saem de 'waiting'
+    cursor = conn.execute("DELETE FROM media_jobs WHERE status = 'waiting' AND created_at < ?", (time.time() - ttl,))
+    conn.commit()
+    return cursor.rowcount
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(MEDIA_JOB_BACKOFF * (2 ** (attempts - 1)), MEDIA_JOB_MAX_BACKOFF)
+
+
+def fail_media_job(conn: sqlite3.Connection, job: Dict[str, Any], error: str) -> str:
+    # Backoff exponencial; após MEDIA_JOB_MAX_ATTEMPTS o job vai para a dead-letter
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if job["attempts"] >= MEDIA_JOB_MAX_ATTEMPTS:
+            # A referência pendente fica na mensagem para o job poder ser reprocessado
+            status = "dead"
+            cursor.execute("""
+                UPDATE media_jobs SET status = 'dead', locked_until = NULL, last_error = ?, updated_at = ?
+                WHERE id = ?
+            """, (error, now, job["id"]))
+        else:
+            status = "pending"
+            cursor.execute("""
+                UPDATE media_jobs
+                SET status = 'pending', locked_until = NULL, last_error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE id = ?
+            """, (error, now + backoff_delay(job["attempts"]), now, job["id"]))
+        conn.commit()
+        return status
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def requeue_dead_jobs(conn: sqlite3.Connection) -> int:
+    # Devolve a dead-letter para a fila (ex.: depois de corrigir a rede); last_error fica
+    now = time.time()
+    cursor = conn.execute("""
+        UPDATE media_jobs SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ?
+        WHERE status = 'dead'
+    """, (now, now))
+    conn.commit()
+    return cursor.rowcount
+
+
+def media_queue_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    now = time.time()
+    counts = {status: 0 for status in ("waiting", "pending", "running", "done", "dead")}
+    for status, total in conn.execute("SELECT status, COUNT(*) FROM media_jobs GROUP BY status"):
+        counts[status] = total
+    ready, oldest = conn.execute("""
+        SELECT COUNT(*), MIN(created_at) FROM media_jobs
+        WHERE status = 'pending' AND next_attempt_at <= ?
+    """, (now,)).fetchone()
+    oldest_pending = conn.execute(
+        "SELECT MIN(created_at) FROM media_jobs WHERE status IN ('pending', 'running')"
+    ).fetchone()[0]
+    return {
+        **counts,
+        "depth": counts["pending"] + counts["running"],
+        "ready": ready,
+        "oldest_age_s": round(now - oldest_pending, 3) if oldest_pending else None,
+        "oldest_ready_age_s": round(now - oldest, 3) if oldest else None,
+    }
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Fila de downloads de mídia.")
+    arg_parser.add_argument("command", choices=["stats", "requeue-dead", "purge-waiting"])
+    args = arg_parser.parse_args()
+
+    initialize_database()
+    conn = create_connection()
+    try:
+        if args.command == "stats":
+            print(json.dumps(media_queue_stats(conn), indent=2))
+        elif args.command == "purge-waiting":
+            print(f"🧹 {purge_waiting_jobs(conn)} jobs de mensagens nunca inseridas removidos")
+        else:
+            print(f"🔁 {requeue_dead_jobs(conn)} jobs devolvidos para a fila")
+    finally:
+        conn.close()
@@ -0,0 +1,545 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.geo import parse_coordinates
+
+# Migrações versionadas do newsApi.db.
+# Cada migração roda em sua própria transação junto com o registro em
+# schema_version; novas migrações entram sempre no fim de MIGRATIONS.
+
+
+def add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def parse_message_ids(value: Optional[str]) -> List[int]:
+    # alerts.message_ids pode estar como JSON ("[1, 2]") ou CSV ("1,2")
+    if not value:
+        return []
+    try:
+        ids = json.loads(value)
+        if isinstance(ids, int):
+            ids = [ids]
+    except ValueError:
+        ids = value.split(",")
+    result = []
+    for message_id in ids:
+        try:
+            result.append(int(message_id))
+        except (TypeError, ValueError):
+            continue
+    return result
+
+
+def backfill_alert_messages(cursor: sqlite3.Cursor):
+    cursor.execute("SELECT id, message_ids FROM alerts")
+    links = [
+        (alert_id, message_id)
+        for alert_id, message_ids in cursor.fetchall()
+        for message_id in parse_message_ids(message_ids)
+    ]
+    cursor.executemany("INSERT OR IGNORE INTO alert_messages (alert_id, message_id) VALUES (?, ?)", links)
+
+
+def backfill_alert_coordinates(cursor: sqlite3.Cursor):
+    cursor.execute("SELECT id, coordinates FROM alerts WHERE coordinates IS NOT NULL")
+    points = [
+        (point[0], point[1], alert_id)
+        for alert_id, coordinates in cursor.fetchall()
+        for point in [parse_coordinates(coordinates)]
+        if point
+    ]
+    cursor.executemany("UPDATE alerts SET latitude = ?, longitude = ? WHERE id = ?", points)
+
+
+# Migrações
+def initial_schema(cursor: sqlite3.Cursor):
+    # Países
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS countrys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        );
+    """)
+
+    # Prioridades
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS priorities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+    """)
+
+    # Canais
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            link TEXT NOT NULL UNIQUE,
+            country_id INTEGER,
+            FOREIGN KEY (country_id) REFERENCES countrys(id)
+        );
+    """)
+
+    # Cursor de coleta por canal (último post do Telegram já ingerido)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS channel_cursors (
+            channel_id INTEGER PRIMARY KEY,
+            last_post_id INTEGER NOT NULL,
+            last_timestamp TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (channel_id) REFERENCES channels(id)
+        );
+    """)
+
+    # Categorias de alerta
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alert_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        );
+    """)
+
+   # Mensagens coletadas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            text TEXT,
+            links TEXT,
+            images TEXT,
+            video TEXT,
+            source_post_id INTEGER, -- id do post no Telegram
+            content_hash TEXT,      -- sha256 do texto, para mensagens sem post id
+            FOREIGN KEY (channel_id) REFERENCES channels(id)
+        );
+    """)
+    add_column_if_missing(cursor, "messages", "source_post_id", "INTEGER")
+    add_column_if_missing(cursor, "messages", "content_hash", "TEXT")
+
+    # Deduplicação: o mesmo post do canal só entra uma vez
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_channel_post
+        ON messages (channel_id, source_post_id);
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_channel_hash
+        ON messages (channel_id, content_hash)
+        WHERE source_post_id IS NULL AND content_hash IS NOT NULL;
+    """)
+
+
+    # Alertas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_ids TEXT, -- armazenado como JSON ou CSV
+            priority_id INTEGER,
+            country_id INTEGER,
+            title TEXT,
+            short_description TEXT,
+            alert_body TEXT, -- pode conter JSON
+            images TEXT,     -- longtext simulada
+            video TEXT,      -- novo campo
+            timestamp TEXT,
+            coordinates TEXT,
+            FOREIGN KEY (priority_id) REFERENCES alert_categories(id),
+            FOREIGN KEY (country_id) REFERENCES countrys(id)
+        );
+    """)
+
+    # Vínculo alerta <-> mensagem (substitui a busca em alerts.message_ids)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alert_messages'")
+    link_table_exists = cursor.fetchone() is not None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alert_messages (
+            alert_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (alert_id, message_id),
+            FOREIGN KEY (alert_id) REFERENCES alerts(id),
+            FOREIGN KEY (message_id) REFERENCES messages(id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alert_messages_message
+        ON alert_messages (message_id, alert_id);
+    """)
+    if not link_table_exists:
+        backfill_alert_messages(cursor)
+
+
+def alerts_video_column(cursor: sqlite3.Cursor):
+    # Bancos criados antes da coluna video em alerts
+    add_column_if_missing(cursor, "alerts", "video", "TEXT")
+
+
+def hot_filter_indexes(cursor: sqlite3.Cursor):
+    # /messages/get/filter (janela de tempo + país)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel_timestamp ON messages (channel_id, timestamp);")
+    # /channels/channels/get/filter e coleta por país
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_country ON channels (country_id);")
+    # Alertas recentes / por prioridade
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_priority ON alerts (priority_id);")
+
+
+def full_text_search(cursor: sqlite3.Cursor):
+    # Índices FTS5 com conteúdo externo, mantidos por triggers
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            text,
+            content='messages', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+        END;
+    """)
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(
+            title, short_description,
+            content='alerts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_insert AFTER INSERT ON alerts BEGIN
+            INSERT INTO alerts_fts (rowid, title, short_description)
+            VALUES (new.id, new.title, new.short_description);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_delete AFTER DELETE ON alerts BEGIN
+            INSERT INTO alerts_fts (alerts_fts, rowid, title, short_description)
+            VALUES ('delete', old.id, old.title, old.short_description);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_update AFTER UPDATE OF title, short_description ON alerts BEGIN
+            INSERT INTO alerts_fts (alerts_fts, rowid, title, short_description)
+            VALUES ('delete', old.id, old.title, old.short_description);
+            INSERT INTO alerts_fts (rowid, title, short_description)
+            VALUES (new.id, new.title, new.short_description);
+        END;
+    """)
+
+    # Indexa o que já existe
+    cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');")
+    cursor.execute("INSERT INTO alerts_fts (alerts_fts) VALUES ('rebuild');")
+
+
+def media_index(cursor: sqlite3.Cursor):
+    # Mídia por conteúdo (sha256) e URLs de origem já baixadas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media (
+            sha256 TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER,
+            created_at TEXT
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media_sources (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            FOREIGN KEY (sha256) REFERENCES media(sha256)
+        ) WITHOUT ROWID;
+    """)
+
+
+def media_jobs(cursor: sqlite3.Cursor):
+    # Fila persistente de downloads; a mensagem é localizada por canal + post
+    # (ou pelo hash do texto quando o post não tem id)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER NOT NULL,
+            source_post_id INTEGER,
+            content_hash TEXT,
+            kind TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            last_error TEXT,
+            filename TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_jobs_status ON media_jobs(status, next_attempt_at);")
+
+
+def export_watermarks(cursor: sqlite3.Cursor):
+    # Último id exportado por exportação incremental nomeada
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            name TEXT PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            updated_at TEXT
+        );
+    """)
+
+
+def rolling_stats(cursor: sqlite3.Cursor):
+    # Contadores por minuto (epoch/60, UTC) para os painéis; mantidos por trigger
+    # na mesma transação da inserção. Dimensão ausente/nula é gravada como 0.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_messages_minute (
+            minute INTEGER NOT NULL,
+            country_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (minute, country_id, channel_id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_alerts_minute (
+            minute INTEGER NOT NULL,
+            country_id INTEGER NOT NULL,
+            priority_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (minute, country_id, priority_id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stats_messages_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO stats_messages_minute (minute, country_id, channel_id, count)
+            VALUES (
+                CAST(COALESCE(strftime('%s', new.timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+                COALESCE((SELECT country_id FROM channels WHERE id = new.channel_id), 0),
+                COALESCE(new.channel_id, 0),
+                1
+            )
+            ON CONFLICT DO UPDATE SET count = count + 1;
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stats_alerts_insert AFTER INSERT ON alerts BEGIN
+            INSERT INTO stats_alerts_minute (minute, country_id, priority_id, count)
+            VALUES (
+                CAST(COALESCE(strftime('%s', new.timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+                COALESCE(new.country_id, 0),
+                COALESCE(new.priority_id, 0),
+                1
+            )
+            ON CONFLICT DO UPDATE SET count = count + 1;
+        END;
+    """)
+    # Histórico já existente
+    cursor.execute("""
+        INSERT INTO stats_messages_minute (minute, country_id, channel_id, count)
+        SELECT CAST(COALESCE(strftime('%s', m.timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+               COALESCE(c.country_id, 0), COALESCE(m.channel_id, 0), COUNT(*)
+        FROM messages m
+        LEFT JOIN channels c ON c.id = m.channel_id
+        GROUP BY 1, 2, 3;
+    """)
+    cursor.execute("""
+        INSERT INTO stats_alerts_minute (minute, country_id, priority_id, count)
+        SELECT CAST(COALESCE(strftime('%s', timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+               COALESCE(country_id, 0), COALESCE(priority_id, 0), COUNT(*)
+        FROM alerts
+        GROUP BY 1, 2, 3;
+    """)
+
+
+def alert_geo_index(cursor: sqlite3.Cursor):
+    # Coordenadas numéricas + índice R*Tree (pontos como caixas degeneradas),
+    # sincronizado por triggers como o FTS
+    add_column_if_missing(cursor, "alerts", "latitude", "REAL")
+    add_column_if_missing(cursor, "alerts", "longitude", "REAL")
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS alerts_geo USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon
+        );
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_geo_insert AFTER INSERT ON alerts
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+            INSERT INTO alerts_geo (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_geo_delete AFTER DELETE ON alerts BEGIN
+            DELETE FROM alerts_geo WHERE id = old.id;
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS alerts_geo_update AFTER UPDATE OF latitude, longitude ON alerts BEGIN
+            DELETE FROM alerts_geo WHERE id = old.id;
+            INSERT INTO alerts_geo (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END;
+    """)
+    backfill_alert_coordinates(cursor)
+
+
+def media_jobs_activation(cursor: sqlite3.Cursor):
+    # Jobs de mídia nascem 'waiting' e só ficam prontos quando a mensagem que
+    # referencia "pending:<id>" é inserida; posts duplicados não geram download
+    for column in ("images", "video"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS media_jobs_activate_{column} AFTER INSERT ON messages
+            WHEN new.{column} LIKE '%pending:%' BEGIN
+                UPDATE media_jobs
+                SET status = 'pending',
+                    next_attempt_at = (julianday('now') - 2440587.5) * 86400.0,
+                    updated_at = (julianday('now') - 2440587.5) * 86400.0
+                WHERE status = 'waiting' AND id IN (
+                    SELECT CAST(substr(value, 9) AS INTEGER)
+                    FROM json_each(CASE WHEN json_valid(new.{column}) THEN new.{column} ELSE '[]' END)
+                    WHERE value LIKE 'pending:%'
+                );
+            END;
+        """)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "initial_schema", initial_schema),
+    (2, "alerts_video_column", alerts_video_column),
+    (3, "hot_filter_indexes", hot_filter_indexes),
+    (4, "full_text_search", full_text_search),
+    (5, "media_index", media_index),
+    (6, "media_jobs", media_jobs),
+    (7, "export_watermarks", export_watermarks),
+    (8, "rolling_stats", rolling_stats),
+    (9, "alert_geo_index", alert_geo_index),
+    (10, "media_jobs_activation", media_jobs_activation),
+]
+
+
+# Motor
+def ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        );
+    """)
+    conn.commit()
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def migrate(conn: sqlite3.Connection, dry_run: bool = False) -> List[Dict[str, Any]]:
+    ensure_version_table(conn)
+    if not pending_migrations(conn):
+        return []
+
+    cursor = conn.cursor()
+    applied = []
+    try:
+        # BEGIN explícito: o DDL também fica dentro da transação.
+        # IMMEDIATE serializa API e coletor subindo ao mesmo tempo.
+        cursor.execute("BEGIN IMMEDIATE")
+        for version, name, apply in pending_migrations(conn):
+            apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.utcnow().isoformat())
+            )
+            applied.append({"version": version, "name": name})
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
+
+
+# Consultas quentes e seus planos
+HOT_QUERIES: Dict[str, Tuple[str, Tuple[Any, ...]]] = {
+    "messages_filter_country": ("""
+        SELECT m.id FROM messages m
+        JOIN channels c ON m.channel_id = c.id
+        WHERE m.timestamp >= ? AND c.country_id = ?
+    """, ("2000-01-01", 1)),
+    "messages_filter_priority": ("""
+        SELECT DISTINCT m.id FROM messages m
+        JOIN channels c ON m.channel_id = c.id
+        JOIN alert_messages am ON am.message_id = m.id
+        JOIN alerts a ON a.id = am.alert_id
+        WHERE m.timestamp >= ? AND a.priority_id = ?
+    """, ("2000-01-01", 1)),
+    "messages_page": ("SELECT id FROM messages WHERE id > ? ORDER BY id LIMIT ?", (0, 1000)),
+    "alerts_page": ("SELECT id FROM alerts WHERE id > ? ORDER BY id LIMIT ?", (0, 1000)),
+    "channels_by_country": ("SELECT id, link, country_id FROM channels WHERE country_id = ?", (1,)),
+    "message_by_post": ("SELECT id FROM messages WHERE channel_id = ? AND source_post_id = ?", (1, 1)),
+}
+
+
+def explain_hot_queries(conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    report = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        # SCAN sem índice em tabela grande é regressão
+        full_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+        report[name] = {"plan": plan, "full_scans": full_scans}
+    return report
+
+
+# CLI
+if __name__ == "__main__":
+    from app.database.connection import create_connection
+
+    arg_parser = argparse.ArgumentParser(description="Migrações do banco de dados.")
+    arg_parser.add_argument("command", choices=["status", "dry-run", "apply", "explain"])
+    args = arg_parser.parse_args()
+
+    conn = create_connection()
+    ensure_version_table(conn)
+    if args.command == "status":
+        print(f"📌 Versão atual: {current_version(conn)}")
+        for version, name, _ in pending_migrations(conn):
+            print(f"   pendente: {version} {name}")
+    elif args.command in ("dry-run", "apply"):
+        applied = migrate(conn, dry_run=args.command == "dry-run")
+        label = "testadas (rollback)" if args.command == "dry-run" else "aplicadas"
+        print(f"✅ {len(applied)} migrações {label}: {[m['name'] for m in applied]}")
+    else:
+        for name, result in explain_hot_queries(conn).items():
+            flag = "⚠️" if result["full_scans"] else "✅"
+            print(f"{flag} {name}")
+            for step in result["plan"]:
+                print(f"     {step}")
+    conn.close()
@@ -1,5 +1,93 @@
-from typing import List, Dict, Any, Optional
-from .connection import create_connection
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable, Sequence
+from app.core.cache import reference_cache
+from .connection import create_connection, pool
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+DEFAULT_SEARCH_SIZE = 50
+MAX_SEARCH_SIZE = 500
+STREAM_CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def utc_timestamp(moment: Optional[datetime] = None) -> str:
+    # Formato único de messages.timestamp e alerts.timestamp: ISO em UTC, sem fuso.
+    # Os filtros comparam como texto e os triggers de stats leem como UTC
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def fetch_rows(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+    return conn.execute(sql, params).fetchall()
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def fetch_search_rows(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+    # Erros de sintaxe do MATCH viram SearchQueryError (400 nas rotas)
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        raise SearchQueryError(str(e))
+
+
+def stream_ndjson(sql: str, params: Sequence[Any], to_dict: Callable[[tuple], Dict[str, Any]],
+                  chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    # Lê o cursor em blocos e serializa incrementalmente: memória constante
+    # independente do tamanho da tabela. Usa conexão própria porque a resposta
+    # continua sendo enviada depois que o handler retorna.
+    with pool.connection() as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield "".join(json.dumps(to_dict(row), ensure_ascii=False) + "\n" for row in rows)
+
+
+MESSAGE_INSERT_SQL = """
+    INSERT INTO messages (channel_id, timestamp, text, links, images, video, source_post_id, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING;
+"""
+
+
+def message_content_hash(text: Optional[str]) -> Optional[str]:
+    # Só mensagens com texto têm hash; mídia pura não é deduplicada por conteúdo
+    if not text or not text.strip():
+        return None
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def find_duplicate_message(cursor: sqlite3.Cursor, channel_id: int, source_post_id: Optional[int],
+                           content_hash: Optional[str]) -> Optional[int]:
+    if source_post_id is not None:
+        cursor.execute(
+            "SELECT id FROM messages WHERE channel_id = ? AND source_post_id = ?",
+            (channel_id, source_post_id)
+        )
+    elif content_hash is not None:
+        cursor.execute(
+            "SELECT id FROM messages WHERE channel_id = ? AND content_hash = ? AND source_post_id IS NULL",
+            (channel_id, content_hash)
+        )
+    else:
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
 
 
 def create_channel(channel_link: str) -> int:
@@ -9,6 +97,9 @@ def create_channel(channel_link: str) -> int:
     conn.commit()
     channel_id = cursor.lastrowid
     conn.close()
+    with _channel_cache_lock:
+        _channel_cache[channel_link] = channel_id
+    reference_cache.invalidate("channels")
     return channel_id
 
 
@@ -22,6 +113,11 @@ def get_channel_id(channel_link: str) -> Optional[int]:
 
 
 def list_channels() -> List[Dict[str, Any]]:
+    # Mesmo cache do GET /channels/get
+    return reference_cache.get_or_load("channels", load_channels)
+
+
+def load_channels() -> List[Dict[str, Any]]:
     conn = create_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT id, link, country_id FROM channels")
@@ -30,26 +126,156 @@ def list_channels() -> List[Dict[str, Any]]:
     return [{"id": row[0], "link": row[1], "country_id": row[2]} for row in rows]
 
 
-def save_messages(messages: List[Dict[str, Any]]):
+def get_channel_cursors() -> Dict[int, Dict[str, Any]]:
+    conn = create_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT channel_id, last_post_id, last_timestamp FROM channel_cursors")
+    rows = cursor.fetchall()
+    conn.close()
+    return {row[0]: {"last_post_id": row[1], "last_timestamp": row[2]} for row in rows}
+
+
+def save_channel_cursors(cursors: List[Tuple[int, int, str]]):
+    if not cursors:
+        return
     conn = create_connection()
     cursor = conn.cursor()
+    # Cursor só anda para frente
+    cursor.executemany("""
+        INSERT INTO channel_cursors (channel_id, last_post_id, last_timestamp, updated_at)
+        VALUES (?, ?, ?, datetime('now'))
+        ON CONFLICT(channel_id) DO UPDATE SET
+            last_post_id = excluded.last_post_id,
+            last_timestamp = excluded.last_timestamp,
+            updated_at = excluded.updated_at
+        WHERE excluded.last_post_id > channel_cursors.last_post_id;
+    """, cursors)
+    conn.commit()
+    conn.close()
 
-    for msg in messages:
-        channel_link = msg["channel"]
-        channel_id = get_channel_id(channel_link)
 
-        if channel_id is None:
-            channel_id = create_channel(channel_link)
+def find_media_by_url(url: str) -> Optional[str]:
+    conn = create_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.filename FROM media_sources s
+        JOIN media m ON m.sha256 = s.sha256
+        WHERE s.url = ?
+    """, (url,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
 
-        cursor.execute("""
-            INSERT INTO messages (channel_id, timestamp, text, links)
-            VALUES (?, ?, ?, ?);
-        """, (
-            channel_id,
-            msg["timestamp"],
-            msg["text"],
-            ", ".join(msg["links"])
-        ))
 
+def save_media(sha256: str, filename: str, kind: str, size: int, url: str):
+    conn = create_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT OR IGNORE INTO media (sha256, filename, kind, size, created_at)
+        VALUES (?, ?, ?, ?, datetime('now'))
+    """, (sha256, filename, kind, size))
+    cursor.execute("INSERT OR REPLACE INTO media_sources (url, sha256) VALUES (?, ?)", (url, sha256))
     conn.commit()
     conn.close()
+
+
+# Cache link -> id dos canais, aquecido a partir da tabela channels
+_channel_cache: Dict[str, int] = {}
+_channel_cache_lock = threading.Lock()
+_channel_cache_warm = False
+
+
+def _warm_channel_cache(cursor: sqlite3.Cursor):
+    global _channel_cache_warm
+    with _channel_cache_lock:
+        if _channel_cache_warm:
+            return
+        cursor.execute("SELECT link, id FROM channels")
+        _channel_cache.update(cursor.fetchall())
+        _channel_cache_warm = True
+
+
+def resolve_channel_ids(cursor: sqlite3.Cursor, links: Iterable[str]) -> Tuple[Dict[str, int], Dict[str, int], int]:
+    # Retorna (link -> id, canais lidos/criados nesta transação, quantos foram criados).
+    # Os novos só entram no cache depois do commit (remember_channels): se a
+    # transação for desfeita, o cache não pode apontar para canais inexistentes.
+    _warm_channel_cache(cursor)
+
+    with _channel_cache_lock:
+        resolved = {link: _channel_cache[link] for link in links if link in _channel_cache}
+    missing = {link for link in links if link not in resolved}
+    found: Dict[str, int] = {}
+    created = 0
+    if missing:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO channels (link) VALUES (?)",
+            [(link,) for link in missing]
+        )
+        created = cursor.rowcount if cursor.rowcount > 0 else 0
+        placeholders = ", ".join("?" for _ in missing)
+        cursor.execute(f"SELECT link, id FROM channels WHERE link IN ({placeholders})", tuple(missing))
+        found = dict(cursor.fetchall())
+        resolved.update(found)
+
+    return resolved, found, created
+
+
+def remember_channels(found: Dict[str, int]):
+    with _channel_cache_lock:
+        _channel_cache.update(found)
+
+
+def save_messages(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Mesmo relógio do POST /messages/bulk: o lote é gravado com a hora da
+    # inserção (UTC); a hora do post fica só no cursor do canal
+    started = time.perf_counter()
+    if not messages:
+        return {"ids": [], "count": 0, "duplicates": 0, "channels_created": 0, "elapsed_ms": 0.0}
+    current_timestamp = utc_timestamp()
+
+    conn = create_connection()
+    cursor = conn.cursor()
+    try:
+        # Transação única para canais + mensagens do lote
+        cursor.execute("BEGIN IMMEDIATE")
+        channel_ids, found, created = resolve_channel_ids(cursor, {msg["channel"] for msg in messages})
+
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'messages'")
+        row = cursor.fetchone()
+        first_id = (row[0] if row else 0) + 1
+
+        rows = []
+        for msg in messages:
+            # Mesmo formato gravado pela API (lista JSON)
+            links = msg["links"] if isinstance(msg["links"], str) else json.dumps(msg["links"])
+            rows.append((
+                channel_ids[msg["channel"]],
+                current_timestamp,
+                msg["text"],
+                links,
+                msg.get("images"),
+                msg.get("video"),
+                msg.get("post_id"),
+                message_content_hash(msg["text"]),
+            ))
+        cursor.executemany(MESSAGE_INSERT_SQL, rows)
+
+        # Com o lock de escrita da transação, tudo nessa faixa de ids é deste lote;
+        # duplicatas ignoradas podem consumir ids, então consulta os inseridos
+        cursor.execute("SELECT id FROM messages WHERE id >= ? ORDER BY id", (first_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    remember_channels(found)
+    if created:
+        reference_cache.invalidate("channels")
+    duplicates = len(messages) - len(ids)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    logger.info("💾 Lote salvo: %s mensagens, %s duplicadas, %s canais novos em %s ms",
+                len(ids), duplicates, created, elapsed_ms)
+    return {"ids": ids, "count": len(ids), "duplicates": duplicates, "channels_created": created, "elapsed_ms": elapsed_ms}
@@ -0,0 +1,299 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import create_connection, initialize_database
+from app.database.jobs import PENDING_PREFIX
+from app.functions.media import MEDIA_IMAGE_PATH, MEDIA_VIDEO_PATH
+
+# A tabela messages é a partição quente: só guarda os últimos RETENTION_DAYS dias.
+# O que é mais antigo vai, por mês, para archive/messages-AAAA-MM.db.gz (SQLite
+# comprimido, mesmo formato de linhas) e pode ser restaurado com `restore`.
+# Os vínculos alert_messages das mensagens arquivadas vão junto para o arquivo
+# e voltam no restore; alerts.message_ids continua listando os ids arquivados.
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# Apagar a mídia das mensagens arquivadas é opcional: com ela apagada, um mês
+# restaurado volta com images/video apontando para arquivos que não existem mais
+RETENTION_DELETE_MEDIA = os.getenv("RETENTION_DELETE_MEDIA", "false").lower() in ("1", "true", "yes")
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "2000"))
+
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archive.messages (
+        id INTEGER PRIMARY KEY,
+        channel_id INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        text TEXT,
+        links TEXT,
+        images TEXT,
+        video TEXT,
+        source_post_id INTEGER,
+        content_hash TEXT
+    );
+"""
+ARCHIVE_LINKS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archive.alert_messages (
+        alert_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (alert_id, message_id)
+    ) WITHOUT ROWID;
+"""
+MESSAGE_COLUMNS = "id, channel_id, timestamp, text, links, images, video, source_post_id, content_hash"
+
+
+def retention_cutoff(days: int = RETENTION_DAYS) -> str:
+    # Só a data: compara bem com "AAAA-MM-DD HH:MM:SS" e com isoformat ("...T...")
+    return (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def archive_path(month: str, compressed: bool = True) -> str:
+    name = f"messages-{month}.db"
+    return os.path.join(ARCHIVE_DIR, name + ".gz" if compressed else name)
+
+
+def expired_months(conn: sqlite3.Connection, cutoff: str) -> List[Tuple[str, int]]:
+    # Usa idx_messages_timestamp: só lê a faixa antiga
+    return conn.execute("""
+        SELECT substr(timestamp, 1, 7) AS month, COUNT(*) FROM messages
+        WHERE timestamp < ? GROUP BY month ORDER BY month
+    """, (cutoff,)).fetchall()
+
+
+def media_names(values: Iterable[Tuple[str, str]]) -> Set[str]:
+    names = set()
+    for images, video in values:
+        for value in (images, video):
+            try:
+                items = json.loads(value) if value else []
+            except ValueError:
+                continue
+            if isinstance(items, list):
+                names.update(item for item in items if isinstance(item, str) and item and not item.startswith(PENDING_PREFIX))
+    return names
+
+
+def decompress(source: str, target: str):
+    with gzip.open(source, "rb") as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def compress(source: str, target: str):
+    tmp = target + ".tmp"
+    with open(source, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp, target)
+    os.remove(source)
+
+
+def archive_month(conn: sqlite3.Connection, month: str, cutoff: str) -> Tuple[int, Set[str]]:
+    # Copia as linhas expiradas do mês para o arquivo do mês e só depois apaga da
+    # partição quente (duas transações: nada se perde se o processo cair no meio)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    work = archive_path(month, compressed=False)
+    packed = archive_path(month)
+    if os.path.exists(packed) and not os.path.exists(work):
+        decompress(packed, work)
+
+    conn.execute("ATTACH DATABASE ? AS archive", (work,))
+    try:
+        conn.execute(ARCHIVE_SCHEMA)
+        conn.execute(ARCHIVE_LINKS_SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"""
+            INSERT OR IGNORE INTO archive.messages ({MESSAGE_COLUMNS})
+            SELECT {MESSAGE_COLUMNS} FROM main.messages
+            WHERE timestamp < ? AND substr(timestamp, 1, 7) = ?
+        """, (cutoff, month))
+        conn.execute("""
+            INSERT OR IGNORE INTO archive.alert_messages (alert_id, message_id)
+            SELECT am.alert_id, am.message_id FROM main.alert_messages am
+            JOIN archive.messages a ON a.id = am.message_id
+        """)
+        conn.commit()
+
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("""
+            SELECT m.images, m.video FROM main.messages m
+            JOIN archive.messages a ON a.id = m.id
+            WHERE m.timestamp < ? AND substr(m.timestamp, 1, 7) = ?
+        """, (cutoff, month)).fetchall()
+        moved = conn.execute("""
+            DELETE FROM main.messages
+            WHERE timestamp < ? AND substr(timestamp, 1, 7) = ?
+              AND id IN (SELECT id FROM archive.messages)
+        """, (cutoff, month)).rowcount
+        conn.execute("""
+            DELETE FROM main.alert_messages
+            WHERE message_id IN (SELECT id FROM archive.messages)
+              AND message_id NOT IN (SELECT id FROM main.messages)
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+    vacuum = sqlite3.connect(work)
+    vacuum.execute("VACUUM")
+    vacuum.close()
+    compress(work, packed)
+    return moved, media_names(rows)
+
+
+def delete_orphan_media(conn: sqlite3.Connection, candidates: Set[str]) -> Dict[str, int]:
+    # Apaga só arquivos que nenhuma mensagem da partição quente ainda referencia.
+    # As mensagens arquivadas perdem a mídia (ver RETENTION_DELETE_MEDIA)
+    if not candidates:
+        return {"files": 0, "bytes": 0}
+    referenced = media_names(conn.execute("SELECT images, video FROM messages WHERE images IS NOT NULL OR video IS NOT NULL"))
+    orphans = candidates - referenced
+    deleted, freed = 0, 0
+    for name in orphans:
+        for folder in (MEDIA_IMAGE_PATH, MEDIA_VIDEO_PATH):
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+                os.remove(path)
+                deleted += 1
+    # Sem o arquivo, a URL deixa de estar no cache de downloads
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("DELETE FROM media_sources WHERE sha256 IN (SELECT sha256 FROM media WHERE filename = ?)",
+                     [(name,) for name in orphans])
+    conn.executemany("DELETE FROM media WHERE filename = ?", [(name,) for name in orphans])
+    conn.commit()
+    return {"files": deleted, "bytes": freed}
+
+
+def incremental_vacuum(conn: sqlite3.Connection, pages: int = VACUUM_PAGES) -> Dict[str, Any]:
+    # Devolve até `pages` páginas livres ao sistema de arquivos sem travar o banco
+    # como o VACUUM completo; exige auto_vacuum=INCREMENTAL (ver enable-incremental-vacuum)
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if mode == 2:
+        # execute() só avança um passo (= uma página); executescript roda até o fim
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(mode, mode),
+            "freed_pages": before - after, "free_pages": after}
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection):
+    # Mudar auto_vacuum num banco existente exige um VACUUM completo (uma vez só)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def apply_retention(conn: sqlite3.Connection, days: int = RETENTION_DAYS, dry_run: bool = False,
+                    delete_media: bool = RETENTION_DELETE_MEDIA, vacuum_pages: int = VACUUM_PAGES) -> Dict[str, Any]:
+    started = time.perf_counter()
+    cutoff = retention_cutoff(days)
+    months = expired_months(conn, cutoff)
+    summary: Dict[str, Any] = {"cutoff": cutoff, "months": dict(months), "archived": 0, "dry_run": dry_run}
+    if dry_run:
+        return summary
+
+    media: Set[str] = set()
+    for month, _ in months:
+        moved, names = archive_month(conn, month, cutoff)
+        summary["archived"] += moved
+        media |= names
+    summary["media_deleted"] = delete_orphan_media(conn, media) if delete_media else {"files": 0, "bytes": 0}
+    summary["vacuum"] = incremental_vacuum(conn, vacuum_pages)
+    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return summary
+
+
+def restore_month(conn: sqlite3.Connection, month: str) -> int:
+    # Devolve um mês arquivado para a partição quente (os ids são preservados)
+    packed = archive_path(month)
+    work = archive_path(month, compressed=False) + ".restore"
+    decompress(packed, work)
+    conn.execute("ATTACH DATABASE ? AS archive", (work,))
+    try:
+        # Arquivos antigos não têm a tabela de vínculos
+        conn.execute(ARCHIVE_LINKS_SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        restored = conn.execute(f"""
+            INSERT OR IGNORE INTO main.messages ({MESSAGE_COLUMNS})
+            SELECT {MESSAGE_COLUMNS} FROM archive.messages
+        """).rowcount
+        conn.execute("""
+            INSERT OR IGNORE INTO main.alert_messages (alert_id, message_id)
+            SELECT alert_id, message_id FROM archive.alert_messages
+            WHERE alert_id IN (SELECT id FROM main.alerts)
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+        os.remove(work)
+    return restored
+
+
+def retention_status(conn: sqlite3.Connection) -> Dict[str, Any]:
+    total, oldest, newest = conn.execute("SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM messages").fetchone()
+    archives = []
+    if os.path.isdir(ARCHIVE_DIR):
+        for name in sorted(os.listdir(ARCHIVE_DIR)):
+            if name.startswith("messages-") and name.endswith(".db.gz"):
+                archives.append({"month": name[len("messages-"):-len(".db.gz")],
+                                 "bytes": os.path.getsize(os.path.join(ARCHIVE_DIR, name))})
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        "retention_days": RETENTION_DAYS,
+        "cutoff": retention_cutoff(),
+        "hot": {"messages": total, "oldest": oldest, "newest": newest},
+        "expired": dict(expired_months(conn, retention_cutoff())),
+        "archives": archives,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(mode, mode),
+        "free_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+    }
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Retenção e arquivamento mensal de mensagens.")
+    arg_parser.add_argument("command", choices=["status", "run", "restore", "vacuum", "enable-incremental-vacuum"])
+    arg_parser.add_argument("month", nargs="?", help="AAAA-MM (para restore)")
+    arg_parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Dias mantidos na partição quente")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria arquivado")
+    arg_parser.add_argument("--delete-media", action="store_true", default=RETENTION_DELETE_MEDIA,
+                            help="Apaga a mídia das mensagens arquivadas (o restore volta sem ela)")
+    arg_parser.add_argument("--pages", type=int, default=VACUUM_PAGES, help="Páginas por incremental_vacuum")
+    arg_parser.add_argument("--every", type=float, default=0, help="Repete o run a cada N segundos")
+    args = arg_parser.parse_args()
+
+    initialize_database()
+    conn = create_connection()
+    try:
+        if args.command == "status":
+            print(json.dumps(retention_status(conn), indent=2))
+        elif args.command == "run":
+            while True:
+                summary = apply_retention(conn, args.days, args.dry_run, args.delete_media, args.pages)
+                print(f"🗄️ {json.dumps(summary)}")
+                if not args.every:
+                    break
+                time.sleep(args.every)
+        elif args.command == "restore":
+            if not args.month:
+                arg_parser.error("restore exige o mês (AAAA-MM)")
+            print(f"♻️ {restore_month(conn, args.month)} mensagens restauradas de {args.month}")
+        elif args.command == "vacuum":
+            print(f"🧹 {json.dumps(incremental_vacuum(conn, args.pages))}")
+        else:
+            enable_incremental_vacuum(conn)
+            print("🧹 auto_vacuum=INCREMENTAL ativado")
+    finally:
+        conn.close()
@@ -0,0 +1,32 @@
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import create_connection, initialize_database
+
+FTS_TABLES = ("messages_fts", "alerts_fts")
+
+
+def rebuild_search_index(conn: sqlite3.Connection, optimize: bool = False):
+    # Reconstrói os índices FTS5 a partir das tabelas de conteúdo
+    for table in FTS_TABLES:
+        conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild');")
+        if optimize:
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize');")
+    conn.commit()
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Manutenção do índice de busca (FTS5).")
+    arg_parser.add_argument("command", choices=["rebuild"])
+    arg_parser.add_argument("--optimize", action="store_true", help="Funde os segmentos do índice ao final")
+    args = arg_parser.parse_args()
+
+    initialize_database()
+    conn = create_connection()
+    rebuild_search_index(conn, optimize=args.optimize)
+    conn.close()
+    print(f"🔎 Índices reconstruídos: {', '.join(FTS_TABLES)}")
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import create_connection, initialize_database
+from app.database.retention import RETENTION_DAYS, retention_cutoff
+
+STATS_RETENTION_DAYS = int(os.getenv("STATS_RETENTION_DAYS", "90"))
+# Janelas maiores que a retenção não têm dados e estouram datas/binds do SQLite
+STATS_MAX_WINDOW_MINUTES = STATS_RETENTION_DAYS * 1440
+
+# Tabela de resumo e dimensões de cada tópico (mantidas por trigger, ver migração 8)
+STATS_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "messages": ("stats_messages_minute", ("country_id", "channel_id")),
+    "alerts": ("stats_alerts_minute", ("country_id", "priority_id")),
+}
+
+REBUILD_SQL = {
+    "messages": """
+        INSERT INTO stats_messages_minute (minute, country_id, channel_id, count)
+        SELECT CAST(COALESCE(strftime('%s', m.timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+               COALESCE(c.country_id, 0), COALESCE(m.channel_id, 0), COUNT(*)
+        FROM messages m
+        LEFT JOIN channels c ON c.id = m.channel_id
+        WHERE m.timestamp >= ?
+        GROUP BY 1, 2, 3
+    """,
+    "alerts": """
+        INSERT INTO stats_alerts_minute (minute, country_id, priority_id, count)
+        SELECT CAST(COALESCE(strftime('%s', timestamp), strftime('%s', 'now')) AS INTEGER) / 60,
+               COALESCE(country_id, 0), COALESCE(priority_id, 0), COUNT(*)
+        FROM alerts
+        WHERE timestamp >= ?
+        GROUP BY 1, 2, 3
+    """,
+}
+
+
+class StatsQueryError(ValueError):
+    pass
+
+
+def parse_window(window: str) -> int:
+    # "30m", "1h", "24h", "7d" ou minutos ("90")
+    units = {"m": 1, "h": 60, "d": 1440}
+    value = window.strip().lower()
+    try:
+        if value and value[-1] in units:
+            minutes = int(value[:-1]) * units[value[-1]]
+        else:
+            minutes = int(value)
+    except ValueError:
+        raise StatsQueryError(f"Janela inválida: {window}")
+    if minutes < 1:
+        raise StatsQueryError("A janela deve ter ao menos 1 minuto.")
+    if minutes > STATS_MAX_WINDOW_MINUTES:
+        raise StatsQueryError(f"A janela máxima é de {STATS_RETENTION_DAYS} dias.")
+    return minutes
+
+
+def parse_group_by(topic: str, group_by: Optional[str]) -> List[str]:
+    dimensions = STATS_TABLES[topic][1]
+    names = [name.strip() for name in (group_by or "").split(",") if name.strip()]
+    # Aceita "country" e "country_id"
+    names = [name if name.endswith("_id") else f"{name}_id" for name in names]
+    invalid = [name for name in names if name not in dimensions]
+    if invalid:
+        raise StatsQueryError(f"group_by inválido: {', '.join(invalid)} (use {', '.join(d[:-3] for d in dimensions)})")
+    return list(dict.fromkeys(names))
+
+
+def load_minutes(conn: sqlite3.Connection, topic: str, since_minute: int) -> List[tuple]:
+    table, dimensions = STATS_TABLES[topic]
+    return conn.execute(
+        f"SELECT minute, {', '.join(dimensions)}, count FROM {table} WHERE minute >= ?", (since_minute,)
+    ).fetchall()
+
+
+def aggregate_minutes(conn: sqlite3.Connection, topic: str, start_minute: int, end_minute: int,
+                      group_by: Sequence[str], filters: Dict[str, int]) -> Dict[tuple, int]:
+    # Para janelas maiores que o anel em memória: soma direto na tabela de resumo
+    table, _ = STATS_TABLES[topic]
+    clauses = ["minute BETWEEN ? AND ?"] + [f"{name} = ?" for name in filters]
+    params: List[Any] = [start_minute, end_minute, *filters.values()]
+    columns = ", ".join(list(group_by) + ["SUM(count)"])
+    sql = f"SELECT {columns} FROM {table} WHERE {' AND '.join(clauses)}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    totals = {}
+    for row in conn.execute(sql, params).fetchall():
+        if row[-1]:
+            totals[tuple(row[:-1])] = row[-1]
+    return totals
+
+
+def rebuild_stats(conn: sqlite3.Connection, topics: Optional[Sequence[str]] = None,
+                  days: int = RETENTION_DAYS) -> Dict[str, Any]:
+    # Recalcula os contadores dos últimos `days` dias a partir das linhas atuais.
+    # Os minutos mais antigos ficam como estão: as mensagens deles podem já ter ido
+    # para o arquivo (retention.py), e o contador é o único registro que sobrou.
+    # Um restore não precisa de rebuild: as linhas arquivadas continuaram contadas
+    since = retention_cutoff(days)
+    since_minute = conn.execute("SELECT CAST(strftime('%s', ?) AS INTEGER) / 60", (since,)).fetchone()[0]
+    result: Dict[str, Any] = {}
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for topic in topics or list(STATS_TABLES):
+            table, _ = STATS_TABLES[topic]
+            conn.execute(f"DELETE FROM {table} WHERE minute >= ?", (since_minute,))
+            conn.execute(REBUILD_SQL[topic], (since,))
+            result[topic] = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(count), 0) FROM {table} WHERE minute >= ?", (since_minute,)
+            ).fetchone()
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    result = {topic: {"buckets": buckets, "rows": rows} for topic, (buckets, rows) in result.items()}
+    result["since"] = since
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def prune_stats(conn: sqlite3.Connection, days: int = STATS_RETENTION_DAYS) -> Dict[str, int]:
+    cutoff = int(time.time() // 60) - days * 1440
+    removed = {}
+    for topic, (table, _) in STATS_TABLES.items():
+        removed[topic] = conn.execute(f"DELETE FROM {table} WHERE minute < ?", (cutoff,)).rowcount
+    conn.commit()
+    return removed
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Contadores por minuto de mensagens e alertas.")
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="Recalcula os contadores recentes a partir das linhas atuais")
+    rebuild_parser.add_argument("--topic", choices=list(STATS_TABLES), help="Só um tópico (padrão: todos)")
+    rebuild_parser.add_argument("--days", type=int, default=RETENTION_DAYS,
+                                help="Dias recalculados (os mais antigos podem estar arquivados)")
+    prune_parser = sub.add_parser("prune", help="Remove minutos mais antigos que --days")
+    prune_parser.add_argument("--days", type=int, default=STATS_RETENTION_DAYS)
+    show_parser = sub.add_parser("show", help="Totais de uma janela")
+    show_parser.add_argument("topic", choices=list(STATS_TABLES))
+    show_parser.add_argument("--window", default="1h")
+    show_parser.add_argument("--group-by", default="country")
+    args = arg_parser.parse_args()
+
+    initialize_database()
+    conn = create_connection()
+    try:
+        if args.command == "rebuild":
+            print(f"🔄 Contadores recalculados: {json.dumps(rebuild_stats(conn, [args.topic] if args.topic else None, args.days))}")
+        elif args.command == "prune":
+            print(f"🧹 Minutos removidos: {json.dumps(prune_stats(conn, args.days))}")
+        else:
+            end = int(time.time() // 60)
+            group_by = parse_group_by(args.topic, args.group_by)
+            totals = aggregate_minutes(conn, args.topic, end - parse_window(args.window) + 1, end, group_by, {})
+            for key, count in sorted(totals.items(), key=lambda item: -item[1]):
+                print(f"  {dict(zip(group_by, key))}: {count}")
+    finally:
+        conn.close()
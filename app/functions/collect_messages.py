@@ -2,64 +2,198 @@ import asyncio
 import os
 import re
 import json
-import random
 import argparse
 import sys
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from typing import List, Tuple, Optional, Dict, Any
 
+import httpx
 import requests
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Page, Browser, ElementHandle
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, ElementHandle
 from dateutil import parser
 
 # Configurações iniciais
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
-from app.database.connection import initialize_database
-from app.database.queries import list_channels
+from app.database.connection import initialize_database, pool as db_pool
+from app.database.jobs import enqueue_media_jobs
+from app.database.queries import (
+    list_channels, get_channel_cursors, save_channel_cursors, message_content_hash, save_messages, utc_timestamp
+)
+from app.functions.instrumentation import COLLECTOR_LOG_LEVEL, COLLECTOR_METRICS_FILE, configure_logging, logger, metrics
+from app.functions.telegram_html import parse_channel_html, parse_post_id
 
 load_dotenv()
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000/messages/create")
+BULK_API_URL = os.getenv("BULK_API_URL", API_URL.rsplit("/", 1)[0] + "/bulk")
+BULK_SIZE = int(os.getenv("BULK_SIZE", "100"))
+BULK_INTERVAL = float(os.getenv("BULK_INTERVAL", "5"))
 DEFAULT_CAPTURE_MINUTES = int(os.getenv("TIME_MESSAGE_CAPTURE", "10"))
-MEDIA_IMAGE_PATH = "app/media/image"
-MEDIA_VIDEO_PATH = "app/media/video"
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() not in ("0", "false", "no")
+BROWSER_SLOW_MO = int(os.getenv("BROWSER_SLOW_MO", "0"))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "4"))
+CHANNEL_TIMEOUT = float(os.getenv("CHANNEL_TIMEOUT", "60"))
+SCRAPE_BACKEND = os.getenv("SCRAPE_BACKEND", "browser")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+CURSOR_MAX_PAGES = int(os.getenv("CURSOR_MAX_PAGES", "5"))
 
 # Utilitários
 def extract_links(text: str) -> List[str]:
     return re.findall(r'https?://\S+', text)
 
 
-def ensure_media_dirs():
-    os.makedirs(MEDIA_IMAGE_PATH, exist_ok=True)
-    os.makedirs(MEDIA_VIDEO_PATH, exist_ok=True)
+
+# Envio para a API
+class MessageBuffer:
+    # Acumula payloads e envia para /messages/bulk por tamanho ou tempo. O envio
+    # por tempo tem um timer próprio: o lote sai em até max_interval mesmo que
+    # não chegue mais nenhuma mensagem
+    def __init__(self, url: str = BULK_API_URL, max_size: int = BULK_SIZE, max_interval: float = BULK_INTERVAL,
+                 session: Optional[requests.Session] = None):
+        self.url = url
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.session = session or requests.Session()
+        self.pending: List[Dict[str, Any]] = []
+        self.last_flush = time.monotonic()
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self.timer: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    async def add(self, payload: Dict[str, Any]):
+        self.pending.append(payload)
+        if len(self.pending) >= self.max_size or time.monotonic() - self.last_flush >= self.max_interval:
+            await self.flush()
+        elif self.timer is None:
+            delay = max(0.0, self.last_flush + self.max_interval - time.monotonic())
+            self.timer = asyncio.create_task(self.flush_later(delay))
+
+    async def flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        # A partir daqui o timer não pode mais ser cancelado: o lote já é dele
+        self.timer = None
+        await self.flush()
+
+    async def flush(self) -> bool:
+        # Retorna False se o lote (ou parte dele) não foi gravado
+        if self.timer is not None:
+            # Timer ainda esperando: o envio é feito aqui
+            self.timer.cancel()
+            self.timer = None
+        # Espera um envio do timer em andamento, para que failed/sent já o incluam
+        async with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.pending:
+                return True
+            batch, self.pending = self.pending, []
+            self.requests += 1
+            try:
+                with metrics.span("api_post"):
+                    res = await asyncio.to_thread(self.session.post, self.url, json=batch)
+                body = res.json()
+                self.sent += body.get("inserted", 0)
+                self.failed += body.get("failed", 0)
+                metrics.incr("api_posts")
+                metrics.incr("messages_inserted", body.get("inserted", 0))
+                metrics.incr("messages_duplicate", body.get("duplicates", 0))
+                metrics.incr("messages_failed", body.get("failed", 0))
+                logger.info("✅ Lote enviado: %s %s inseridas, %s duplicadas, %s falhas", res.status_code,
+                            body.get("inserted", 0), body.get("duplicates", 0), body.get("failed", 0))
+                return res.ok and not body.get("failed", 0)
+            except Exception as e:
+                self.failed += len(batch)
+                metrics.incr("api_errors")
+                metrics.incr("messages_failed", len(batch))
+                logger.error("❌ Falha ao enviar lote de %s mensagens: %s", len(batch), e)
+                return False
+
+    async def close(self):
+        await self.flush()
+        self.session.close()
+        logger.info("📊 Envio em lote: %s inseridas, %s falhas em %s requisições", self.sent, self.failed, self.requests)
 
 
 # Navegador
-async def start_browser() -> Tuple[Browser, Any]:
+async def start_browser(headless: bool = BROWSER_HEADLESS, slow_mo: int = BROWSER_SLOW_MO) -> Tuple[Browser, Any]:
     playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False, slow_mo=50)
+    browser = await playwright.chromium.launch(headless=headless, slow_mo=slow_mo)
     return browser, playwright
 
 
+class PagePool:
+    # Páginas reaproveitadas entre canais, cada uma no seu próprio contexto.
+    # O navegador só é aberto no primeiro acquire() (ou em start()).
+    def __init__(self, size: int, headless: bool = BROWSER_HEADLESS):
+        self.size = size
+        self.headless = headless
+        self.browser: Optional[Browser] = None
+        self.playwright: Any = None
+        self.contexts: List[BrowserContext] = []
+        self.pages: "asyncio.Queue[Page]" = asyncio.Queue()
+        self.lock = asyncio.Lock()
+
+    async def start(self):
+        async with self.lock:
+            if self.browser is not None:
+                return
+            self.browser, self.playwright = await start_browser(headless=self.headless)
+            for _ in range(self.size):
+                context = await self.browser.new_context()
+                self.contexts.append(context)
+                self.pages.put_nowait(await context.new_page())
+
+    async def acquire(self) -> Page:
+        await self.start()
+        return await self.pages.get()
+
+    def release(self, page: Page):
+        self.pages.put_nowait(page)
+
+    async def close(self):
+        if self.browser is None:
+            return
+        for context in self.contexts:
+            await context.close()
+        await self.browser.close()
+        await self.playwright.stop()
+
+
 # Processamento de mensagens
 async def get_message_blocks(page: Page) -> List[ElementHandle]:
     try:
-        await page.wait_for_selector('div.tgme_widget_message_wrap', timeout=10000)
-        return await page.query_selector_all('div.tgme_widget_message_wrap')
+        with metrics.span("block_query.browser"):
+            await page.wait_for_selector('div.tgme_widget_message_wrap', timeout=10000)
+            return await page.query_selector_all('div.tgme_widget_message_wrap')
     except Exception as e:
-        print(f"⚠️ Erro ao buscar blocos de mensagem: {e}")
+        logger.warning("⚠️ Erro ao buscar blocos de mensagem: %s", e)
         return []
 
 
+async def get_post_id(block: ElementHandle) -> Optional[int]:
+    el = await block.query_selector('div.tgme_widget_message[data-post]')
+    return parse_post_id(await el.get_attribute('data-post')) if el else None
+
+
+def post_time(value: str) -> datetime:
+    # datetime do t.me vem com fuso ("+00:00"): vira UTC sem fuso, como o cutoff
+    parsed = parser.isoparse(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
 async def parse_message(block: ElementHandle) -> Optional[Tuple[datetime, str]]:
     try:
         # Busca o elemento time dentro do link de data
         time_el = await block.query_selector('a.tgme_widget_message_date time')
         text_el = await block.query_selector('div.tgme_widget_message_text')
 
-        print(f"⏱️ time_el encontrado? {'✅' if time_el else '❌'}")
-        print(f"📝 text_el encontrado? {'✅' if text_el else '❌'}")
+        logger.debug("⏱️ time_el encontrado? %s; 📝 text_el encontrado? %s", bool(time_el), bool(text_el))
 
         if not time_el:
             time_el = await block.query_selector('time')  # fallback
@@ -67,100 +201,48 @@ async def parse_message(block: ElementHandle) -> Optional[Tuple[datetime, str]]:
         timestamp_str = await time_el.get_attribute('datetime') if time_el else None
         text = await text_el.inner_text() if text_el else ""
 
-        print(f"📅 datetime bruto: {timestamp_str}")
-        print(f"🧾 texto extraído: {text.strip()[:100]}...")
+        logger.debug("📅 datetime bruto: %s; 🧾 texto extraído: %.100s", timestamp_str, text.strip())
 
         if timestamp_str:
-            timestamp = parser.isoparse(timestamp_str).replace(tzinfo=None)
-            return timestamp, text.strip()
+            return post_time(timestamp_str), text.strip()
         else:
-            print("⚠️ Timestamp ausente.")
+            logger.debug("⚠️ Timestamp ausente.")
     except Exception as e:
-        print(f"⚠️ Erro ao processar mensagem: {e}")
+        metrics.incr("parse_errors")
+        logger.warning("⚠️ Erro ao processar mensagem: %s", e)
     return None
-async def download_media(page: Page, src: str, folder: str, prefix: str, timestamp: datetime, msg_id: int) -> str:
-    ext = "jpg" if prefix == "image" else "mp4"
-    filename = f"{prefix}-{timestamp.strftime('%Y%m%d%H%M%S')}-{msg_id}-{random.randint(1000,9999)}.{ext}"
-    path = os.path.join(folder, filename)
-
-    # Se for imagem, tenta o método tradicional
-    if prefix == "image":
-        try:
-            response = await page.context.request.get(src)
-            if response.ok:
-                content = await response.body()
-                with open(path, "wb") as f:
-                    f.write(content)
-                print(f"✅ Imagem salva: {path}")
-                return filename
-            else:
-                print(f"❌ Falha ao baixar imagem: {response.status}")
-        except Exception as e:
-            print(f"❌ Erro ao baixar imagem: {e}")
-        return ""
 
-    # Se for vídeo, faz download via browser com fetch e blob
-    try:
-        print(f"📥 Iniciando download via navegador: {src}")
-        await page.evaluate(f"""
-            (async () => {{
-                const response = await fetch("{src}");
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = "{filename}";
-                document.body.appendChild(a);
-                a.click();
-                a.remove();
-                setTimeout(() => URL.revokeObjectURL(url), 1000);
-            }})()
-        """)
-        print(f"✅ Vídeo enviado para download (navegador): {filename}")
-        return filename
-    except Exception as e:
-        print(f"❌ Erro no download de vídeo via navegador: {e}")
-        return ""
-
-def baixar_video_direct(src: str, path: str):
-    headers = {
-        "Referer": "https://t.me/",
-        "User-Agent": "Mozilla/5.0"
-    }
-    try:
-        r = requests.get(src, headers=headers, stream=True)
-        if r.ok:
-            with open(path, 'wb') as f:
-                for chunk in r.iter_content(1024):
-                    f.write(chunk)
-            print(f"✅ Download concluído: {path}")
-        else:
-            print(f"❌ Erro {r.status_code} ao baixar vídeo")
-    except Exception as e:
-        print(f"❌ Erro ao baixar vídeo via requests: {e}")
 
+def report_cursor_gap(url: str, after_post_id: int, oldest_post_id: int, pages: int):
+    # Limite de páginas atingido sem chegar ao cursor: os posts do intervalo não
+    # serão coletados; registra em vez de perder em silêncio
+    missing = oldest_post_id - after_post_id - 1
+    metrics.incr("cursor_gaps")
+    metrics.incr("cursor_gap_posts", missing)
+    logger.warning("🕳️ %s: %s páginas lidas sem alcançar o cursor; até %s posts perdidos (ids %s-%s). "
+                   "Aumente CURSOR_MAX_PAGES ou reduza o intervalo de coleta.",
+                   url, pages, missing, after_post_id + 1, oldest_post_id - 1)
 
-async def fetch_messages(page: Page, url: str, minutes: int, msg_id_start=1) -> List[Dict[str, Any]]:
-    await page.goto(url, wait_until='domcontentloaded')
-    blocks = await get_message_blocks(page)
-    print(f"📦 {len(blocks)} mensagens encontradas em {url}")
 
-    now = datetime.now()
-    cutoff = now - timedelta(minutes=minutes)
+async def parse_blocks(blocks: List[ElementHandle], after_post_id: Optional[int],
+                       cutoff: Optional[datetime]) -> List[Dict[str, Any]]:
     messages = []
-    msg_id = msg_id_start
-
     for block in reversed(blocks):
+        post_id = await get_post_id(block)
+        if after_post_id is not None and post_id is not None and post_id <= after_post_id:
+            break
+
+        started = time.perf_counter()
         parsed = await parse_message(block)
         if not parsed:
             continue
 
         msg_time, msg_text = parsed
-        if msg_time < cutoff:
+        if cutoff and msg_time < cutoff:
             continue
 
         links = extract_links(msg_text)
-        images, videos = [], []
+        media = []
 
         # 🔧 Corrigido: busca por imagens (src ou background-image)
         photo_links = await block.query_selector_all('a.tgme_widget_message_photo_wrap')
@@ -183,7 +265,7 @@ async def fetch_messages(page: Page, url: str, minutes: int, msg_id_start=1) ->
 
         for src in img_els:
             if src:
-                images.append(await download_media(page, src, MEDIA_IMAGE_PATH, "image", msg_time, msg_id))
+                media.append({"kind": "image", "url": src})
 
         # 🔄 GIFs e vídeos (suporte a src e poster)
         vid_els = await block.query_selector_all('video')
@@ -191,71 +273,323 @@ async def fetch_messages(page: Page, url: str, minutes: int, msg_id_start=1) ->
             src = await vid.get_attribute("src")
             poster = await vid.get_attribute("poster")
 
-            print(f"🎥 VIDEO SRC: {src}")
-            print(f"🖼️ POSTER: {poster}")
             # GIFs ou vídeos (formato mp4)
             if src and ".mp4" in src:
-                filename = f"video-{msg_time.strftime('%Y%m%d%H%M%S')}-{msg_id}-{random.randint(1000,9999)}.mp4"
-                path = os.path.join(MEDIA_VIDEO_PATH, filename)
-                baixar_video_direct(src, path)
-                videos.append(filename)
+                media.append({"kind": "video", "url": src})
 
             # Poster (thumb de vídeo) como imagem
             if poster and ".jpg" in poster:
-                images.append(await download_media(page, poster, MEDIA_IMAGE_PATH, "image", msg_time, msg_id))
-
+                media.append({"kind": "image", "url": poster})
 
         messages.append({
-            "timestamp": msg_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "post_id": post_id,
+            "timestamp": utc_timestamp(msg_time),
             "text": msg_text,
             "links": json.dumps(links),
-            "images": images,
-            "videos": videos
+            "media": media
+        })
+        metrics.spans.observe("message_parse.browser", time.perf_counter() - started)
+        metrics.incr("messages_parsed")
+
+    return messages
+
+
+async def fetch_messages(page: Page, url: str, minutes: int,
+                         after_post_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Com cursor, retoma do último post salvo; sem cursor, usa a janela de minutos
+    cutoff = datetime.utcnow() - timedelta(minutes=minutes) if after_post_id is None else None
+    messages: List[Dict[str, Any]] = []
+    before: Optional[int] = None
+    pages = 0
+
+    # Volta páginas (?before=) até alcançar o cursor; os blocos de cada página são
+    # lidos antes de navegar, porque a navegação invalida os ElementHandles
+    while True:
+        page_url = url if before is None else f"{url}?before={before}"
+        with metrics.span("page_load.browser"):
+            await page.goto(page_url, wait_until='domcontentloaded')
+        blocks = await get_message_blocks(page)
+        pages += 1
+        logger.info("📦 %s mensagens encontradas em %s", len(blocks), page_url)
+
+        messages.extend(await parse_blocks(blocks, after_post_id, cutoff))
+        oldest = await get_post_id(blocks[0]) if blocks else None
+        if after_post_id is None or oldest is None or oldest <= after_post_id + 1:
+            break
+        if pages >= CURSOR_MAX_PAGES:
+            report_cursor_gap(url, after_post_id, oldest, pages)
+            break
+        before = oldest
+
+    return messages
+
+# Coleta via HTTP (sem navegador)
+class FallbackRequired(Exception):
+    pass
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": "Mozilla/5.0", "Referer": "https://t.me/"},
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+    )
+
+
+async def fetch_preview_page(client: httpx.AsyncClient, url: str, before: Optional[int] = None) -> List[Dict[str, Any]]:
+    try:
+        with metrics.span("page_load.http"):
+            response = await client.get(url, params={"before": before} if before else None)
+    except httpx.HTTPError as e:
+        raise FallbackRequired(f"erro HTTP: {e}")
+    if response.status_code != 200:
+        raise FallbackRequired(f"status {response.status_code}")
+    with metrics.span("block_query.http"):
+        return parse_channel_html(response.text)
+
+
+async def fetch_messages_http(client: httpx.AsyncClient, url: str, minutes: int,
+                              after_post_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    blocks = await fetch_preview_page(client, url)
+    if not blocks:
+        raise FallbackRequired("nenhum bloco de mensagem no HTML")
+
+    # Volta páginas (?before=) até alcançar o cursor, para não perder posts entre execuções
+    pages = 1
+    while after_post_id is not None and pages < CURSOR_MAX_PAGES:
+        oldest = blocks[0]["post_id"]
+        if oldest is None or oldest <= after_post_id + 1:
+            break
+        older = await fetch_preview_page(client, url, before=oldest)
+        if not older:
+            break
+        blocks = older + blocks
+        pages += 1
+    oldest = blocks[0]["post_id"]
+    if after_post_id is not None and oldest is not None and oldest > after_post_id + 1 and pages >= CURSOR_MAX_PAGES:
+        report_cursor_gap(url, after_post_id, oldest, pages)
+    logger.info("📦 %s mensagens encontradas em %s", len(blocks), url)
+
+    cutoff = datetime.utcnow() - timedelta(minutes=minutes) if after_post_id is None else None
+    messages = []
+
+    for block in reversed(blocks):
+        if after_post_id is not None and block["post_id"] is not None and block["post_id"] <= after_post_id:
+            break
+        if not block["datetime"]:
+            continue
+        msg_time = post_time(block["datetime"])
+        if cutoff and msg_time < cutoff:
+            continue
+
+        media = [{"kind": "image", "url": src} for src in block["photos"]]
+        for video in block["videos"]:
+            if video["src"] and ".mp4" in video["src"]:
+                media.append({"kind": "video", "url": video["src"]})
+            if video["poster"] and ".jpg" in video["poster"]:
+                media.append({"kind": "image", "url": video["poster"]})
+
+        messages.append({
+            "post_id": block["post_id"],
+            "timestamp": utc_timestamp(msg_time),
+            "text": block["text"],
+            "links": json.dumps(extract_links(block["text"])),
+            "media": media
         })
-        msg_id += 1
+        metrics.incr("messages_parsed")
 
     return messages
 
+
 # Principal
-async def collect_messages(minutes: int, country_id: int):
+async def scrape_channel(pool: PagePool, client: Optional[httpx.AsyncClient], semaphore: asyncio.Semaphore,
+                         channel_id: int, url: str, minutes: int, timeout: float,
+                         after_post_id: Optional[int] = None) -> Dict[str, Any]:
+    async with semaphore:
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"channel_id": channel_id, "url": url, "messages": [], "error": None, "backend": None}
+        try:
+            logger.debug("🔍 Lendo mensagens de %s", url)
+            if client is not None:
+                try:
+                    result["messages"] = await asyncio.wait_for(fetch_messages_http(client, url, minutes, after_post_id=after_post_id), timeout=timeout)
+                    result["backend"] = "http"
+                except FallbackRequired as e:
+                    metrics.incr("http_fallbacks")
+                    logger.info("↩️ %s: %s, usando navegador", url, e)
+
+            if result["backend"] is None:
+                page = await pool.acquire()
+                try:
+                    remaining = max(timeout - (time.perf_counter() - started), 1.0)
+                    result["messages"] = await asyncio.wait_for(fetch_messages(page, url, minutes, after_post_id=after_post_id), timeout=remaining)
+                    result["backend"] = "browser"
+                finally:
+                    pool.release(page)
+        except asyncio.TimeoutError:
+            result["error"] = f"timeout após {timeout}s"
+            logger.warning("⏰ Tempo esgotado no canal %s", url)
+        except Exception as e:
+            result["error"] = str(e)
+            logger.error("❌ Erro ao buscar mensagens do canal %s: %s", url, e)
+        finally:
+            result["elapsed"] = time.perf_counter() - started
+            metrics.spans.observe("channel", result["elapsed"])
+            metrics.incr("channels_failed" if result["error"] else "channels_polled")
+        return result
+
+
+def enqueue_media(channel_id: int, messages: List[Dict[str, Any]]):
+    # A mídia vai para a fila persistente (app/functions/media_worker.py baixa);
+    # a mensagem sai já com as referências "pending:<job>" nas listas
+    with db_pool.connection() as conn, metrics.span("media_enqueue"):
+        try:
+            for msg in messages:
+                refs = enqueue_media_jobs(conn, channel_id, msg.get("post_id"),
+                                          message_content_hash(msg["text"]), msg["media"])
+                msg["images"] = [ref for ref, item in zip(refs, msg["media"]) if item["kind"] == "image"]
+                msg["videos"] = [ref for ref, item in zip(refs, msg["media"]) if item["kind"] == "video"]
+                metrics.incr("media_enqueued", len(refs))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+async def send_messages(channel_id: int, messages: List[Dict[str, Any]], buffer: Optional[MessageBuffer]) -> bool:
+    ok = True
+    for msg in messages:
+        payload = {
+            "channel_id": channel_id,
+            "timestamp": msg["timestamp"],
+            "text": msg["text"],
+            "links": msg["links"],
+            "images": json.dumps(msg["images"]),
+            "video": json.dumps(msg["videos"]),
+            "source_post_id": msg.get("post_id")
+        }
+        if buffer:
+            await buffer.add(payload)
+            continue
+        try:
+            with metrics.span("api_post"):
+                res = await asyncio.to_thread(requests.post, API_URL, json=payload)
+            metrics.incr("api_posts")
+            logger.debug("✅ Enviado: %s %s", res.status_code, res.text)
+            ok = ok and res.ok
+        except Exception as e:
+            ok = False
+            metrics.incr("api_errors")
+            logger.error("❌ Falha ao enviar mensagem do canal %s: %s", channel_id, e)
+    return ok
+
+
+def save_messages_direct(channel_link: str, messages: List[Dict[str, Any]]) -> bool:
+    # Modo --direct: grava o lote no banco numa única transação, sem passar pela API.
+    # A API publica essas linhas em /events lendo o banco (tail_messages), e stats
+    # e clusters já são alimentados pelo banco
+    if not messages:
+        return True
+    try:
+        with metrics.span("db_save"):
+            saved = save_messages([{
+                "channel": channel_link,
+                "text": msg["text"],
+                "links": msg["links"],
+                "images": json.dumps(msg["images"]),
+                "video": json.dumps(msg["videos"]),
+                "post_id": msg.get("post_id"),
+            } for msg in messages])
+    except Exception as e:
+        metrics.incr("db_errors")
+        logger.error("❌ Falha ao gravar mensagens de %s: %s", channel_link, e)
+        return False
+    metrics.incr("messages_inserted", saved["count"])
+    metrics.incr("messages_duplicate", saved["duplicates"])
+    return True
+
+
+def newest_cursor(channel_id: int, messages: List[Dict[str, Any]]) -> Optional[Tuple[int, int, str]]:
+    with_ids = [m for m in messages if m.get("post_id") is not None]
+    if not with_ids:
+        return None
+    newest = max(with_ids, key=lambda m: m["post_id"])
+    return channel_id, newest["post_id"], newest["timestamp"]
+
+
+def print_summary(results: List[Dict[str, Any]], elapsed: float):
+    logger.info("📊 Resumo do ciclo (%.1fs):", elapsed)
+    for r in sorted(results, key=lambda r: r["elapsed"], reverse=True):
+        status = f"❌ {r['error']}" if r["error"] else f"✅ {len(r['messages'])} mensagens ({r['backend']})"
+        logger.info("   %s: %.2fs %s", r["url"], r["elapsed"], status)
+    failures = sum(1 for r in results if r["error"])
+    logger.info("   %s canais, %s falhas", len(results), failures)
+
+
+async def collect_messages(minutes: int, country_id: int, bulk: bool = False,
+                           bulk_size: int = BULK_SIZE, bulk_interval: float = BULK_INTERVAL,
+                           concurrency: int = SCRAPE_CONCURRENCY, channel_timeout: float = CHANNEL_TIMEOUT,
+                           headless: bool = BROWSER_HEADLESS, backend: str = SCRAPE_BACKEND,
+                           metrics_file: str = COLLECTOR_METRICS_FILE, direct: bool = False):
     initialize_database()
-    ensure_media_dirs()
 
-    browser, playwright = await start_browser()
-    page = await browser.new_page()
+    buffer = MessageBuffer(max_size=bulk_size, max_interval=bulk_interval) if bulk and not direct else None
 
     all_channels = list_channels()
-    selected = [(c["id"], c["link"]) for c in all_channels if int(c["country_id"]) == int(country_id)]
-    print(f"🔎 {len(selected)} canais com country_id={country_id}: {[id for id, _ in selected]}")
+    selected = [(c["id"], c["link"]) for c in all_channels
+                if c["country_id"] is not None and int(c["country_id"]) == int(country_id)]
+    logger.info("🔎 %s canais com country_id=%s: %s", len(selected), country_id, [id for id, _ in selected])
 
     if not selected:
-        print("⚠️ Nenhum canal encontrado.")
-    else:
-        for channel_id, url in selected:
-            print(f"🔍 Lendo mensagens de {url}")
-            try:
-                messages = await fetch_messages(page, url, minutes)
-            except Exception as e:
-                print(f"❌ Erro ao buscar mensagens do canal {url}: {e}")
-                continue
-
-            for msg in messages:
-                payload = {
-                    "channel_id": channel_id,
-                    "timestamp": msg["timestamp"],
-                    "text": msg["text"],
-                    "links": msg["links"],
-                    "images": json.dumps(msg["images"]),
-                    "video": json.dumps(msg["videos"])
-                }
-                try:
-                    res = requests.post(API_URL, json=payload)
-                    print(f"✅ Enviado: {res.status_code} {res.json()}")
-                except Exception as e:
-                    print(f"❌ Falha ao enviar mensagem do canal {channel_id}: {e}")
-
-    await browser.close()
-    await playwright.stop()
+        logger.warning("⚠️ Nenhum canal encontrado.")
+        return
+
+    pool = PagePool(min(concurrency, len(selected)), headless=headless)
+    client = create_http_client() if backend == "http" else None
+    if client is None:
+        await pool.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    cursors = get_channel_cursors()
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(scrape_channel(
+            pool, client, semaphore, channel_id, url, minutes, channel_timeout,
+            after_post_id=cursors.get(channel_id, {}).get("last_post_id"),
+        ))
+        for channel_id, url in selected
+    ]
+    results = []
+    new_cursors = []
+    try:
+        # Envia cada canal assim que termina, sem esperar os demais
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            results.append(result)
+            await asyncio.to_thread(enqueue_media, result["channel_id"], result["messages"])
+            if direct:
+                sent = await asyncio.to_thread(save_messages_direct, result["url"], result["messages"])
+            else:
+                sent = await send_messages(result["channel_id"], result["messages"], buffer)
+            cursor = newest_cursor(result["channel_id"], result["messages"])
+            if sent and cursor:
+                new_cursors.append(cursor)
+
+        if buffer:
+            await buffer.close()
+            if buffer.failed:
+                # Não avança cursores se parte do lote não chegou na API
+                logger.warning("⚠️ Falhas no envio em lote; cursores não atualizados.")
+                new_cursors = []
+        save_channel_cursors(new_cursors)
+    finally:
+        if client is not None:
+            await client.aclose()
+        await pool.close()
+
+    print_summary(results, time.perf_counter() - started)
+    metrics.write_jsonl(metrics_file)
 
 
 # CLI
@@ -263,7 +597,33 @@ if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser(description="Coleta mensagens do Telegram e envia para API.")
     arg_parser.add_argument("--minutes", type=int, help="Minutos anteriores para buscar")
     arg_parser.add_argument("--country", type=int, required=True, help="ID do país para filtrar canais")
+    arg_parser.add_argument("--bulk", action="store_true", help="Envia mensagens em lote para /messages/bulk")
+    arg_parser.add_argument("--bulk-size", type=int, default=BULK_SIZE, help="Mensagens por lote")
+    arg_parser.add_argument("--bulk-interval", type=float, default=BULK_INTERVAL, help="Segundos máximos entre envios")
+    arg_parser.add_argument("--direct", action="store_true",
+                            help="Grava direto no banco (save_messages) em vez de enviar para a API")
+    arg_parser.add_argument("--concurrency", type=int, default=SCRAPE_CONCURRENCY, help="Canais lidos em paralelo")
+    arg_parser.add_argument("--channel-timeout", type=float, default=CHANNEL_TIMEOUT, help="Tempo máximo por canal (s)")
+    arg_parser.add_argument("--backend", choices=["browser", "http"], default=SCRAPE_BACKEND,
+                            help="http lê o HTML direto e só abre o navegador se necessário")
+    arg_parser.add_argument("--headful", action="store_true", help="Abre o navegador com janela visível")
+    arg_parser.add_argument("--log-level", default=COLLECTOR_LOG_LEVEL, help="DEBUG mostra os detalhes por mensagem")
+    arg_parser.add_argument("--metrics-file", default=COLLECTOR_METRICS_FILE,
+                            help="Arquivo JSON lines com contadores e spans (padrão: stdout)")
     args = arg_parser.parse_args()
-
-    asyncio.run(collect_messages(args.minutes or DEFAULT_CAPTURE_MINUTES, args.country))
+    configure_logging(args.log_level)
+
+    asyncio.run(collect_messages(
+        args.minutes or DEFAULT_CAPTURE_MINUTES,
+        args.country,
+        bulk=args.bulk,
+        bulk_size=args.bulk_size,
+        bulk_interval=args.bulk_interval,
+        concurrency=args.concurrency,
+        channel_timeout=args.channel_timeout,
+        headless=BROWSER_HEADLESS and not args.headful,
+        backend=args.backend,
+        metrics_file=args.metrics_file,
+        direct=args.direct,
+    ))
 
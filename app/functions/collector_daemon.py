@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import initialize_database
+from app.database.queries import list_channels, get_channel_cursors, save_channel_cursors
+from app.functions.instrumentation import (
+    COLLECTOR_LOG_LEVEL, Response, configure_logging, emit_metrics, json_route, logger, metrics, serve_http,
+)
+from app.functions.collect_messages import (
+    BROWSER_HEADLESS, BULK_SIZE, CHANNEL_TIMEOUT, DEFAULT_CAPTURE_MINUTES, SCRAPE_BACKEND, SCRAPE_CONCURRENCY,
+    MessageBuffer, PagePool, create_http_client, enqueue_media, newest_cursor, scrape_channel, send_messages,
+)
+
+load_dotenv()
+
+DAEMON_INTERVAL = float(os.getenv("DAEMON_INTERVAL", "120"))
+DAEMON_MIN_INTERVAL = float(os.getenv("DAEMON_MIN_INTERVAL", "30"))
+DAEMON_MAX_INTERVAL = float(os.getenv("DAEMON_MAX_INTERVAL", "1800"))
+DAEMON_JITTER = float(os.getenv("DAEMON_JITTER", "0.2"))
+DAEMON_REFRESH_INTERVAL = float(os.getenv("DAEMON_REFRESH_INTERVAL", "300"))
+DAEMON_SHUTDOWN_TIMEOUT = float(os.getenv("DAEMON_SHUTDOWN_TIMEOUT", "30"))
+DAEMON_HEALTH_HOST = os.getenv("DAEMON_HEALTH_HOST", "127.0.0.1")
+DAEMON_HEALTH_PORT = int(os.getenv("DAEMON_HEALTH_PORT", "8090"))
+DAEMON_STALL_AFTER = float(os.getenv("DAEMON_STALL_AFTER", "60"))
+
+
+def iso(epoch: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S") if epoch else None
+
+
+class ChannelSchedule:
+    # Estado de agendamento de um canal: o intervalo encolhe quando chegam
+    # mensagens novas e cresce quando o canal está parado ou falhando
+    def __init__(self, channel_id: int, url: str, country_id: Optional[int], interval: float):
+        self.channel_id = channel_id
+        self.url = url
+        self.country_id = country_id
+        self.base_interval = interval
+        self.interval = interval
+        # Primeira execução espalhada no intervalo para não abrir tudo de uma vez
+        self.next_run = time.monotonic() + random.uniform(0, interval)
+        self.running = False
+        self.polls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.messages = 0
+        self.last_messages = 0
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_elapsed: Optional[float] = None
+
+    def record(self, new_messages: int, error: Optional[str], elapsed: float):
+        self.polls += 1
+        self.last_elapsed = elapsed
+        if error:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            self.interval = min(self.interval * 2, DAEMON_MAX_INTERVAL)
+        else:
+            self.consecutive_failures = 0
+            self.last_success = time.time()
+            self.last_messages = new_messages
+            self.messages += new_messages
+            factor = 0.5 if new_messages else 1.5
+            self.interval = min(max(self.interval * factor, DAEMON_MIN_INTERVAL), DAEMON_MAX_INTERVAL)
+        jitter = random.uniform(1 - DAEMON_JITTER, 1 + DAEMON_JITTER)
+        self.next_run = time.monotonic() + self.interval * jitter
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "channel_id": self.channel_id,
+            "url": self.url,
+            "country_id": self.country_id,
+            "interval_s": round(self.interval, 1),
+            "next_run_in_s": round(max(self.next_run - time.monotonic(), 0), 1),
+            "running": self.running,
+            "polls": self.polls,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "messages": self.messages,
+            "last_messages": self.last_messages,
+            "last_success": iso(self.last_success),
+            "last_success_age_s": round(time.time() - self.last_success, 1) if self.last_success else None,
+            "last_error": self.last_error,
+            "last_elapsed_s": round(self.last_elapsed, 3) if self.last_elapsed is not None else None,
+        }
+
+
+class CollectorDaemon:
+    # Mantém navegador, cliente HTTP e sessão da API abertos entre ciclos e
+    # agenda cada canal no seu próprio intervalo
+    def __init__(self, countries: Optional[List[int]] = None, intervals: Optional[Dict[int, float]] = None,
+                 default_interval: float = DAEMON_INTERVAL, minutes: int = DEFAULT_CAPTURE_MINUTES,
+                 concurrency: int = SCRAPE_CONCURRENCY, channel_timeout: float = CHANNEL_TIMEOUT,
+                 headless: bool = BROWSER_HEADLESS, backend: str = SCRAPE_BACKEND, bulk_size: int = BULK_SIZE,
+                 channel_filter: Optional[Callable[[int], bool]] = None):
+        self.countries = set(countries or [])
+        self.intervals = intervals or {}
+        self.default_interval = default_interval
+        self.minutes = minutes
+        self.channel_timeout = channel_timeout
+        self.bulk_size = bulk_size
+        self.channel_filter = channel_filter
+        self.pool = PagePool(concurrency, headless=headless)
+        self.client = create_http_client() if backend == "http" else None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = requests.Session()
+        self.schedules: Dict[int, ChannelSchedule] = {}
+        self.cursors: Dict[int, Dict[str, Any]] = {}
+        self.tasks: set = set()
+        self.stop = asyncio.Event()
+        self.started = time.time()
+        self.last_tick = time.time()
+        self.last_refresh = 0.0
+
+    def refresh_channels(self):
+        # Relê a lista de canais: novos entram na agenda, removidos saem
+        selected = {}
+        for channel in list_channels():
+            # Canais criados automaticamente pelo save_messages não têm país: ficam
+            # no grupo "sem país", coletado só quando não há filtro por --country
+            channel_id = int(channel["id"])
+            country_id = int(channel["country_id"]) if channel["country_id"] is not None else None
+            if self.countries and country_id not in self.countries:
+                continue
+            if self.channel_filter and not self.channel_filter(channel_id):
+                continue
+            selected[channel_id] = (channel["link"], country_id)
+
+        for channel_id in list(self.schedules):
+            if channel_id not in selected and not self.schedules[channel_id].running:
+                del self.schedules[channel_id]
+        for channel_id, (url, country_id) in selected.items():
+            if channel_id not in self.schedules:
+                interval = self.intervals.get(country_id, self.default_interval)
+                self.schedules[channel_id] = ChannelSchedule(channel_id, url, country_id, interval)
+        self.last_refresh = time.monotonic()
+
+    async def poll(self, schedule: ChannelSchedule):
+        channel_id = schedule.channel_id
+        after_post_id = self.cursors.get(channel_id, {}).get("last_post_id")
+        new_messages, error, elapsed = 0, None, 0.0
+        try:
+            result = await scrape_channel(self.pool, self.client, self.semaphore, channel_id, schedule.url,
+                                          self.minutes, self.channel_timeout, after_post_id=after_post_id)
+            error, elapsed = result["error"], result["elapsed"]
+            messages = result["messages"]
+            if not error and messages:
+                await asyncio.to_thread(enqueue_media, channel_id, messages)
+                buffer = MessageBuffer(max_size=self.bulk_size, session=self.session)
+                await send_messages(channel_id, messages, buffer)
+                if await buffer.flush() and not buffer.failed:
+                    new_messages = len(messages)
+                    cursor = newest_cursor(channel_id, messages)
+                    if cursor:
+                        self.cursors[channel_id] = {"last_post_id": cursor[1], "last_timestamp": cursor[2]}
+                        await asyncio.to_thread(save_channel_cursors, [cursor])
+                else:
+                    error = "falha no envio para a API"
+        except Exception as e:
+            error = str(e)
+            logger.error("❌ Erro no ciclo do canal %s: %s", schedule.url, e)
+        finally:
+            schedule.record(new_messages, error, elapsed)
+            schedule.running = False
+
+    async def run(self):
+        initialize_database()
+        self.cursors = await asyncio.to_thread(get_channel_cursors)
+        await asyncio.to_thread(self.refresh_channels)
+        logger.info("🛰️ Daemon iniciado com %s canais", len(self.schedules))
+
+        while not self.stop.is_set():
+            now = time.monotonic()
+            self.last_tick = time.time()
+            if now - self.last_refresh >= DAEMON_REFRESH_INTERVAL:
+                await asyncio.to_thread(self.refresh_channels)
+
+            for schedule in list(self.schedules.values()):
+                if schedule.running or schedule.next_run > now:
+                    continue
+                schedule.running = True
+                task = asyncio.create_task(self.poll(schedule))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+            idle = [s.next_run - now for s in self.schedules.values() if not s.running]
+            wait = min(max(min(idle, default=1.0), 0.05), 1.0)
+            try:
+                await asyncio.wait_for(self.stop.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+        await self.shutdown()
+
+    async def shutdown(self):
+        # Espera os canais em andamento terminarem (até o limite) antes de fechar tudo
+        logger.info("🛑 Encerrando daemon, aguardando %s canais em andamento", len(self.tasks))
+        if self.tasks:
+            done, pending = await asyncio.wait(self.tasks, timeout=DAEMON_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+        await self.pool.close()
+        self.session.close()
+
+    def totals(self) -> Dict[str, int]:
+        schedules = list(self.schedules.values())
+        return {
+            "channels": len(schedules),
+            "polls": sum(s.polls for s in schedules),
+            "failures": sum(s.failures for s in schedules),
+            "messages": sum(s.messages for s in schedules),
+        }
+
+    def prometheus(self) -> List[str]:
+        # Última leitura bem-sucedida e intervalo atual de cada canal
+        lines = ["# TYPE collector_channel_last_success_timestamp gauge"]
+        schedules = sorted(self.schedules.values(), key=lambda s: s.channel_id)
+        for s in schedules:
+            if s.last_success:
+                lines.append(f'collector_channel_last_success_timestamp{{channel="{s.channel_id}"}} {s.last_success}')
+        lines.append("# TYPE collector_channel_interval_seconds gauge")
+        for s in schedules:
+            lines.append(f'collector_channel_interval_seconds{{channel="{s.channel_id}"}} {s.interval}')
+        return lines
+
+    def health(self) -> Dict[str, Any]:
+        channels = [s.snapshot() for s in self.schedules.values()]
+        stalled = time.time() - self.last_tick > DAEMON_STALL_AFTER
+        failing = [c["channel_id"] for c in channels if c["consecutive_failures"] >= 3]
+        if self.stop.is_set():
+            status = "stopping"
+        elif stalled:
+            status = "stalled"
+        else:
+            status = "degraded" if failing else "ok"
+        return {
+            "status": status,
+            "started_at": iso(self.started),
+            "uptime_s": round(time.time() - self.started, 1),
+            "last_tick_age_s": round(time.time() - self.last_tick, 3),
+            "channels_total": len(channels),
+            "channels_running": sum(1 for c in channels if c["running"]),
+            "channels_failing": failing,
+            "channels": channels,
+        }
+
+
+def serve_health(health: Callable[[], Dict[str, Any]], host: str, port: int,
+                 extra_metrics: Optional[Callable[[], List[str]]] = None):
+    # GET /health (200 ok/degraded, 503 parado ou travado) e GET /metrics no formato Prometheus
+    def prometheus() -> Response:
+        text = metrics.prometheus()
+        if extra_metrics:
+            text += "\n".join(extra_metrics()) + "\n"
+        return 200, "text/plain; version=0.0.4", text.encode()
+
+    return serve_http({
+        "/health": json_route(health, lambda body: body["status"] in ("ok", "degraded")),
+        "/metrics": prometheus,
+    }, host, port)
+
+
+async def run_daemon(daemon: Optional[CollectorDaemon] = None, health_host: str = DAEMON_HEALTH_HOST,
+                     health_port: int = DAEMON_HEALTH_PORT, **options):
+    daemon = daemon or CollectorDaemon(**options)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stop.set)
+    server = await serve_health(daemon.health, health_host, health_port, daemon.prometheus) if health_port else None
+    if server:
+        logger.info("🩺 Health em http://%s:%s/health (Prometheus em /metrics)", health_host, health_port)
+    emitter = asyncio.create_task(emit_metrics())
+    try:
+        await daemon.run()
+    finally:
+        emitter.cancel()
+        metrics.write_jsonl()
+        if server:
+            server.close()
+            await server.wait_closed()
+
+
+def parse_intervals(values: List[str]) -> Dict[int, float]:
+    # "1=30" -> país 1 a cada 30s
+    intervals = {}
+    for value in values:
+        country_id, seconds = value.split("=", 1)
+        intervals[int(country_id)] = float(seconds)
+    return intervals
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Coleta contínua de mensagens com agenda por país/canal.")
+    arg_parser.add_argument("--country", type=int, action="append", help="ID do país (pode repetir; padrão: todos)")
+    arg_parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL, help="Intervalo base por canal (s)")
+    arg_parser.add_argument("--country-interval", action="append", default=[], metavar="PAIS=SEGUNDOS",
+                            help="Intervalo base específico de um país")
+    arg_parser.add_argument("--minutes", type=int, default=DEFAULT_CAPTURE_MINUTES,
+                            help="Janela da primeira leitura de canais sem cursor")
+    arg_parser.add_argument("--concurrency", type=int, default=SCRAPE_CONCURRENCY, help="Canais lidos em paralelo")
+    arg_parser.add_argument("--channel-timeout", type=float, default=CHANNEL_TIMEOUT, help="Tempo máximo por canal (s)")
+    arg_parser.add_argument("--backend", choices=["browser", "http"], default=SCRAPE_BACKEND)
+    arg_parser.add_argument("--bulk-size", type=int, default=BULK_SIZE, help="Mensagens por lote")
+    arg_parser.add_argument("--health-host", default=DAEMON_HEALTH_HOST)
+    arg_parser.add_argument("--health-port", type=int, default=DAEMON_HEALTH_PORT, help="0 desativa o endpoint")
+    arg_parser.add_argument("--headful", action="store_true", help="Abre o navegador com janela visível")
+    arg_parser.add_argument("--log-level", default=COLLECTOR_LOG_LEVEL, help="DEBUG mostra os detalhes por mensagem")
+    args = arg_parser.parse_args()
+    configure_logging(args.log_level)
+
+    asyncio.run(run_daemon(
+        health_host=args.health_host,
+        health_port=args.health_port,
+        countries=args.country,
+        intervals=parse_intervals(args.country_interval),
+        default_interval=args.interval,
+        minutes=args.minutes,
+        concurrency=args.concurrency,
+        channel_timeout=args.channel_timeout,
+        headless=BROWSER_HEADLESS and not args.headful,
+        backend=args.backend,
+        bulk_size=args.bulk_size,
+    ))
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.functions.collect_messages import (
+    BROWSER_HEADLESS, BULK_SIZE, CHANNEL_TIMEOUT, DEFAULT_CAPTURE_MINUTES, SCRAPE_BACKEND, SCRAPE_CONCURRENCY,
+)
+from app.functions.instrumentation import COLLECTOR_LOG_LEVEL, configure_logging, logger
+from app.functions.collector_daemon import (
+    DAEMON_HEALTH_HOST, DAEMON_HEALTH_PORT, DAEMON_INTERVAL, CollectorDaemon, parse_intervals, run_daemon,
+    serve_health,
+)
+
+load_dotenv()
+
+SUPERVISOR_SHARDS = int(os.getenv("SUPERVISOR_SHARDS", str(os.cpu_count() or 2)))
+SUPERVISOR_REPLICAS = int(os.getenv("SUPERVISOR_REPLICAS", "128"))
+SUPERVISOR_REPORT_INTERVAL = float(os.getenv("SUPERVISOR_REPORT_INTERVAL", "30"))
+SUPERVISOR_MAX_RESTART_DELAY = float(os.getenv("SUPERVISOR_MAX_RESTART_DELAY", "60"))
+# Processo que ficou de pé por esse tempo antes de morrer volta a reiniciar sem espera longa
+SUPERVISOR_STABLE_AFTER = float(os.getenv("SUPERVISOR_STABLE_AFTER", "300"))
+SUPERVISOR_STOP_TIMEOUT = float(os.getenv("SUPERVISOR_STOP_TIMEOUT", "45"))
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    # Hash consistente: cada shard ocupa SUPERVISOR_REPLICAS pontos no anel, então
+    # mudar o número de shards só move os canais dos pontos afetados (~1/N)
+    def __init__(self, shards: int, replicas: int = SUPERVISOR_REPLICAS):
+        points = sorted((ring_hash(f"shard-{shard}-{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self.keys = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard_for(self, channel_id: int) -> int:
+        index = bisect.bisect(self.keys, ring_hash(str(channel_id))) % len(self.keys)
+        return self.shards[index]
+
+
+async def run_shard_daemon(shard: int, shards: int, reports: Any, health_port: int, options: Dict[str, Any]):
+    ring = HashRing(shards)
+    daemon = CollectorDaemon(channel_filter=lambda channel_id: ring.shard_for(channel_id) == shard, **options)
+
+    async def report():
+        while True:
+            reports.put({"shard": shard, "pid": os.getpid(), "at": time.time(), **daemon.totals()})
+            await asyncio.sleep(SUPERVISOR_REPORT_INTERVAL)
+
+    reporter = asyncio.create_task(report())
+    try:
+        # Cada shard tem o próprio navegador e envia pelo mesmo /messages/bulk
+        await run_daemon(daemon, health_port=health_port)
+    finally:
+        reporter.cancel()
+        reports.put({"shard": shard, "pid": os.getpid(), "at": time.time(), **daemon.totals()})
+
+
+def run_shard(shard: int, shards: int, reports: Any, health_port: int, log_level: str, options: Dict[str, Any]):
+    configure_logging(log_level)
+    asyncio.run(run_shard_daemon(shard, shards, reports, health_port, options))
+
+
+class ShardState:
+    def __init__(self, shard: int):
+        self.shard = shard
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.restarts = 0
+        # Quedas seguidas sem ficar estável: expoente do backoff (restarts é o total)
+        self.crash_streak = 0
+        self.restart_at = 0.0
+        self.started_at = 0.0
+        self.last_report: Dict[str, Any] = {}
+        self.rate = 0.0
+
+    def update(self, report: Dict[str, Any]):
+        # Mensagens/s entre dois relatórios do mesmo processo
+        last = self.last_report
+        if last.get("pid") == report["pid"] and report["at"] > last["at"]:
+            self.rate = (report["messages"] - last["messages"]) / (report["at"] - last["at"])
+        self.last_report = report
+
+    def snapshot(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.is_alive()
+        return {
+            "shard": self.shard,
+            "pid": self.process.pid if self.process else None,
+            "alive": alive,
+            "restarts": self.restarts,
+            "crash_streak": self.crash_streak,
+            "uptime_s": round(time.time() - self.started_at, 1) if alive else None,
+            "channels": self.last_report.get("channels", 0),
+            "polls": self.last_report.get("polls", 0),
+            "failures": self.last_report.get("failures", 0),
+            "messages": self.last_report.get("messages", 0),
+            "messages_per_s": round(self.rate, 3),
+        }
+
+
+class CollectorSupervisor:
+    # Um processo coletor por shard; processos que morrem voltam com backoff
+    def __init__(self, shards: int, options: Dict[str, Any], health_port: int = 0,
+                 log_level: str = COLLECTOR_LOG_LEVEL):
+        self.context = multiprocessing.get_context("spawn")
+        self.health_port = health_port
+        self.log_level = log_level
+        self.reports = self.context.Queue()
+        self.options = options
+        self.states = [ShardState(shard) for shard in range(shards)]
+        self.stop = asyncio.Event()
+        self.started = time.time()
+
+    def start_shard(self, state: ShardState):
+        state.process = self.context.Process(
+            target=run_shard,
+            # Cada shard expõe /health e /metrics na porta seguinte à do supervisor
+            args=(state.shard, len(self.states), self.reports,
+                  self.health_port + 1 + state.shard if self.health_port else 0, self.log_level, self.options),
+            name=f"collector-shard-{state.shard}",
+        )
+        state.process.start()
+        state.started_at = time.time()
+        logger.info("🚀 Shard %s iniciado (pid %s)", state.shard, state.process.pid)
+
+    def check_shards(self):
+        now = time.monotonic()
+        for state in self.states:
+            if state.process is not None and state.process.is_alive():
+                continue
+            if state.process is not None:
+                code = state.process.exitcode
+                state.process = None
+                state.restarts += 1
+                if time.time() - state.started_at >= SUPERVISOR_STABLE_AFTER:
+                    state.crash_streak = 0
+                state.crash_streak += 1
+                delay = min(2 ** (state.crash_streak - 1), SUPERVISOR_MAX_RESTART_DELAY)
+                state.restart_at = now + delay
+                logger.error("💥 Shard %s saiu com código %s; reiniciando em %ss", state.shard, code, delay)
+            if now >= state.restart_at:
+                self.start_shard(state)
+
+    def drain_reports(self):
+        while True:
+            try:
+                report = self.reports.get_nowait()
+            except queue.Empty:
+                return
+            self.states[report["shard"]].update(report)
+
+    def print_throughput(self):
+        logger.info("📊 Vazão por shard:")
+        for shard in (state.snapshot() for state in self.states):
+            logger.info("   shard %s: %s canais, %s mensagens (%s/s), %s falhas, %s reinícios", shard["shard"],
+                        shard["channels"], shard["messages"], shard["messages_per_s"], shard["failures"], shard["restarts"])
+
+    def health(self) -> Dict[str, Any]:
+        shards = [state.snapshot() for state in self.states]
+        if self.stop.is_set():
+            status = "stopping"
+        else:
+            status = "ok" if all(s["alive"] for s in shards) else "degraded"
+        return {
+            "status": status,
+            "uptime_s": round(time.time() - self.started, 1),
+            "messages_per_s": round(sum(s["messages_per_s"] for s in shards), 3),
+            "shards": shards,
+        }
+
+    async def run(self):
+        last_print = time.monotonic()
+        while not self.stop.is_set():
+            self.check_shards()
+            self.drain_reports()
+            if time.monotonic() - last_print >= SUPERVISOR_REPORT_INTERVAL:
+                self.print_throughput()
+                last_print = time.monotonic()
+            try:
+                await asyncio.wait_for(self.stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.to_thread(self.shutdown)
+
+    def shutdown(self):
+        # SIGTERM deixa cada daemon terminar os canais em andamento
+        logger.info("🛑 Encerrando shards")
+        for state in self.states:
+            if state.process is not None and state.process.is_alive():
+                state.process.terminate()
+        deadline = time.monotonic() + SUPERVISOR_STOP_TIMEOUT
+        for state in self.states:
+            if state.process is None:
+                continue
+            state.process.join(max(deadline - time.monotonic(), 0))
+            if state.process.is_alive():
+                state.process.kill()
+                state.process.join()
+        self.drain_reports()
+        self.print_throughput()
+
+
+async def run_supervisor(shards: int, health_host: str, health_port: int, options: Dict[str, Any],
+                         log_level: str = COLLECTOR_LOG_LEVEL):
+    supervisor = CollectorSupervisor(shards, options, health_port, log_level)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, supervisor.stop.set)
+    server = await serve_health(supervisor.health, health_host, health_port) if health_port else None
+    try:
+        await supervisor.run()
+    finally:
+        if server:
+            server.close()
+            await server.wait_closed()
+
+
+def print_plan(shards: int):
+    from app.database.queries import list_channels
+
+    ring = HashRing(shards)
+    counts: Dict[int, List[int]] = {shard: [] for shard in range(shards)}
+    for channel in list_channels():
+        counts[ring.shard_for(int(channel["id"]))].append(int(channel["id"]))
+    for shard, channel_ids in counts.items():
+        print(f"shard {shard}: {len(channel_ids)} canais {channel_ids}")
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Distribui os canais entre vários processos coletores.")
+    arg_parser.add_argument("--shards", type=int, default=SUPERVISOR_SHARDS, help="Número de processos coletores")
+    arg_parser.add_argument("--plan", action="store_true", help="Mostra a distribuição de canais e sai")
+    arg_parser.add_argument("--country", type=int, action="append", help="ID do país (pode repetir; padrão: todos)")
+    arg_parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL, help="Intervalo base por canal (s)")
+    arg_parser.add_argument("--country-interval", action="append", default=[], metavar="PAIS=SEGUNDOS")
+    arg_parser.add_argument("--minutes", type=int, default=DEFAULT_CAPTURE_MINUTES)
+    arg_parser.add_argument("--concurrency", type=int, default=SCRAPE_CONCURRENCY, help="Canais em paralelo por shard")
+    arg_parser.add_argument("--channel-timeout", type=float, default=CHANNEL_TIMEOUT)
+    arg_parser.add_argument("--backend", choices=["browser", "http"], default=SCRAPE_BACKEND)
+    arg_parser.add_argument("--bulk-size", type=int, default=BULK_SIZE)
+    arg_parser.add_argument("--health-host", default=DAEMON_HEALTH_HOST)
+    arg_parser.add_argument("--health-port", type=int, default=DAEMON_HEALTH_PORT, help="0 desativa o endpoint")
+    arg_parser.add_argument("--headful", action="store_true")
+    arg_parser.add_argument("--log-level", default=COLLECTOR_LOG_LEVEL)
+    args = arg_parser.parse_args()
+    configure_logging(args.log_level)
+
+    if args.plan:
+        print_plan(args.shards)
+        sys.exit(0)
+
+    asyncio.run(run_supervisor(args.shards, args.health_host, args.health_port, {
+        "countries": args.country,
+        "intervals": parse_intervals(args.country_interval),
+        "default_interval": args.interval,
+        "minutes": args.minutes,
+        "concurrency": args.concurrency,
+        "channel_timeout": args.channel_timeout,
+        "headless": BROWSER_HEADLESS and not args.headful,
+        "backend": args.backend,
+        "bulk_size": args.bulk_size,
+    }, args.log_level))
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.core.metrics import LatencyHistogram
+
+COLLECTOR_LOG_LEVEL = os.getenv("COLLECTOR_LOG_LEVEL", "INFO")
+COLLECTOR_METRICS_FILE = os.getenv("COLLECTOR_METRICS_FILE", "")
+COLLECTOR_METRICS_INTERVAL = float(os.getenv("COLLECTOR_METRICS_INTERVAL", "60"))
+
+# Spans do coletor vão de milissegundos (parse) a minutos (vídeos)
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger("collector")
+
+
+def configure_logging(level: str = COLLECTOR_LOG_LEVEL):
+    # DEBUG liga os detalhes por mensagem (seletores, datetime bruto, prévia do texto)
+    logging.basicConfig(
+        level=getattr(logging, level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s [%(processName)s] %(message)s",
+    )
+    # httpx registra cada requisição em INFO; só interessa em depuração
+    logging.getLogger("httpx").setLevel(logging.DEBUG if level.upper() == "DEBUG" else logging.WARNING)
+
+
+class CollectorMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.spans = LatencyHistogram(SPAN_BUCKETS)
+        self.started = time.time()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        # Funciona em código async também: o tempo inclui os awaits do bloco
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.observe(name, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        spans = {
+            name: {key: value for key, value in series.items() if key != "buckets"}
+            for name, series in self.spans.snapshot().items()
+        }
+        return {
+            "ts": round(time.time(), 3),
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "counters": counters,
+            "spans": spans,
+        }
+
+    def write_jsonl(self, path: str = COLLECTOR_METRICS_FILE):
+        # Uma linha JSON por chamada; sem arquivo configurado vai para stdout
+        line = json.dumps(self.snapshot()) + "\n"
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        else:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+    def prometheus(self) -> str:
+        with self._lock:
+            counters = sorted(self.counters.items())
+        lines = []
+        for name, value in counters:
+            lines.append(f"# TYPE collector_{name}_total counter")
+            lines.append(f"collector_{name}_total {value}")
+        lines.extend(self.spans.prometheus("collector_span_seconds", "span"))
+        return "\n".join(lines) + "\n"
+
+
+metrics = CollectorMetrics()
+
+
+async def emit_metrics(interval: float = COLLECTOR_METRICS_INTERVAL, path: str = COLLECTOR_METRICS_FILE):
+    # Tarefa de fundo para processos longos (daemon, worker de mídia)
+    while True:
+        await asyncio.sleep(interval)
+        metrics.write_jsonl(path)
+
+
+Response = Tuple[int, str, bytes]
+
+STATUS_TEXT = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}
+
+
+async def serve_http(routes: Dict[str, Callable[[], Response]], host: str, port: int) -> asyncio.AbstractServer:
+    # HTTP mínimo para health/metrics dos processos do coletor (só GET, sem keep-alive)
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            path = request_line[1].split("?", 1)[0] if len(request_line) > 1 else ""
+            route = routes.get(path)
+            if route:
+                status, content_type, payload = route()
+            else:
+                status, content_type, payload = 404, "application/json", b'{"detail": "Not Found"}'
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def json_route(body: Callable[[], Dict[str, Any]], healthy: Optional[Callable[[Dict[str, Any]], bool]] = None):
+    def route() -> Response:
+        value = body()
+        status = 200 if healthy is None or healthy(value) else 503
+        return status, "application/json", json.dumps(value).encode()
+    return route
+
+
+def prometheus_route() -> Response:
+    return 200, "text/plain; version=0.0.4", metrics.prometheus().encode()
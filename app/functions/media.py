@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.database.queries import find_media_by_url, save_media
+from app.functions.instrumentation import logger, metrics
+
+MEDIA_IMAGE_PATH = "app/media/image"
+MEDIA_VIDEO_PATH = "app/media/video"
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "8"))
+MEDIA_QUEUE_SIZE = int(os.getenv("MEDIA_QUEUE_SIZE", "1000"))
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(50 * 1024 * 1024)))
+MEDIA_TIMEOUT = float(os.getenv("MEDIA_TIMEOUT", "120"))
+MEDIA_CHUNK_SIZE = 1024 * 1024
+MEDIA_MAX_CONNECTIONS = int(os.getenv("MEDIA_MAX_CONNECTIONS", "20"))
+# URLs resolvidas mantidas em memória (LRU); as demais saem do media_sources
+MEDIA_KNOWN_URLS = int(os.getenv("MEDIA_KNOWN_URLS", "10000"))
+
+MEDIA_KINDS = {
+    "image": (MEDIA_IMAGE_PATH, "jpg"),
+    "video": (MEDIA_VIDEO_PATH, "mp4"),
+}
+
+
+def ensure_media_dirs():
+    os.makedirs(MEDIA_IMAGE_PATH, exist_ok=True)
+    os.makedirs(MEDIA_VIDEO_PATH, exist_ok=True)
+
+
+def create_media_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30, read=60),
+        follow_redirects=True,
+        headers={"User-Agent": "Mozilla/5.0", "Referer": "https://t.me/"},
+        limits=httpx.Limits(max_connections=MEDIA_MAX_CONNECTIONS, max_keepalive_connections=MEDIA_MAX_CONNECTIONS),
+    )
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class MediaDownloader:
+    # Fila assíncrona de downloads com workers limitados e um único cliente HTTP.
+    # Os arquivos são nomeados pelo SHA-256 do conteúdo: a mesma mídia é
+    # gravada uma vez só, e URLs já conhecidas nem são baixadas de novo.
+    def __init__(self, client: httpx.AsyncClient, workers: int = MEDIA_WORKERS):
+        self.client = client
+        self.workers = workers
+        self.queue: "asyncio.Queue[Optional[Tuple[str, str, asyncio.Future]]]" = asyncio.Queue(maxsize=MEDIA_QUEUE_SIZE)
+        self.tasks = []
+        self.known_urls: "OrderedDict[str, str]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"downloaded": 0, "bytes": 0, "url_hits": 0, "content_hits": 0, "failed": 0}
+        self.started = time.perf_counter()
+
+    def start(self):
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self.worker()))
+
+    async def submit(self, url: str, kind: str) -> "asyncio.Future[str]":
+        # Retorna um future com o nome do arquivo (ou a exceção do download)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if url in self.known_urls:
+            self.stats["url_hits"] += 1
+            self.known_urls.move_to_end(url)
+            future.set_result(self.known_urls[url])
+            return future
+        if url in self.inflight:
+            self.stats["url_hits"] += 1
+            return self.inflight[url]
+        self.inflight[url] = future
+        await self.queue.put((url, kind, future))
+        return future
+
+    async def worker(self):
+        while True:
+            job = await self.queue.get()
+            if job is None:
+                return
+            url, kind, future = job
+            try:
+                with metrics.span(f"media_download.{kind}"):
+                    filename = await asyncio.wait_for(self.fetch(url, kind), timeout=MEDIA_TIMEOUT)
+            except Exception as e:
+                logger.warning("❌ Erro ao baixar %s %s: %r", kind, url, e)
+                metrics.incr("media_failed")
+                self.stats["failed"] += 1
+                self.inflight.pop(url, None)
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.inflight.pop(url, None)
+            self.remember(url, filename)
+            if not future.done():
+                future.set_result(filename)
+
+    def remember(self, url: str, filename: str):
+        self.known_urls[url] = filename
+        self.known_urls.move_to_end(url)
+        while len(self.known_urls) > MEDIA_KNOWN_URLS:
+            self.known_urls.popitem(last=False)
+
+    async def fetch(self, url: str, kind: str) -> str:
+        known = await asyncio.to_thread(find_media_by_url, url)
+        if known:
+            self.stats["url_hits"] += 1
+            return known
+
+        folder, ext = MEDIA_KINDS[kind]
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(folder, f".download-{uuid.uuid4().hex}.part")
+        try:
+            async with self.client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    raise httpx.HTTPStatusError(f"status {response.status_code}", request=response.request, response=response)
+                length = int(response.headers.get("content-length") or 0)
+                if length > MEDIA_MAX_BYTES:
+                    raise MediaTooLarge(f"{length} bytes")
+                with open(tmp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(MEDIA_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MEDIA_MAX_BYTES:
+                            raise MediaTooLarge(f"mais de {MEDIA_MAX_BYTES} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+
+            sha256 = digest.hexdigest()
+            filename = f"{sha256}.{ext}"
+            path = os.path.join(folder, filename)
+            if os.path.exists(path):
+                self.stats["content_hits"] += 1
+                metrics.incr("media_content_hits")
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+                self.stats["downloaded"] += 1
+                self.stats["bytes"] += size
+                metrics.incr("media_downloaded")
+                metrics.incr("media_bytes", size)
+            await asyncio.to_thread(save_media, sha256, filename, kind, size, url)
+            return filename
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def close(self) -> Dict[str, Any]:
+        for _ in self.tasks:
+            await self.queue.put(None)
+        await asyncio.gather(*self.tasks)
+        elapsed = time.perf_counter() - self.started
+        summary = {
+            **self.stats,
+            "elapsed": round(elapsed, 3),
+            "mb_per_s": round(self.stats["bytes"] / 1024 / 1024 / elapsed, 3) if elapsed else 0.0,
+        }
+        logger.info("🖼️ Mídia: %s baixadas (%s bytes, %s MB/s), %s por URL já conhecida, "
+                    "%s por conteúdo repetido, %s falhas", summary["downloaded"], summary["bytes"],
+                    summary["mb_per_s"], summary["url_hits"], summary["content_hits"], summary["failed"])
+        return summary
+
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from app.database.connection import initialize_database, pool
+from app.database.jobs import claim_media_jobs, complete_media_job, fail_media_job, purge_waiting_jobs
+from app.functions.instrumentation import (
+    COLLECTOR_LOG_LEVEL, configure_logging, emit_metrics, logger, metrics,
+)
+from app.functions.media import MEDIA_WORKERS, MediaDownloader, create_media_client, ensure_media_dirs
+
+load_dotenv()
+
+MEDIA_WORKER_BATCH = int(os.getenv("MEDIA_WORKER_BATCH", "50"))
+MEDIA_WORKER_POLL = float(os.getenv("MEDIA_WORKER_POLL", "2"))
+MEDIA_WORKER_PURGE_INTERVAL = float(os.getenv("MEDIA_WORKER_PURGE_INTERVAL", "600"))
+
+
+def with_connection(fn, *args):
+    with pool.connection() as conn:
+        return fn(conn, *args)
+
+
+async def process_job(downloader: MediaDownloader, job: Dict[str, Any]):
+    try:
+        filename = await (await downloader.submit(job["url"], job["kind"]))
+    except Exception as e:
+        status = await asyncio.to_thread(with_connection, fail_media_job, job, repr(e))
+        metrics.incr(f"media_jobs_{status}")
+        logger.warning("⚠️ Job %s falhou (tentativa %s): %s", job["id"], job["attempts"], status)
+        return
+    if await asyncio.to_thread(with_connection, complete_media_job, job, filename):
+        metrics.incr("media_jobs_done")
+        logger.debug("✅ Job %s: %s", job["id"], filename)
+    else:
+        metrics.incr("media_jobs_deferred")
+        logger.info("⏳ Job %s: mensagem não encontrada, adiado sem gastar tentativa", job["id"])
+
+
+async def run_worker(workers: int = MEDIA_WORKERS, batch: int = MEDIA_WORKER_BATCH, once: bool = False):
+    # Drena a fila persistente; vários processos podem rodar em paralelo,
+    # pois cada lote é reservado com lease dentro de BEGIN IMMEDIATE
+    initialize_database()
+    ensure_media_dirs()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    client = create_media_client()
+    downloader = MediaDownloader(client, workers)
+    downloader.start()
+    emitter = asyncio.create_task(emit_metrics())
+    purged_at = 0.0
+    try:
+        while not stop.is_set():
+            if loop.time() - purged_at >= MEDIA_WORKER_PURGE_INTERVAL:
+                purged_at = loop.time()
+                purged = await asyncio.to_thread(with_connection, purge_waiting_jobs)
+                if purged:
+                    metrics.incr("media_jobs_purged", purged)
+                    logger.info("🧹 %s jobs de mensagens duplicadas removidos", purged)
+            jobs = await asyncio.to_thread(with_connection, claim_media_jobs, batch)
+            if jobs:
+                await asyncio.gather(*(process_job(downloader, job) for job in jobs))
+                continue
+            if once:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=MEDIA_WORKER_POLL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        emitter.cancel()
+        await downloader.close()
+        await client.aclose()
+        metrics.write_jsonl()
+
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Baixa a mídia enfileirada pela coleta e atualiza as mensagens.")
+    arg_parser.add_argument("--workers", type=int, default=MEDIA_WORKERS, help="Downloads simultâneos")
+    arg_parser.add_argument("--batch", type=int, default=MEDIA_WORKER_BATCH, help="Jobs reservados por vez")
+    arg_parser.add_argument("--once", action="store_true", help="Sai quando não houver jobs prontos")
+    arg_parser.add_argument("--log-level", default=COLLECTOR_LOG_LEVEL)
+    args = arg_parser.parse_args()
+    configure_logging(args.log_level)
+
+    asyncio.run(run_worker(args.workers, args.batch, args.once))
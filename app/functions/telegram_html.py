@@ -0,0 +1,136 @@
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+# Elementos sem tag de fechamento
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+BACKGROUND_URL = re.compile(r"url\(['\"]?(.*?)['\"]?\)")
+
+
+class ChannelPreviewParser(HTMLParser):
+    # Lê o HTML de t.me/s/<canal> em uma única passada, sem navegador.
+    # Cada div.tgme_widget_message_wrap vira um bloco com os mesmos campos
+    # que fetch_messages() extrai via Playwright.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Dict[str, Any]] = []
+        self.depth = 0
+        self.block: Optional[Dict[str, Any]] = None
+        self.block_depth = 0
+        self.text_depth = 0
+        self.text_parts: List[str] = []
+        self.in_date_link = False
+        self.photo_depth = 0
+
+    @staticmethod
+    def classes(attrs: Dict[str, Optional[str]]) -> List[str]:
+        return (attrs.get("class") or "").split()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag not in VOID_TAGS:
+            self.depth += 1
+        classes = self.classes(attrs)
+
+        if tag == "div" and "tgme_widget_message_wrap" in classes:
+            self.block = {"post": None, "datetime": None, "fallback_datetime": None,
+                          "text": None, "photos": [], "videos": []}
+            self.block_depth = self.depth
+            return
+
+        block = self.block
+        if block is None:
+            return
+
+        if self.text_depth:
+            if tag == "br":
+                self.text_parts.append("\n")
+            return
+
+        if tag == "div" and "tgme_widget_message" in classes and attrs.get("data-post"):
+            block["post"] = attrs["data-post"]
+        elif tag == "div" and "tgme_widget_message_text" in classes and block["text"] is None \
+                and "js-message_reply_text" not in classes:
+            self.text_depth = self.depth
+            self.text_parts = []
+        elif tag == "a" and "tgme_widget_message_date" in classes:
+            self.in_date_link = True
+        elif tag == "time" and attrs.get("datetime"):
+            if self.in_date_link and block["datetime"] is None:
+                block["datetime"] = attrs["datetime"]
+            elif block["fallback_datetime"] is None:
+                block["fallback_datetime"] = attrs["datetime"]
+        elif tag == "a" and "tgme_widget_message_photo_wrap" in classes:
+            self.photo_depth = self.depth
+            block["photos"].append({"style": attrs.get("style"), "img": None})
+        elif tag == "img" and self.photo_depth and block["photos"]:
+            photo = block["photos"][-1]
+            if photo["img"] is None:
+                photo["img"] = attrs.get("src")
+        elif tag == "video":
+            block["videos"].append({"src": attrs.get("src"), "poster": attrs.get("poster")})
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        depth = self.depth
+        self.depth -= 1
+        if self.block is None:
+            return
+
+        if self.text_depth and depth == self.text_depth:
+            self.block["text"] = "".join(self.text_parts)
+            self.text_depth = 0
+        if tag == "a":
+            self.in_date_link = False
+            if self.photo_depth == depth:
+                self.photo_depth = 0
+        if depth == self.block_depth:
+            self.blocks.append(self.finish_block(self.block))
+            self.block = None
+
+    def handle_data(self, data):
+        if self.text_depth:
+            self.text_parts.append(data)
+
+    @staticmethod
+    def finish_block(block: Dict[str, Any]) -> Dict[str, Any]:
+        photos = []
+        for photo in block["photos"]:
+            # Mesma regra do Playwright: <img src> primeiro, senão background-image
+            if photo["img"]:
+                photos.append(photo["img"])
+            elif photo["style"] and "background-image" in photo["style"]:
+                match = BACKGROUND_URL.search(photo["style"])
+                if match:
+                    photos.append(match.group(1))
+        return {
+            "post": block["post"],
+            "post_id": parse_post_id(block["post"]),
+            "datetime": block["datetime"] or block["fallback_datetime"],
+            "text": (block["text"] or "").strip(),
+            "photos": photos,
+            "videos": block["videos"],
+        }
+
+
+def parse_post_id(data_post: Optional[str]) -> Optional[int]:
+    # data-post vem no formato "<canal>/<id>"
+    if not data_post:
+        return None
+    try:
+        return int(data_post.rsplit("/", 1)[-1])
+    except ValueError:
+        return None
+
+
+def parse_channel_html(html: str) -> List[Dict[str, Any]]:
+    parser = ChannelPreviewParser()
+    parser.feed(html)
+    parser.close()
+    return parser.blocks
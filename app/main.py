@@ -1,6 +1,11 @@
-from fastapi import FastAPI
-from app.database.connection import initialize_database
-from app.routes import channels, countrys, priorities, alert_categories, messages, alerts
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.core.metrics import QueryStats, current_query_stats, request_counters, request_db_time, request_latency
+from app.core.profiling import profiler
+from app.database.connection import initialize_database, PoolTimeoutError
+from app.database.executor import DatabaseBusyError, DB_RETRY_AFTER
+from app.routes import channels, countrys, priorities, alert_categories, messages, alerts, database, metrics, events, media, export, stats
 
 
 app = FastAPI(
@@ -10,9 +15,66 @@ app = FastAPI(
 
 initialize_database()
 
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    # Latência, SQL (via cursor do pool) e bytes por rota; opcionalmente perfil por amostragem
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    profile = profiler.start_request() if profiler.should_profile() else None
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_query_stats.reset(token)
+    elapsed = time.perf_counter() - started
+
+    # Agrupa pelo template da rota (/messages/get), não pela URL concreta
+    route = request.scope.get("route")
+    # Sem rota (404 etc.): rótulo fixo, senão cada URL vira uma série nova
+    key = f"{request.method} {getattr(route, 'path', '<unmatched>')}"
+    request_latency.observe(key, elapsed)
+    request_db_time.observe(key, stats.seconds)
+    request_counters.incr(f"responses_{response.status_code // 100}xx", key)
+    request_counters.incr("sql_statements", key, stats.statements)
+    request_counters.incr("request_bytes", key, int(request.headers.get("content-length") or 0))
+    request_counters.incr("response_bytes", key, int(response.headers.get("content-length") or 0))
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.seconds * 1000:.2f};desc="{stats.statements} sql", app;dur={elapsed * 1000:.2f}'
+    )
+    if profile is not None:
+        profiler.finish_request(profile, elapsed, f"{key} {response.status_code}",
+                                f"sql={stats.statements} db={stats.seconds * 1000:.1f}ms")
+    return response
+
+
+@app.exception_handler(DatabaseBusyError)
+async def database_busy_handler(request: Request, exc: DatabaseBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(DB_RETRY_AFTER)}
+    )
+
+
 app.include_router(alerts.router)
 app.include_router(messages.router)
 app.include_router(alert_categories.router)
 app.include_router(priorities.router)
 app.include_router(channels.router)
 app.include_router(countrys.router)
+app.include_router(database.router)
+app.include_router(metrics.router)
+app.include_router(events.router)
+app.include_router(media.router)
+app.include_router(export.router)
+app.include_router(stats.router)
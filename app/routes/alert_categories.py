@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
 import sqlite3
-from app.database.connection import create_connection
+from app.core.cache import cached_response, reference_cache
+from app.database.executor import run_db
 
 router = APIRouter(
     prefix="/alerts_categories",
@@ -16,22 +17,13 @@ class AlertCategoryResponse(BaseModel):
     id: int
     name: str
 
-@router.get("/get", response_model=List[AlertCategoryResponse])
-def list_alert_categories():
-    conn = create_connection()
+def select_alert_categories(conn: sqlite3.Connection):
     cursor = conn.cursor()
+    cursor.execute("SELECT id, name FROM alert_categories;")
+    rows = cursor.fetchall()
+    return [{"id": row[0], "name": row[1]} for row in rows]
 
-    try:
-        cursor.execute("SELECT id, name FROM alert_categories;")
-        rows = cursor.fetchall()
-        return [{"id": row[0], "name": row[1]} for row in rows]
-    finally:
-        conn.close()
-
-
-@router.post("/create", response_model=AlertCategoryResponse)
-def create_alert_category(category: AlertCategoryCreate):
-    conn = create_connection()
+def insert_alert_category(conn: sqlite3.Connection, category: AlertCategoryCreate):
     cursor = conn.cursor()
 
     try:
@@ -46,5 +38,15 @@ def create_alert_category(category: AlertCategoryCreate):
         }
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Categoria já cadastrada ou erro de integridade.")
-    finally:
-        conn.close()
\ No newline at end of file
+
+
+@router.get("/get", response_model=List[AlertCategoryResponse])
+async def list_alert_categories(request: Request):
+    return await cached_response(request, "alert_categories", lambda: run_db(select_alert_categories))
+
+
+@router.post("/create", response_model=AlertCategoryResponse)
+async def create_alert_category(category: AlertCategoryCreate):
+    created = await run_db(insert_alert_category, category)
+    reference_cache.invalidate("alert_categories")
+    return created
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import sqlite3
 import json
 from datetime import datetime, timedelta
-from app.database.connection import create_connection
+from app.core.events import broker
+from app.core.stats import record_event
+from app.database.executor import run_db
+from app.database.geo import (
+    MAX_RADIUS_KM, GeoQueryError, alerts_in_boxes, alerts_near, parse_coordinates, split_antimeridian
+)
+from app.database.stats import StatsQueryError, parse_window
+from app.database.queries import (
+    fetch_rows, fetch_search_rows, stream_ndjson, utc_timestamp, SearchQueryError,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_SEARCH_SIZE, MAX_SEARCH_SIZE
+)
 
 router = APIRouter(
     prefix="/alerts",
@@ -35,49 +46,118 @@ class AlertResponse(BaseModel):
     timestamp: str
     coordinates: Optional[str]
 
+class AlertGeoResult(AlertResponse):
+    latitude: float
+    longitude: float
+    distance_km: Optional[float] = None
+
+class AlertSearchResult(AlertResponse):
+    title_snippet: Optional[str]
+    description_snippet: Optional[str]
+    score: float
+
+
+def row_to_alert(row: tuple) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "message_ids": json.loads(row[1]),
+        "priority_id": row[2],
+        "country_id": row[3],
+        "title": row[4],
+        "short_description": row[5],
+        "alert_body": json.loads(row[6]) if row[6] else None,
+        "images": row[7],
+        "video": row[8],
+        "timestamp": row[9],
+        "coordinates": row[10],
+    }
+
 
 @router.get("/get", response_model=List[AlertResponse])
-def list_alerts():
-    conn = create_connection()
-    cursor = conn.cursor()
+async def list_alerts(
+    response: Response,
+    after_id: Optional[int] = Query(None, description="Retorna alertas com id maior que este"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    stream: bool = Query(False, description="Envia todas as linhas como NDJSON em streaming")
+):
+    query = """
+        SELECT id, message_ids, priority_id, country_id, title,
+               short_description, alert_body, images, video,
+               timestamp, coordinates
+        FROM alerts
+        WHERE id > ?
+        ORDER BY id
+    """
+    params: List[Any] = [after_id or 0]
+
+    if stream:
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return StreamingResponse(stream_ndjson(query, params, row_to_alert), media_type="application/x-ndjson")
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = await run_db(fetch_rows, query + " LIMIT ?", params + [page_size])
+    if len(rows) == page_size:
+        response.headers["X-Next-After-Id"] = str(rows[-1][0])
+    return [row_to_alert(row) for row in rows]
+
+@router.get("/search", response_model=List[AlertSearchResult])
+async def search_alerts(
+    q: str = Query(..., min_length=1, description="Consulta FTS5 sobre título e descrição curta"),
+    since: Optional[str] = Query(None, description="Timestamp mínimo (ISO)"),
+    until: Optional[str] = Query(None, description="Timestamp máximo (ISO)"),
+    country_id: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_SEARCH_SIZE, ge=1, le=MAX_SEARCH_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    # Título pesa mais que a descrição no bm25
+    query = """
+        SELECT a.id, a.message_ids, a.priority_id, a.country_id, a.title,
+               a.short_description, a.alert_body, a.images, a.video,
+               a.timestamp, a.coordinates,
+               snippet(alerts_fts, 0, '<b>', '</b>', '…', 16),
+               snippet(alerts_fts, 1, '<b>', '</b>', '…', 16),
+               bm25(alerts_fts, 2.0, 1.0)
+        FROM alerts_fts
+        JOIN alerts a ON a.id = alerts_fts.rowid
+    """
+    filters = ["alerts_fts MATCH ?"]
+    params: List[Any] = [q]
+
+    if country_id:
+        filters.append("a.country_id = ?")
+        params.append(country_id)
+    if since:
+        filters.append("a.timestamp >= ?")
+        params.append(since)
+    if until:
+        filters.append("a.timestamp <= ?")
+        params.append(until)
+
+    query += " WHERE " + " AND ".join(filters) + " ORDER BY bm25(alerts_fts, 2.0, 1.0) LIMIT ? OFFSET ?"
+    params += [limit, offset]
+
     try:
-        cursor.execute("""
-            SELECT id, message_ids, priority_id, country_id, title,
-                   short_description, alert_body, images, video,
-                   timestamp, coordinates
-            FROM alerts
-        """)
-        rows = cursor.fetchall()
-        return [
-            {
-                "id": row[0],
-                "message_ids": json.loads(row[1]),
-                "priority_id": row[2],
-                "country_id": row[3],
-                "title": row[4],
-                "short_description": row[5],
-                "alert_body": json.loads(row[6]) if row[6] else None,
-                "images": row[7],
-                "video": row[8],
-                "timestamp": row[9],
-                "coordinates": row[10],
-            }
-            for row in rows
-        ]
-    finally:
-        conn.close()
+        rows = await run_db(fetch_search_rows, query, params)
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Consulta de busca inválida: {e}")
+    return [
+        {**row_to_alert(row), "title_snippet": row[11], "description_snippet": row[12], "score": row[13]}
+        for row in rows
+    ]
 
-@router.post("/create", response_model=AlertResponse)
-def create_alert(alert: AlertCreate):
-    conn = create_connection()
+def insert_alert(conn: sqlite3.Connection, alert: AlertCreate):
     cursor = conn.cursor()
     try:
-        now = datetime.utcnow().isoformat()
+        now = utc_timestamp()
+        # Texto original é mantido; lat/lon numéricos alimentam o índice R*Tree
+        point = parse_coordinates(alert.coordinates) or (None, None)
         cursor.execute("""
             INSERT INTO alerts (
                 message_ids, priority_id, country_id, title, short_description,
-                alert_body, images, video, timestamp, coordinates
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                alert_body, images, video, timestamp, coordinates, latitude, longitude
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             json.dumps(alert.message_ids),
             alert.priority_id,
@@ -88,11 +168,17 @@ def create_alert(alert: AlertCreate):
             alert.images,
             alert.video,
             now,
-            alert.coordinates
+            alert.coordinates,
+            *point
         ))
+        alert_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT OR IGNORE INTO alert_messages (alert_id, message_id) VALUES (?, ?)",
+            [(alert_id, message_id) for message_id in alert.message_ids]
+        )
         conn.commit()
         return {
-            "id": cursor.lastrowid,
+            "id": alert_id,
             "message_ids": alert.message_ids,
             "priority_id": alert.priority_id,
             "country_id": alert.country_id,
@@ -102,11 +188,84 @@ def create_alert(alert: AlertCreate):
             "images": alert.images,
             "video": alert.video,
             "timestamp": now,
-            "coordinates": alert.coordinates
+            "coordinates": alert.coordinates,
+            "latitude": point[0],
+            "longitude": point[1]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
+def row_to_geo_alert(row: tuple, distance_km: Optional[float] = None) -> Dict[str, Any]:
+    alert = {**row_to_alert(row), "latitude": row[11], "longitude": row[12]}
+    if distance_km is not None:
+        alert["distance_km"] = round(distance_km, 3)
+    return alert
+
+
+def resolve_since(since: Optional[str], window: Optional[str]) -> Optional[str]:
+    # alerts.timestamp é gravado em UTC
+    if since or not window:
+        return since
+    try:
+        minutes = parse_window(window)
+    except StatsQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return utc_timestamp(datetime.utcnow() - timedelta(minutes=minutes))
+
+
+@router.get("/get/bbox", response_model=List[AlertGeoResult])
+async def alerts_in_bbox(
+    response: Response,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180, description="Maior que max_lon cruza o antimeridiano"),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    since: Optional[str] = Query(None, description="Timestamp mínimo (ISO, UTC)"),
+    until: Optional[str] = Query(None, description="Timestamp máximo (ISO, UTC)"),
+    window: Optional[str] = Query(None, description="Alternativa a since: 30m, 1h, 24h"),
+    country_id: Optional[int] = None,
+    priority_id: Optional[int] = None,
+    after_id: Optional[int] = Query(None, description="Retorna alertas com id maior que este"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página")
+):
+    # Alertas dentro da área visível do mapa, paginados por id
+    try:
+        boxes = split_antimeridian(min_lat, min_lon, max_lat, max_lon)
+    except GeoQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = await run_db(alerts_in_boxes, boxes, resolve_since(since, window), until,
+                        country_id, priority_id, after_id or 0, limit)
+    if len(rows) == limit:
+        response.headers["X-Next-After-Id"] = str(rows[-1][0])
+    return [row_to_geo_alert(row) for row in rows]
+
+
+@router.get("/get/near", response_model=List[AlertGeoResult])
+async def alerts_near_point(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, le=MAX_RADIUS_KM),
+    since: Optional[str] = Query(None, description="Timestamp mínimo (ISO, UTC)"),
+    until: Optional[str] = Query(None, description="Timestamp máximo (ISO, UTC)"),
+    window: Optional[str] = Query(None, description="Alternativa a since: 30m, 1h, 24h"),
+    country_id: Optional[int] = None,
+    priority_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_SEARCH_SIZE, ge=1, le=MAX_SEARCH_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    # Alertas dentro do raio, do mais próximo para o mais distante
+    try:
+        matches = await run_db(alerts_near, lat, lon, radius_km, resolve_since(since, window), until,
+                               country_id, priority_id)
+    except GeoQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [row_to_geo_alert(row, distance) for distance, row in matches[offset:offset + limit]]
+
+
+@router.post("/create", response_model=AlertResponse)
+async def create_alert(alert: AlertCreate):
+    created = await run_db(insert_alert, alert)
+    if broker.publish("alerts", {**created, "category_id": created["priority_id"]}):
+        record_event("alerts", created)
+    return created
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import List, Optional
 import sqlite3
-from app.database.connection import create_connection
-from app.database.queries import list_channels
+from app.core.cache import cached_response, reference_cache
+from app.database.executor import run_db
 
 router = APIRouter(
     prefix="/channels",
@@ -19,31 +19,19 @@ class ChannelListResponse(BaseModel):
     link: str
     country_id: int
 
-@router.get("/get", response_model=List[ChannelListResponse])
-def get_channels():
-    return list_channels()
-
-@router.get("/channels/get/filter", response_model=List[ChannelListResponse])
-def filter_channels(country_id: Optional[int] = Query(None, description="Filtrar por ID do país")):
-    conn = create_connection()
+def select_channels(conn: sqlite3.Connection, country_id: Optional[int] = None):
     cursor = conn.cursor()
-    try:
-        if country_id is not None:
-            cursor.execute("SELECT id, link, country_id FROM channels WHERE country_id = ?", (country_id,))
-        else:
-            cursor.execute("SELECT id, link, country_id FROM channels")
-        rows = cursor.fetchall()
-        return [
-            {"id": row[0], "link": row[1], "country_id": row[2]}
-            for row in rows
-        ]
-    finally:
-        conn.close()
-
+    if country_id is not None:
+        cursor.execute("SELECT id, link, country_id FROM channels WHERE country_id = ?", (country_id,))
+    else:
+        cursor.execute("SELECT id, link, country_id FROM channels")
+    rows = cursor.fetchall()
+    return [
+        {"id": row[0], "link": row[1], "country_id": row[2]}
+        for row in rows
+    ]
 
-@router.post("/create", response_model=ChannelListResponse)
-def create_channel(channel: ChannelCreate):
-    conn = create_connection()
+def insert_channel(conn: sqlite3.Connection, channel: ChannelCreate):
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -58,6 +46,19 @@ def create_channel(channel: ChannelCreate):
         }
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Canal já existe ou país não encontrado.")
-    finally:
-        conn.close()
 
+@router.get("/get", response_model=List[ChannelListResponse])
+async def get_channels(request: Request):
+    return await cached_response(request, "channels", lambda: run_db(select_channels))
+
+@router.get("/channels/get/filter", response_model=List[ChannelListResponse])
+async def filter_channels(request: Request, country_id: Optional[int] = Query(None, description="Filtrar por ID do país")):
+    key = "channels" if country_id is None else f"channels:country:{country_id}"
+    return await cached_response(request, key, lambda: run_db(select_channels, country_id))
+
+
+@router.post("/create", response_model=ChannelListResponse)
+async def create_channel(channel: ChannelCreate):
+    created = await run_db(insert_channel, channel)
+    reference_cache.invalidate("channels")
+    return created
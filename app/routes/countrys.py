@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
 import sqlite3
-from app.database.connection import create_connection
+from app.core.cache import cached_response, reference_cache
+from app.database.executor import run_db
 
 router = APIRouter(
     prefix="/countrys",
@@ -16,22 +17,13 @@ class CountryResponse(BaseModel):
     id: int
     name: str
 
-@router.get("/get", response_model=List[CountryResponse])
-def list_countrys():
-    conn = create_connection()
+def select_countrys(conn: sqlite3.Connection):
     cursor = conn.cursor()
+    cursor.execute("SELECT id, name FROM countrys;")
+    results = cursor.fetchall()
+    return [{"id": row[0], "name": row[1]} for row in results]
 
-    try:
-        cursor.execute("SELECT id, name FROM countrys;")
-        results = cursor.fetchall()
-        return [{"id": row[0], "name": row[1]} for row in results]
-    finally:
-        conn.close()
-
-
-@router.post("/create", response_model=CountryResponse)
-def create_country(country: CountryCreate):
-    conn = create_connection()
+def insert_country(conn: sqlite3.Connection, country: CountryCreate):
     cursor = conn.cursor()
 
     try:
@@ -40,6 +32,15 @@ def create_country(country: CountryCreate):
         return {"id": cursor.lastrowid, "name": country.name}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="País já cadastrado ou erro de integridade.")
-    finally:
-        conn.close()
 
+
+@router.get("/get", response_model=List[CountryResponse])
+async def list_countrys(request: Request):
+    return await cached_response(request, "countrys", lambda: run_db(select_countrys))
+
+
+@router.post("/create", response_model=CountryResponse)
+async def create_country(country: CountryCreate):
+    created = await run_db(insert_country, country)
+    reference_cache.invalidate("countrys")
+    return created
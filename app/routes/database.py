@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+import sqlite3
+from app.database.connection import pool
+from app.database.executor import db, run_db
+from app.database.migrations import current_version, pending_migrations, explain_hot_queries
+from app.database.retention import retention_status
+
+router = APIRouter(
+    prefix="/database",
+    tags=["Database"]
+)
+
+def select_schema_status(conn: sqlite3.Connection):
+    return {
+        "version": current_version(conn),
+        "pending": [{"version": version, "name": name} for version, name, _ in pending_migrations(conn)],
+    }
+
+@router.get("/pool")
+async def pool_stats():
+    return pool.stats()
+
+@router.get("/executor")
+async def executor_stats():
+    return db.stats()
+
+@router.get("/schema")
+async def schema_status():
+    return await run_db(select_schema_status)
+
+@router.get("/plans")
+async def query_plans():
+    return await run_db(explain_hot_queries)
+
+@router.get("/retention")
+async def retention():
+    return await run_db(retention_status)
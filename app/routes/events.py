@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import sqlite3
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.events import broker, Subscription
+from app.core.stats import record_event
+from app.database.executor import run_db
+from app.routes.alerts import row_to_alert
+from app.routes.messages import row_to_message
+
+EVENT_KEEPALIVE = float(os.getenv("EVENT_KEEPALIVE", "15"))
+EVENT_REPLAY_BATCH = 500
+EVENT_TAIL_INTERVAL = float(os.getenv("EVENT_TAIL_INTERVAL", "2"))
+
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"]
+)
+
+
+def replay_messages(conn: sqlite3.Connection, after_id: int) -> List[Dict[str, Any]]:
+    rows = conn.execute("""
+        SELECT m.id, m.channel_id, m.timestamp, m.text, m.links, m.images, m.video, c.country_id
+        FROM messages m
+        LEFT JOIN channels c ON c.id = m.channel_id
+        WHERE m.id > ?
+        ORDER BY m.id
+        LIMIT ?
+    """, (after_id, EVENT_REPLAY_BATCH)).fetchall()
+    return [{**row_to_message(row), "country_id": row[7]} for row in rows]
+
+
+def replay_alerts(conn: sqlite3.Connection, after_id: int) -> List[Dict[str, Any]]:
+    rows = conn.execute("""
+        SELECT id, message_ids, priority_id, country_id, title,
+               short_description, alert_body, images, video,
+               timestamp, coordinates
+        FROM alerts
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (after_id, EVENT_REPLAY_BATCH)).fetchall()
+    return [alert_event(row_to_alert(row)) for row in rows]
+
+
+REPLAY: Dict[str, Callable[[sqlite3.Connection, int], List[Dict[str, Any]]]] = {
+    "messages": replay_messages,
+    "alerts": replay_alerts,
+}
+
+
+def last_message_id(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+
+async def tail_messages():
+    # Mensagens gravadas por outro processo (collect_messages --direct) não passam
+    # pelas rotas: enquanto houver inscritos, publica o que aparecer no banco.
+    # O que a própria API inseriu e já publicou é descartado pelo broker
+    after_id = await run_db(last_message_id)
+    while broker.has_subscribers("messages"):
+        await asyncio.sleep(EVENT_TAIL_INTERVAL)
+        while True:
+            batch = await run_db(replay_messages, after_id)
+            for event in batch:
+                after_id = event["id"]
+                if broker.publish("messages", event):
+                    record_event("messages", event)
+            if len(batch) < EVENT_REPLAY_BATCH:
+                break
+
+
+_tail_task: Optional["asyncio.Task[None]"] = None
+
+
+def ensure_tail(topic: str):
+    global _tail_task
+    if topic == "messages" and (_tail_task is None or _tail_task.done()):
+        _tail_task = asyncio.create_task(tail_messages())
+
+
+def topic_filters(topic: str, country_id: Optional[int], priority_id: Optional[int],
+                  category_id: Optional[int]) -> Dict[str, Any]:
+    if topic == "messages":
+        return {"country_id": country_id}
+    return {"country_id": country_id, "priority_id": priority_id, "category_id": category_id}
+
+
+def alert_event(alert: Dict[str, Any]) -> Dict[str, Any]:
+    # Mesma regra do /messages/get/filter: a categoria é alerts.priority_id
+    return {**alert, "category_id": alert["priority_id"]}
+
+
+async def follow(subscription: Subscription, last_id: Optional[int]) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    # Reenvia do banco o que foi perdido desde last_id e depois segue a fila ao vivo.
+    # A inscrição é feita antes do replay, então nada se perde entre os dois.
+    # Só os eventos ao vivo até o maior id do replay são repetidos e descartados;
+    # depois disso a fila vai sem filtro por id, porque inserções concorrentes
+    # podem publicar fora de ordem (11 antes de 10). None = keepalive.
+    replayed_up_to = last_id or 0
+    if last_id is not None:
+        while True:
+            batch = await run_db(REPLAY[subscription.topic], replayed_up_to)
+            for event in batch:
+                replayed_up_to = event["id"]
+                if subscription.matches(event):
+                    yield event
+            if len(batch) < EVENT_REPLAY_BATCH:
+                break
+
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), timeout=EVENT_KEEPALIVE)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if event is None:
+            return
+        if event["id"] <= replayed_up_to:
+            continue
+        yield event
+
+
+async def sse_stream(request: Request, topic: str, filters: Dict[str, Any],
+                     last_id: Optional[int]) -> AsyncIterator[str]:
+    subscription = broker.subscribe(topic, filters)
+    ensure_tail(topic)
+    try:
+        async for event in follow(subscription, last_id):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {topic}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def sse_response(request: Request, topic: str, filters: Dict[str, Any], last_id: Optional[int]) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(request, topic, filters, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/messages")
+async def message_events(
+    request: Request,
+    country_id: Optional[int] = Query(None),
+    last_id: Optional[int] = Query(None, description="Retoma após este id"),
+    last_event_id: Optional[int] = Header(None)
+):
+    return sse_response(request, "messages", topic_filters("messages", country_id, None, None),
+                        last_id if last_id is not None else last_event_id)
+
+
+@router.get("/alerts")
+async def alert_events(
+    request: Request,
+    country_id: Optional[int] = Query(None),
+    priority_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    last_id: Optional[int] = Query(None, description="Retoma após este id"),
+    last_event_id: Optional[int] = Header(None)
+):
+    return sse_response(request, "alerts", topic_filters("alerts", country_id, priority_id, category_id),
+                        last_id if last_id is not None else last_event_id)
+
+
+@router.websocket("/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    topic: str = Query("messages"),
+    country_id: Optional[int] = Query(None),
+    priority_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    last_id: Optional[int] = Query(None)
+):
+    if topic not in REPLAY:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscription = broker.subscribe(topic, topic_filters(topic, country_id, priority_id, category_id))
+    ensure_tail(topic)
+    try:
+        async for event in follow(subscription, last_id):
+            if event is None:
+                await websocket.send_json({"type": "keepalive"})
+                continue
+            await websocket.send_json({"type": topic, "data": event})
+        # Fila estourou: fecha para o cliente reconectar com last_id
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/stats")
+async def event_stats():
+    return broker.stats()
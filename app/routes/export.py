@@ -0,0 +1,48 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.database.export import DATASETS, EXPORT_FORMATS, ExportError, stream_export
+
+router = APIRouter(
+    prefix="/export",
+    tags=["Export"]
+)
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("parquet", description="parquet ou arrow (IPC stream)"),
+    since: Optional[str] = Query(None, description="Timestamp inicial (inclusive)"),
+    until: Optional[str] = Query(None, description="Timestamp final (exclusivo)"),
+    country_id: Optional[int] = None,
+    watermark: Optional[str] = Query(None, description="Exportação incremental: só linhas novas desde a última"),
+):
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail="Dataset não encontrado.")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido (use {', '.join(EXPORT_FORMATS)}).")
+    try:
+        chunks = stream_export(dataset, format, since=since, until=until, country_id=country_id, watermark=watermark)
+        # Valida o watermark e gera o primeiro lote antes de começar a resposta,
+        # fora do event loop; o resto do gerador o StreamingResponse já itera
+        # num threadpool
+        first = await run_in_threadpool(next, chunks)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def body():
+        yield first
+        yield from chunks
+
+    extension = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'},
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.database.executor import run_db
+from app.database.jobs import media_queue_stats
+
+router = APIRouter(
+    prefix="/media",
+    tags=["Media"]
+)
+
+@router.get("/queue")
+async def queue_stats():
+    return await run_db(media_queue_stats)
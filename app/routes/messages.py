@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional, Tuple
 import sqlite3
-from app.database.connection import create_connection
+import json
+from app.core.events import broker
+from app.core.clustering import CLUSTER_WINDOW_HOURS, cluster_index
+from app.core.stats import record_event
+from app.database.executor import run_db
+from app.database.stats import StatsQueryError, parse_window
+from app.database.queries import (
+    MESSAGE_INSERT_SQL, message_content_hash, find_duplicate_message, utc_timestamp,
+    fetch_rows, fetch_search_rows, stream_ndjson, SearchQueryError,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_SEARCH_SIZE, MAX_SEARCH_SIZE
+)
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException, Query
 
 router = APIRouter(
     prefix="/messages",
@@ -17,6 +27,7 @@ class MessageCreate(BaseModel):
     links: Optional[str] = None
     images: Optional[str] = None
     video: Optional[str] = None
+    source_post_id: Optional[int] = None
 
 class MessageResponse(BaseModel):
     id: int
@@ -27,48 +38,139 @@ class MessageResponse(BaseModel):
     images: Optional[str]
     video: Optional[str]
 
+class MessageSearchResult(MessageResponse):
+    snippet: Optional[str]
+    score: float
+
+class MessageCluster(BaseModel):
+    size: int
+    channels: int
+    first_timestamp: str
+    last_timestamp: str
+    message_ids: List[int]
+    channel_ids: List[int]
+    country_ids: List[int]
+    text: Optional[str]
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    duplicate: bool = False
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    inserted: int
+    duplicates: int = 0
+    failed: int
+    results: List[BulkItemResult]
+
+def row_to_message(row: tuple) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "channel_id": row[1],
+        "timestamp": row[2],
+        "text": row[3],
+        "links": row[4],
+        "images": row[5],
+        "video": row[6],
+    }
+
 @router.get("/get", response_model=List[MessageResponse])
-def list_messages():
-    conn = create_connection()
-    cursor = conn.cursor()
+async def list_messages(
+    response: Response,
+    after_id: Optional[int] = Query(None, description="Retorna mensagens com id maior que este"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    stream: bool = Query(False, description="Envia todas as linhas como NDJSON em streaming")
+):
+    # Paginação por chave (id), sem OFFSET
+    query = "SELECT id, channel_id, timestamp, text, links, images, video FROM messages WHERE id > ? ORDER BY id"
+    params: List[Any] = [after_id or 0]
+
+    if stream:
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return StreamingResponse(stream_ndjson(query, params, row_to_message), media_type="application/x-ndjson")
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    rows = await run_db(fetch_rows, query + " LIMIT ?", params + [page_size])
+    if len(rows) == page_size:
+        response.headers["X-Next-After-Id"] = str(rows[-1][0])
+    return [row_to_message(row) for row in rows]
+
+@router.get("/search", response_model=List[MessageSearchResult])
+async def search_messages(
+    q: str = Query(..., min_length=1, description="Consulta FTS5 (termos, \"frases\", OR, prefixo*)"),
+    since: Optional[str] = Query(None, description="Timestamp mínimo (ISO)"),
+    until: Optional[str] = Query(None, description="Timestamp máximo (ISO)"),
+    country_id: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_SEARCH_SIZE, ge=1, le=MAX_SEARCH_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    query = """
+        SELECT m.id, m.channel_id, m.timestamp, m.text, m.links, m.images, m.video,
+               snippet(messages_fts, 0, '<b>', '</b>', '…', 16),
+               bm25(messages_fts)
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+    """
+    filters = ["messages_fts MATCH ?"]
+    params: List[Any] = [q]
+
+    if country_id:
+        query += " JOIN channels c ON c.id = m.channel_id "
+        filters.append("c.country_id = ?")
+        params.append(country_id)
+    if since:
+        filters.append("m.timestamp >= ?")
+        params.append(since)
+    if until:
+        filters.append("m.timestamp <= ?")
+        params.append(until)
+
+    query += " WHERE " + " AND ".join(filters) + " ORDER BY bm25(messages_fts) LIMIT ? OFFSET ?"
+    params += [limit, offset]
+
     try:
-        cursor.execute("SELECT id, channel_id, timestamp, text, links, images, video FROM messages")
-        rows = cursor.fetchall()
-        return [
-            {
-                "id": row[0],
-                "channel_id": row[1],
-                "timestamp": row[2],
-                "text": row[3],
-                "links": row[4],
-                "images": row[5],
-                "video": row[6],
-            } for row in rows
-        ]
-    finally:
-        conn.close()
+        rows = await run_db(fetch_search_rows, query, params)
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Consulta de busca inválida: {e}")
+    return [{**row_to_message(row), "snippet": row[7], "score": row[8]} for row in rows]
 
-@router.post("/create", response_model=MessageResponse)
-def create_message(message: MessageCreate):
-    conn = create_connection()
+def insert_message(cursor: sqlite3.Cursor, message: MessageCreate, timestamp: str) -> Tuple[int, bool]:
+    # Inserção idempotente: retorna (id, duplicada)
+    content_hash = message_content_hash(message.text)
+    cursor.execute(MESSAGE_INSERT_SQL, (
+        message.channel_id,
+        timestamp,
+        message.text,
+        message.links,
+        message.images,
+        message.video,
+        message.source_post_id,
+        content_hash
+    ))
+    if cursor.rowcount:
+        return cursor.lastrowid, False
+    return find_duplicate_message(cursor, message.channel_id, message.source_post_id, content_hash), True
+
+
+def store_message(conn: sqlite3.Connection, message: MessageCreate) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    # Retorna a mensagem e o evento do feed (None para duplicadas)
     cursor = conn.cursor()
     try:
-        current_timestamp = datetime.now().isoformat() 
-
-        cursor.execute("""
-            INSERT INTO messages (channel_id, timestamp, text, links, images, video)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, ( 
-            message.channel_id,
-            current_timestamp,
-            message.text,
-            message.links,
-            message.images,
-            message.video
-        ))
+        current_timestamp = utc_timestamp()
+
+        message_id, duplicate = insert_message(cursor, message, current_timestamp)
         conn.commit()
-        return {
-            "id": cursor.lastrowid,
+        if duplicate:
+            cursor.execute(
+                "SELECT id, channel_id, timestamp, text, links, images, video FROM messages WHERE id = ?",
+                (message_id,)
+            )
+            return row_to_message(cursor.fetchone()), None
+        stored = {
+            "id": message_id,
             "channel_id": message.channel_id,
             "timestamp": current_timestamp,
             "text": message.text,
@@ -76,88 +178,205 @@ def create_message(message: MessageCreate):
             "images": message.images,
             "video": message.video,
         }
+        cursor.execute("SELECT country_id FROM channels WHERE id = ?", (message.channel_id,))
+        row = cursor.fetchone()
+        return stored, {**stored, "country_id": row[0] if row else None}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Erro ao inserir mensagem. Verifique o canal.")
-    finally:
-        conn.close()
 
-    conn = create_connection()
+
+@router.post("/create", response_model=MessageResponse)
+async def create_message(message: MessageCreate):
+    stored, event = await run_db(store_message, message)
+    if event and broker.publish("messages", event):
+        record_event("messages", event)
+    return stored
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> List[Any]:
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("O corpo deve ser uma lista de mensagens.")
+    return items
+
+
+def insert_bulk(conn: sqlite3.Connection, items: List[Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    # Retorna o resumo por item e os eventos das mensagens novas
+    results: List[Dict[str, Any]] = []
+    events: List[Dict[str, Any]] = []
+    valid: List[tuple] = []
+
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item deve ser um objeto JSON.")
+            valid.append((index, MessageCreate(**item)))
+        except (ValidationError, ValueError) as e:
+            results.append({"index": index, "error": str(e)})
+
+    # Valida todos os canais com uma única consulta
+    channel_ids = {message.channel_id for _, message in valid}
+    known: Dict[int, Optional[int]] = {}
+    if channel_ids:
+        placeholders = ", ".join("?" for _ in channel_ids)
+        cursor = conn.execute(f"SELECT id, country_id FROM channels WHERE id IN ({placeholders})", tuple(channel_ids))
+        known = dict(cursor.fetchall())
+
     cursor = conn.cursor()
+    current_timestamp = utc_timestamp()
     try:
-        cursor.execute("""
-            INSERT INTO messages (channel_id, timestamp, text, links, images, video)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            message.channel_id,
-            message.timestamp,
-            message.text,
-            message.links,
-            message.images,
-            message.video
-        ))
+        cursor.execute("BEGIN IMMEDIATE")
+        for index, message in valid:
+            if message.channel_id not in known:
+                results.append({"index": index, "error": "Canal não encontrado."})
+                continue
+            message_id, duplicate = insert_message(cursor, message, current_timestamp)
+            results.append({"index": index, "id": message_id, "duplicate": duplicate})
+            if not duplicate:
+                events.append({
+                    "id": message_id,
+                    "channel_id": message.channel_id,
+                    "timestamp": current_timestamp,
+                    "text": message.text,
+                    "links": message.links,
+                    "images": message.images,
+                    "video": message.video,
+                    "country_id": known[message.channel_id],
+                })
         conn.commit()
-        return {
-            "id": cursor.lastrowid,
-            **message.dict()
-        }
-    except sqlite3.IntegrityError:
-        raise HTTPException(status_code=400, detail="Erro ao inserir mensagem. Verifique o canal.")
-    finally:
-        conn.close()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    results.sort(key=lambda r: r["index"])
+    duplicates = sum(1 for r in results if r.get("duplicate"))
+    stored = sum(1 for r in results if r.get("id") is not None)
+    return {
+        "inserted": stored - duplicates,
+        "duplicates": duplicates,
+        "failed": len(results) - stored,
+        "results": results
+    }, events
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def create_messages_bulk(request: Request):
+    # Aceita lista JSON ou NDJSON (application/x-ndjson)
+    body = await request.body()
+    try:
+        items = parse_bulk_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Corpo inválido: {e}")
+
+    try:
+        summary, events = await run_db(insert_bulk, items)
+    except sqlite3.Error:
+        raise HTTPException(status_code=400, detail="Erro ao inserir lote de mensagens.")
+    for event in events:
+        if broker.publish("messages", event):
+            record_event("messages", event)
+    return summary
 
 @router.get("/get/filter", response_model=List[MessageResponse])
-def filter_messages(
+async def filter_messages(
     country_id: Optional[int] = Query(None),
     category_id: Optional[int] = Query(None),
     priority_id: Optional[int] = Query(None)
 ):
-    conn = create_connection()
-    cursor = conn.cursor()
+    limit_timestamp = utc_timestamp(datetime.utcnow() - timedelta(minutes=30))
 
-    limit_timestamp = (datetime.utcnow() - timedelta(minutes=30)).isoformat()
+    query = """
+        SELECT DISTINCT m.id, m.channel_id, m.timestamp, m.text, m.links, m.images, m.video
+        FROM messages m
+        JOIN channels c ON m.channel_id = c.id
+    """
+    filters = ["m.timestamp >= ?"]
+    params = [limit_timestamp]
 
-    try:
-        query = """
-            SELECT m.id, m.channel_id, m.timestamp, m.text, m.links, m.images, m.video
-            FROM messages m
-            JOIN channels c ON m.channel_id = c.id
+    if country_id:
+        filters.append("c.country_id = ?")
+        params.append(country_id)
+
+    if category_id or priority_id:
+        query += """
+            JOIN alert_messages am ON am.message_id = m.id
+            JOIN alerts a ON a.id = am.alert_id
         """
-        filters = ["m.timestamp >= ?"]
-        params = [limit_timestamp]
-
-        if country_id:
-            filters.append("c.country_id = ?")
-            params.append(country_id)
-
-        if category_id or priority_id:
-            query += """
-                JOIN alerts a ON instr(a.message_ids, CAST(m.id AS TEXT)) > 0
-            """
-            if category_id:
-                query += " JOIN alert_categories ac ON a.priority_id = ac.id "
-                filters.append("ac.id = ?")
-                params.append(category_id)
-            if priority_id:
-                filters.append("a.priority_id = ?")
-                params.append(priority_id)
-
-        if filters:
-            query += " WHERE " + " AND ".join(filters)
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        return [
-            {
-                "id": row[0],
-                "channel_id": row[1],
-                "timestamp": row[2],
-                "text": row[3],
-                "links": row[4],
-                "images": row[5],
-                "video": row[6],
-            }
-            for row in rows
-        ]
-    finally:
-        conn.close()
+        if category_id:
+            query += " JOIN alert_categories ac ON a.priority_id = ac.id "
+            filters.append("ac.id = ?")
+            params.append(category_id)
+        if priority_id:
+            filters.append("a.priority_id = ?")
+            params.append(priority_id)
+
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+
+    rows = await run_db(fetch_rows, query, params)
+
+    return [row_to_message(row) for row in rows]
+
+
+CLUSTER_SYNC_BATCH = 1000
+
+def sync_cluster_index(conn: sqlite3.Connection) -> int:
+    # Indexa as mensagens novas desde a última sincronização (por id, como o
+    # replay dos eventos); na primeira vez, carrega a janela do índice
+    with cluster_index.sync_lock:
+        after_id = cluster_index.last_id
+        if not cluster_index.loaded:
+            since = utc_timestamp(datetime.utcnow() - timedelta(hours=CLUSTER_WINDOW_HOURS))
+            row = conn.execute("SELECT MIN(id) FROM messages WHERE timestamp >= ?", (since,)).fetchone()
+            after_id = max(after_id, (row[0] - 1) if row[0] else conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0])
+            cluster_index.last_id = after_id
+            cluster_index.loaded = True
+
+        indexed = 0
+        while True:
+            rows = conn.execute("""
+                SELECT m.id, m.channel_id, m.timestamp, m.text, c.country_id
+                FROM messages m
+                LEFT JOIN channels c ON c.id = m.channel_id
+                WHERE m.id > ?
+                ORDER BY m.id
+                LIMIT ?
+            """, (after_id, CLUSTER_SYNC_BATCH)).fetchall()
+            for message_id, channel_id, timestamp, text, country_id in rows:
+                cluster_index.add({"id": message_id, "channel_id": channel_id, "timestamp": timestamp,
+                                   "text": text, "country_id": country_id})
+                indexed += 1
+            if len(rows) < CLUSTER_SYNC_BATCH:
+                return indexed
+            after_id = rows[-1][0]
+
+
+def find_clusters(conn: sqlite3.Connection, since: str, until: Optional[str], country_id: Optional[int],
+                  min_size: int, min_channels: int) -> List[Dict[str, Any]]:
+    sync_cluster_index(conn)
+    return cluster_index.clusters(since, until, country_id, min_size, min_channels)
+
+
+@router.get("/clusters", response_model=List[MessageCluster])
+async def message_clusters(
+    window: str = Query("1h", description="Janela a partir de agora: 30m, 1h, 24h (ignorada se since for informado)"),
+    since: Optional[str] = Query(None, description="Timestamp inicial (inclusive)"),
+    until: Optional[str] = Query(None, description="Timestamp final (inclusive)"),
+    country_id: Optional[int] = None,
+    min_size: int = Query(2, ge=2, description="Mínimo de mensagens no grupo"),
+    min_channels: int = Query(1, ge=1, description="Mínimo de canais distintos no grupo"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    # Grupos candidatos de mensagens quase iguais (MinHash/LSH), para montar alertas
+    if since is None:
+        try:
+            minutes = parse_window(window)
+        except StatsQueryError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        since = utc_timestamp(datetime.utcnow() - timedelta(minutes=minutes))
+    clusters = await run_db(find_clusters, since, until, country_id, min_size, min_channels)
+    return clusters[:limit]
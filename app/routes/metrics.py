@@ -0,0 +1,58 @@
+from typing import Any, Dict, List
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.cache import reference_cache
+from app.core.clustering import cluster_index
+from app.core.events import broker
+from app.core.metrics import request_counters, request_db_time, request_latency
+from app.core.profiling import profiler
+from app.database.connection import pool
+from app.database.executor import db
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+def prometheus_gauges(prefix: str, values: Dict[str, Any]) -> List[str]:
+    # Só os valores numéricos dos stats() existentes viram gauges
+    lines = []
+    for name, value in sorted(values.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    return lines
+
+@router.get("", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    lines = []
+    lines.extend(request_latency.prometheus("http_request_duration_seconds", "route"))
+    lines.extend(request_db_time.prometheus("http_request_db_seconds", "route"))
+    lines.extend(request_counters.prometheus("http", "route"))
+    lines.extend(prometheus_gauges("db_pool", pool.stats()))
+    lines.extend(prometheus_gauges("db_executor", db.stats()))
+    lines.extend(prometheus_gauges("reference_cache", reference_cache.stats()))
+    lines.extend(prometheus_gauges("events", broker.stats()))
+    lines.extend(prometheus_gauges("clusters", cluster_index.stats()))
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@router.get("/latency")
+async def latency_histogram():
+    return request_latency.snapshot()
+
+@router.get("/db")
+async def db_time_histogram():
+    return {"db_time": request_db_time.snapshot(), "counters": request_counters.snapshot()}
+
+@router.get("/cache")
+async def cache_stats():
+    return reference_cache.stats()
+
+@router.get("/profiler")
+async def profiler_stats():
+    return profiler.stats()
+
+@router.get("/clusters")
+async def cluster_stats():
+    return cluster_index.stats()
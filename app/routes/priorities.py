@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
 import sqlite3
-from app.database.connection import create_connection
+from app.core.cache import cached_response, reference_cache
+from app.database.executor import run_db
 
 router = APIRouter(
     prefix="/priorities",
@@ -16,21 +17,13 @@ class PriorityResponse(BaseModel):
     id: int
     name: str
 
-@router.get("/get", response_model=List[PriorityResponse])
-def list_priorities():
-    conn = create_connection()
+def select_priorities(conn: sqlite3.Connection):
     cursor = conn.cursor()
+    cursor.execute("SELECT id, name FROM priorities;")
+    rows = cursor.fetchall()
+    return [{"id": row[0], "name": row[1]} for row in rows]
 
-    try:
-        cursor.execute("SELECT id, name FROM priorities;")
-        rows = cursor.fetchall()
-        return [{"id": row[0], "name": row[1]} for row in rows]
-    finally:
-        conn.close()
-
-@router.post("/create", response_model=PriorityResponse)
-def create_priority(priority: PriorityCreate):
-    conn = create_connection()
+def insert_priority(conn: sqlite3.Connection, priority: PriorityCreate):
     cursor = conn.cursor()
 
     try:
@@ -39,5 +32,13 @@ def create_priority(priority: PriorityCreate):
         return {"id": cursor.lastrowid, "name": priority.name}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Prioridade já cadastrada.")
-    finally:
-        conn.close()
\ No newline at end of file
+
+@router.get("/get", response_model=List[PriorityResponse])
+async def list_priorities(request: Request):
+    return await cached_response(request, "priorities", lambda: run_db(select_priorities))
+
+@router.post("/create", response_model=PriorityResponse)
+async def create_priority(priority: PriorityCreate):
+    created = await run_db(insert_priority, priority)
+    reference_cache.invalidate("priorities")
+    return created
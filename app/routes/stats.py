@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from app.core.stats import counters, current_minute
+from app.database.executor import run_db
+from app.database.stats import StatsQueryError, aggregate_minutes, load_minutes, parse_group_by, parse_window
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["Stats"]
+)
+
+
+async def sync_counters(topic: str):
+    ring = counters[topic]
+    since = ring.sync_from()
+    if since is not None:
+        rows = await run_db(load_minutes, topic, since)
+        ring.load(rows, since)
+
+
+async def window_counts(topic: str, window: str, group_by: Optional[str], filters: Dict[str, Optional[int]]) -> Dict[str, Any]:
+    try:
+        minutes = parse_window(window)
+        dimensions = parse_group_by(topic, group_by)
+    except StatsQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = {name: value for name, value in filters.items() if value is not None}
+    end = current_minute()
+    start = end - minutes + 1
+
+    ring = counters[topic]
+    await sync_counters(topic)
+    if ring.covers(start):
+        totals, source = ring.query(start, end, dimensions, filters), "memory"
+    else:
+        totals = await run_db(aggregate_minutes, topic, start, end, dimensions, filters)
+        source = "table"
+
+    # 0 na tabela de resumo = dimensão ausente
+    groups: List[Dict[str, Any]] = [
+        {**{name: value or None for name, value in zip(dimensions, key)}, "count": count}
+        for key, count in sorted(totals.items(), key=lambda item: -item[1])
+        if count
+    ]
+    return {
+        "window_minutes": minutes,
+        "since": datetime.fromtimestamp(start * 60, timezone.utc).isoformat(),
+        "until": datetime.fromtimestamp((end + 1) * 60, timezone.utc).isoformat(),
+        "group_by": dimensions,
+        "total": sum(group["count"] for group in groups),
+        "groups": groups,
+        "source": source,
+    }
+
+
+@router.get("/messages")
+async def message_stats(
+    window: str = Query("1h", description="Janela: 30m, 1h, 24h, 7d ou minutos"),
+    group_by: Optional[str] = Query(None, description="Dimensões separadas por vírgula: country, channel"),
+    country_id: Optional[int] = None,
+    channel_id: Optional[int] = None,
+):
+    return await window_counts("messages", window, group_by, {"country_id": country_id, "channel_id": channel_id})
+
+
+@router.get("/alerts")
+async def alert_stats(
+    window: str = Query("1h", description="Janela: 30m, 1h, 24h, 7d ou minutos"),
+    group_by: Optional[str] = Query(None, description="Dimensões separadas por vírgula: country, priority"),
+    country_id: Optional[int] = None,
+    priority_id: Optional[int] = None,
+):
+    return await window_counts("alerts", window, group_by, {"country_id": country_id, "priority_id": priority_id})
+
+
+@router.get("/counters")
+async def counter_stats():
+    return {topic: ring.stats() for topic, ring in counters.items()}
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Banco e arquivo de retenção temporários: precisam estar no ambiente antes de
+# qualquer import de app.* (DB_NAME e ARCHIVE_DIR são lidos no import)
+TMP_DIR = tempfile.mkdtemp(prefix="apinews-tests-")
+os.environ["DB_NAME"] = os.path.join(TMP_DIR, "test.db")
+os.environ["ARCHIVE_DIR"] = os.path.join(TMP_DIR, "archive")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    from app.database.connection import create_connection
+
+    conn = create_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def country(client) -> int:
+    return client.post("/countrys/create", json={"name": f"País {uuid.uuid4().hex[:8]}"}).json()["id"]
+
+
+@pytest.fixture
+def channel(client, country) -> int:
+    # Canal novo por teste: os testes compartilham o banco e filtram pelo canal
+    response = client.post("/channels/create", json={"link": f"https://t.me/s/{uuid.uuid4().hex}",
+                                                     "country_id": country})
+    return response.json()["id"]
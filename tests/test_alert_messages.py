@@ -0,0 +1,54 @@
+import random
+import sqlite3
+
+from app.database.migrations import backfill_alert_messages, parse_message_ids
+
+
+def test_parse_message_ids_formats():
+    assert parse_message_ids("[1, 2, 3]") == [1, 2, 3]
+    assert parse_message_ids("4,5") == [4, 5]
+    assert parse_message_ids("7") == [7]
+    assert parse_message_ids('["8", "x", null]') == [8]
+    assert parse_message_ids("") == []
+    assert parse_message_ids(None) == []
+
+
+def test_backfill_links_existing_alerts():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE alerts (id INTEGER PRIMARY KEY, message_ids TEXT)")
+    conn.execute("CREATE TABLE alert_messages (alert_id INTEGER, message_id INTEGER, PRIMARY KEY (alert_id, message_id))")
+    conn.executemany("INSERT INTO alerts (id, message_ids) VALUES (?, ?)",
+                     [(1, "[10, 11]"), (2, "11,12"), (3, None), (4, "[10, 10]")])
+    backfill_alert_messages(conn.cursor())
+    assert conn.execute("SELECT alert_id, message_id FROM alert_messages ORDER BY 1, 2").fetchall() == [
+        (1, 10), (1, 11), (2, 11), (2, 12), (4, 10)
+    ]
+    # instr() confundia 1 com 10/11/12; o join não
+    assert conn.execute("SELECT alert_id FROM alert_messages WHERE message_id = 1").fetchall() == []
+
+
+def test_created_alert_is_linked(client, channel, db):
+    message = client.post("/messages/create", json={"channel_id": channel, "text": "ligada"}).json()
+    alert = client.post("/alerts/create", json={"message_ids": [message["id"]], "title": "t"}).json()
+    assert db.execute("SELECT message_id FROM alert_messages WHERE alert_id = ?", (alert["id"],)).fetchall() == [
+        (message["id"],)
+    ]
+
+
+def test_filter_joins_through_alert_messages(client, channel, country):
+    priority = random.randint(10 ** 6, 10 ** 7)
+    linked = client.post("/messages/create", json={"channel_id": channel, "text": "com alerta"}).json()
+    client.post("/messages/create", json={"channel_id": channel, "text": "sem alerta"})
+    # Alerta com duas mensagens: a mensagem ligada aparece uma vez só
+    other = client.post("/messages/create", json={"channel_id": channel, "text": "outra ligada"}).json()
+    client.post("/alerts/create", json={"message_ids": [linked["id"], other["id"]], "title": "alerta",
+                                         "priority_id": priority})
+    client.post("/alerts/create", json={"message_ids": [linked["id"]], "title": "de novo",
+                                         "priority_id": priority})
+
+    found = client.get("/messages/get/filter", params={"priority_id": priority}).json()
+    assert sorted(m["id"] for m in found) == [linked["id"], other["id"]]
+
+    by_country = client.get("/messages/get/filter", params={"priority_id": priority, "country_id": country}).json()
+    assert sorted(m["id"] for m in by_country) == [linked["id"], other["id"]]
+    assert client.get("/messages/get/filter", params={"priority_id": priority, "country_id": country + 1000}).json() == []
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from app.functions.collect_messages import MessageBuffer
+
+
+def test_mixed_batch_reports_each_item(client, channel, db):
+    items = [
+        {"channel_id": channel, "text": "válida", "source_post_id": 1},
+        "não é objeto",
+        {"text": "sem canal"},
+        {"channel_id": 999999, "text": "canal inexistente"},
+        {"channel_id": channel, "text": "repetida", "source_post_id": 1},
+        {"channel_id": channel, "text": "outra válida", "source_post_id": 2},
+    ]
+    response = client.post("/messages/bulk", json=items)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["duplicates"], body["failed"]) == (2, 1, 3)
+
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(len(items)))
+    assert results[0]["id"] and not results[0]["duplicate"] and results[0]["error"] is None
+    assert results[1]["error"] and results[1]["id"] is None
+    assert results[2]["error"] and results[2]["id"] is None
+    assert results[3]["error"] == "Canal não encontrado."
+    # Duplicada dentro do próprio lote devolve o id da primeira
+    assert results[4] == {"index": 4, "id": results[0]["id"], "duplicate": True, "error": None}
+    assert results[5]["id"] > results[0]["id"]
+
+    stored = db.execute("SELECT id, text FROM messages WHERE channel_id = ? ORDER BY id", (channel,)).fetchall()
+    assert stored == [(results[0]["id"], "válida"), (results[5]["id"], "outra válida")]
+
+
+def test_ndjson_body(client, channel):
+    lines = "\n".join(json.dumps({"channel_id": channel, "text": f"linha {i}"}) for i in range(3))
+    response = client.post("/messages/bulk", content=lines + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 3
+
+
+def test_invalid_body_is_rejected(client):
+    assert client.post("/messages/bulk", content="{não é json",
+                       headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/messages/bulk", json={"channel_id": 1}).status_code == 400
+
+
+def test_empty_batch(client):
+    body = client.post("/messages/bulk", json=[]).json()
+    assert body == {"inserted": 0, "duplicates": 0, "failed": 0, "results": []}
+
+
+class FakeResponse:
+    status_code = 200
+    ok = True
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def json(self):
+        return {"inserted": self.size, "duplicates": 0, "failed": 0}
+
+
+class FakeSession:
+    def __init__(self):
+        self.batches = []
+
+    def post(self, url, json):
+        self.batches.append(len(json))
+        return FakeResponse(len(json))
+
+    def close(self):
+        pass
+
+
+def test_buffer_flushes_by_size_and_timer():
+    async def run():
+        session = FakeSession()
+        buffer = MessageBuffer(max_size=3, max_interval=0.1, session=session)
+        for _ in range(4):
+            await buffer.add({"text": "x"})
+        assert session.batches == [3]
+        # Sem novas mensagens, o timer envia o resto
+        await asyncio.sleep(0.3)
+        assert session.batches == [3, 1]
+        await buffer.add({"text": "y"})
+        await buffer.close()
+        return session.batches, buffer.sent
+
+    assert asyncio.run(run()) == ([3, 1, 1], 5)
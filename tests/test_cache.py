@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from app.core.cache import TTLCache
+
+
+def test_get_or_load_caches_value():
+    cache = TTLCache(ttl=60)
+    calls = []
+    loader = lambda: calls.append(1) or ["a"]
+    assert cache.get_or_load("channels", loader) == ["a"]
+    assert cache.get_or_load("channels", loader) == ["a"]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_load_overlapping_invalidation_is_not_cached():
+    cache = TTLCache(ttl=60)
+    versions = iter(["antigo", "novo"])
+
+    def loader():
+        value = next(versions)
+        # Uma escrita invalida o cache enquanto o load ainda está em andamento
+        if value == "antigo":
+            cache.invalidate("channels")
+        return value
+
+    # O valor lido é servido, mas não fica no cache
+    assert cache.get_or_load("channels:country:1", loader) == "antigo"
+    assert cache.get("channels:country:1") is None
+    assert cache.get_or_load("channels:country:1", loader) == "novo"
+    assert cache.get("channels:country:1").value == "novo"
+
+
+def test_invalidation_of_other_prefix_does_not_block_set():
+    cache = TTLCache(ttl=60)
+    generation = cache.generation("countrys")
+    cache.invalidate("channels")
+    cache.set("countrys", ["BR"], generation)
+    assert cache.get("countrys").value == ["BR"]
+
+
+def test_invalidate_by_prefix():
+    cache = TTLCache(ttl=60)
+    for key in ("channels", "channels:country:1", "channelsx", "countrys"):
+        cache.set(key, key)
+    cache.invalidate("channels")
+    assert [key for key in ("channels", "channels:country:1", "channelsx", "countrys") if cache.get(key)] == [
+        "channelsx", "countrys"
+    ]
+
+
+def test_ttl_and_lru():
+    cache = TTLCache(ttl=0.05, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    # "b" era o menos usado
+    assert cache.get("b") is None and cache.get("a").value == 1
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_cached_response_etag(client, country):
+    first = client.get("/channels/get")
+    etag = first.headers["ETag"]
+    assert client.get("/channels/get", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/channels/create", json={"link": f"https://t.me/s/{uuid.uuid4().hex}", "country_id": country})
+    changed = client.get("/channels/get", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
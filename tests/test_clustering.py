@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from app.core.clustering import ClusterIndex, normalize_text
+
+FLOOD = "Enchente atinge o centro de Porto Alegre e deixa milhares de desabrigados nesta manhã"
+FLOOD_REPOST = "URGENTE: enchente atinge o centro de Porto Alegre e deixa milhares de desabrigados nesta manhã https://t.me/x"
+FIRE = "Incêndio de grandes proporções destrói galpão industrial na zona norte de Manaus"
+FIRE_REPOST = "Incêndio de grandes proporções destrói galpão industrial na zona norte de Manaus hoje"
+TRAFFIC = "Trânsito lento na marginal após acidente envolvendo dois caminhões e uma moto"
+
+
+def stamp(minutes_ago: float = 0) -> str:
+    return (datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat()
+
+
+def add(index, message_id, text, channel_id=1, country_id=1, timestamp=None):
+    return index.add({"id": message_id, "channel_id": channel_id, "country_id": country_id,
+                      "timestamp": timestamp or stamp(), "text": text})
+
+
+def ids(clusters):
+    return sorted(cluster["message_ids"] for cluster in clusters)
+
+
+def test_normalize_text():
+    assert normalize_text("Atenção: ÁGUA subindo! https://t.me/x") == ["atencao", "agua", "subindo"]
+
+
+def test_near_duplicates_are_grouped():
+    index = ClusterIndex()
+    add(index, 1, FLOOD, channel_id=1)
+    add(index, 2, FIRE, channel_id=1)
+    add(index, 3, FLOOD_REPOST, channel_id=2)
+    add(index, 4, TRAFFIC, channel_id=3)
+    add(index, 5, FIRE_REPOST, channel_id=2)
+
+    clusters = index.clusters()
+    assert ids(clusters) == [[1, 3], [2, 5]]
+    assert clusters[0]["channel_ids"] == [1, 2]
+    assert index.stats()["clusters"] == 2
+    assert index.clusters(min_channels=3) == []
+
+
+def test_short_and_repeated_messages_are_skipped():
+    index = ClusterIndex()
+    assert not add(index, 1, "alerta de chuva")
+    assert add(index, 2, FLOOD)
+    assert not add(index, 2, FLOOD)
+    assert index.stats()["skipped"] == 2
+
+
+def test_components_merge_through_a_bridge():
+    index = ClusterIndex()
+    base = "chuva forte alaga ruas do bairro jardim america e moradores pedem ajuda"
+    add(index, 1, base)
+    add(index, 2, "alerta defesa civil " + base)
+    # Parecida com as duas: todas ficam num grupo só
+    add(index, 3, "alerta defesa civil " + base + " agora")
+    assert ids(index.clusters()) == [[1, 2, 3]]
+
+
+def test_filters_split_component():
+    index = ClusterIndex()
+    add(index, 1, FLOOD, timestamp=stamp(30), country_id=1)
+    add(index, 2, FLOOD_REPOST, timestamp=stamp(20), country_id=2)
+    add(index, 3, FLOOD + " agora", timestamp=stamp(10), country_id=1)
+    assert ids(index.clusters()) == [[1, 2, 3]]
+    assert ids(index.clusters(since=stamp(25))) == [[2, 3]]
+    assert ids(index.clusters(country_id=1)) == [[1, 3]]
+    assert index.clusters(since=stamp(25), country_id=1) == []
+    assert index.clusters(until=stamp(60)) == []
+
+
+def test_evicts_by_message_timestamp():
+    index = ClusterIndex(window_hours=1)
+    # Indexada agora, mas a mensagem é de duas horas atrás
+    add(index, 1, FLOOD, timestamp=stamp(120))
+    add(index, 2, FLOOD_REPOST, channel_id=2)
+    assert 1 not in index.entries
+    assert index.stats()["evicted"] == 1
+    assert index.entries[2].neighbors == set()
+    assert index.clusters() == []
+
+
+def test_eviction_cleans_neighbors_and_splits_component():
+    index = ClusterIndex(max_entries=3)
+    base = "chuva forte alaga ruas do bairro jardim america e moradores pedem ajuda"
+    add(index, 1, "alerta defesa civil " + base, timestamp=stamp(30))
+    add(index, 2, base, timestamp=stamp(20))
+    add(index, 3, "alerta defesa civil " + base + " agora", timestamp=stamp(10))
+    assert ids(index.clusters()) == [[1, 2, 3]]
+
+    # O limite tira a mais antiga (id 1); 2 e 3 continuam vizinhas
+    add(index, 4, TRAFFIC)
+    assert sorted(index.entries) == [2, 3, 4]
+    assert all(1 not in entry.neighbors for entry in index.entries.values())
+    assert ids(index.clusters()) == [[2, 3]]
+    assert index.stats()["clusters"] == 1
+
+
+def test_evicting_bridge_splits_component():
+    index = ClusterIndex(max_entries=3)
+    base = "chuva forte alaga ruas do bairro jardim america e moradores pedem ajuda"
+    add(index, 1, base, timestamp=stamp(20))
+    # A ponte tem o timestamp mais antigo, embora tenha sido indexada depois
+    add(index, 2, base + " urgente ajuda para familias desalojadas", timestamp=stamp(30))
+    add(index, 3, "defesa civil confirma: " + base + " urgente ajuda para familias desalojadas agora mesmo",
+        timestamp=stamp(10))
+    assert 3 not in index.entries[1].neighbors
+    assert ids(index.clusters()) == [[1, 2, 3]]
+
+    add(index, 4, TRAFFIC)
+    assert sorted(index.entries) == [1, 3, 4]
+    assert index.clusters() == []
+    assert index.stats()["clusters"] == 0
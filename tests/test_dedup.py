@@ -0,0 +1,68 @@
+import uuid
+
+from app.database.queries import message_content_hash, save_messages
+
+
+def create(client, channel: int, **fields) -> dict:
+    response = client.post("/messages/create", json={"channel_id": channel, **fields})
+    assert response.status_code == 200
+    return response.json()
+
+
+def count_rows(db, channel: int) -> int:
+    return db.execute("SELECT COUNT(*) FROM messages WHERE channel_id = ?", (channel,)).fetchone()[0]
+
+
+def test_content_hash_normalizes_whitespace():
+    assert message_content_hash("Chuva  forte\nem SP ") == message_content_hash("Chuva forte em SP")
+    assert message_content_hash("Chuva forte") != message_content_hash("chuva forte")
+    assert message_content_hash("   ") is None
+    assert message_content_hash(None) is None
+
+
+def test_same_post_id_is_inserted_once(client, channel, db):
+    first = create(client, channel, text="original", source_post_id=10)
+    # Texto editado no canal, mesmo post: continua sendo a mesma mensagem
+    again = create(client, channel, text="editado", source_post_id=10)
+    assert again["id"] == first["id"]
+    assert again["text"] == "original"
+    assert count_rows(db, channel) == 1
+
+
+def test_same_text_without_post_id_is_inserted_once(client, channel, db):
+    first = create(client, channel, text="Alerta de  enchente")
+    again = create(client, channel, text="Alerta de enchente\n")
+    assert again["id"] == first["id"]
+    assert count_rows(db, channel) == 1
+
+
+def test_media_only_messages_are_not_deduplicated(client, channel, db):
+    create(client, channel, images='["a.jpg"]')
+    create(client, channel, images='["a.jpg"]')
+    assert count_rows(db, channel) == 2
+
+
+def test_same_post_id_in_other_channel_is_kept(client, channel, country, db):
+    other = client.post("/channels/create", json={"link": f"https://t.me/s/{uuid.uuid4().hex}",
+                                                  "country_id": country}).json()["id"]
+    first = create(client, channel, text="mesmo post", source_post_id=5)
+    second = create(client, other, text="mesmo post", source_post_id=5)
+    assert first["id"] != second["id"]
+
+
+def test_save_messages_is_idempotent(db):
+    link = f"https://t.me/s/{uuid.uuid4().hex}"
+    batch = [
+        {"channel": link, "text": "um", "links": [], "post_id": 1},
+        {"channel": link, "text": "dois", "links": "[]", "post_id": 2},
+        {"channel": link, "text": "sem post", "links": []},
+    ]
+    saved = save_messages(batch)
+    assert saved["count"] == 3
+    assert saved["channels_created"] == 1
+
+    again = save_messages(batch)
+    assert again["count"] == 0
+    assert again["duplicates"] == 3
+    channel = db.execute("SELECT id FROM channels WHERE link = ?", (link,)).fetchone()[0]
+    assert sorted(row[0] for row in db.execute("SELECT id FROM messages WHERE channel_id = ?", (channel,))) == saved["ids"]
@@ -0,0 +1,97 @@
+import pytest
+
+from app.database import geo
+from app.database.geo import GeoQueryError, haversine_km, parse_coordinates, radius_boxes, split_antimeridian
+
+
+def test_parse_coordinates_formats():
+    assert parse_coordinates("-23.55, -46.63") == (-23.55, -46.63)
+    assert parse_coordinates("-23.55 -46.63") == (-23.55, -46.63)
+    assert parse_coordinates("-23.55;-46.63") == (-23.55, -46.63)
+    assert parse_coordinates("[-23.55, -46.63]") == (-23.55, -46.63)
+    assert parse_coordinates('{"lat": -23.55, "lng": -46.63}') == (-23.55, -46.63)
+    assert parse_coordinates('{"latitude": "-23.55", "longitude": "-46.63"}') == (-23.55, -46.63)
+    # GeoJSON usa [lon, lat]
+    assert parse_coordinates('{"type": "Point", "coordinates": [-46.63, -23.55]}') == (-23.55, -46.63)
+
+
+@pytest.mark.parametrize("value", [None, "", "  ", "sem coordenadas", "1, 2, 3", "91, 0", "0, 181", '{"lat": 1}'])
+def test_parse_coordinates_rejects_invalid(value):
+    assert parse_coordinates(value) is None
+
+
+def test_split_antimeridian():
+    assert split_antimeridian(-10, -20, 10, 20) == [(-10, -20, 10, 20)]
+    assert split_antimeridian(-10, 170, 10, -170) == [(-10, 170, 10, 180.0), (-10, -180.0, 10, -170)]
+    with pytest.raises(GeoQueryError):
+        split_antimeridian(10, 0, -10, 1)
+    with pytest.raises(GeoQueryError):
+        split_antimeridian(0, -181, 1, 0)
+
+
+def test_radius_boxes():
+    (min_lat, min_lon, max_lat, max_lon), = radius_boxes(0, 0, 111.19)
+    assert min_lat == pytest.approx(-1, abs=1e-3) and max_lat == pytest.approx(1, abs=1e-3)
+    assert min_lon == pytest.approx(-1, abs=1e-3) and max_lon == pytest.approx(1, abs=1e-3)
+
+    # Perto do antimeridiano: duas caixas
+    east, west = radius_boxes(0, 179.5, 111.19)
+    assert east[1] == pytest.approx(178.5, abs=1e-3) and east[3] == 180.0
+    assert west[1] == -180.0 and west[3] == pytest.approx(-179.5, abs=1e-3)
+
+    # Círculo que passa do polo: todas as longitudes
+    assert radius_boxes(89.5, 10, 200) == [(pytest.approx(87.7, abs=0.1), -180.0, 90.0, 180.0)]
+
+
+def test_haversine():
+    assert haversine_km(0, 0, 0, 0) == 0
+    assert haversine_km(0, 0, 0, 1) == pytest.approx(111.19, abs=0.01)
+    assert haversine_km(0, 179.9, 0, -179.9) == pytest.approx(22.24, abs=0.01)
+
+
+def create_alert(client, country, coordinates):
+    return client.post("/alerts/create", json={"message_ids": [], "title": "geo", "country_id": country,
+                                               "coordinates": coordinates}).json()["id"]
+
+
+def test_bbox_includes_point_on_edge(client, country):
+    # Coordenadas que não são representáveis exatamente em float32 (o rtree arredonda)
+    alert = create_alert(client, country, "-10.123456789, 20.987654321")
+    params = {"min_lat": -10.123456789, "min_lon": 20.987654321, "max_lat": -10.123456789,
+              "max_lon": 20.987654321, "country_id": country}
+    assert [a["id"] for a in client.get("/alerts/get/bbox", params=params).json()] == [alert]
+
+    # Um pouco fora da borda não entra, mesmo dentro da caixa arredondada do rtree
+    outside = {**params, "min_lat": -10.1234567, "max_lat": -10.1234567}
+    assert client.get("/alerts/get/bbox", params=outside).json() == []
+
+
+def test_bbox_across_antimeridian(client, country):
+    east = create_alert(client, country, "0, 179.5")
+    west = create_alert(client, country, "0, -179.5")
+    create_alert(client, country, "0, 0")
+    params = {"min_lat": -1, "min_lon": 179, "max_lat": 1, "max_lon": -179, "country_id": country}
+    assert sorted(a["id"] for a in client.get("/alerts/get/bbox", params=params).json()) == [east, west]
+
+
+def test_near_orders_by_distance(client, country):
+    far = create_alert(client, country, "0, 0.5")
+    near = create_alert(client, country, "0, 0.1")
+    create_alert(client, country, "0, 5")
+    found = client.get("/alerts/get/near", params={"lat": 0, "lon": 0, "radius_km": 100,
+                                                   "country_id": country}).json()
+    assert [a["id"] for a in found] == [near, far]
+    assert found[0]["distance_km"] == pytest.approx(11.119, abs=0.01)
+
+
+def test_near_rejects_too_many_candidates(client, country, monkeypatch):
+    for _ in range(3):
+        create_alert(client, country, "0, 0.1")
+    params = {"lat": 0, "lon": 0, "radius_km": 100, "country_id": country}
+
+    monkeypatch.setattr(geo, "MAX_NEAR_CANDIDATES", 2)
+    response = client.get("/alerts/get/near", params=params)
+    assert response.status_code == 400
+
+    monkeypatch.setattr(geo, "MAX_NEAR_CANDIDATES", 3)
+    assert len(client.get("/alerts/get/near", params=params).json()) == 3
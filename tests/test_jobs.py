@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from app.database import jobs
+from app.database.jobs import (
+    MEDIA_JOB_ORPHAN_TTL, claim_media_jobs, complete_media_job, enqueue_media_jobs, fail_media_job,
+    media_queue_stats, purge_waiting_jobs, requeue_dead_jobs
+)
+from app.database.migrations import migrate
+from app.database.queries import MESSAGE_INSERT_SQL, message_content_hash
+
+
+@pytest.fixture
+def conn(tmp_path):
+    # Banco próprio: claim_media_jobs pega qualquer job vencido da tabela
+    conn = sqlite3.connect(tmp_path / "jobs.db", isolation_level=None)
+    migrate(conn)
+    conn.execute("INSERT INTO channels (link) VALUES ('https://t.me/s/jobs')")
+    yield conn
+    conn.close()
+
+
+def enqueue(conn, post_id, media):
+    return enqueue_media_jobs(conn, 1, post_id, message_content_hash("texto"), media)
+
+
+def insert_message(conn, post_id, images=(), videos=()):
+    conn.execute(MESSAGE_INSERT_SQL, (1, "2025-01-15T10:00:00", "texto", "[]", json.dumps(list(images)),
+                                      json.dumps(list(videos)), post_id, message_content_hash("texto")))
+
+
+def status(conn, job_id):
+    return conn.execute("SELECT status, attempts FROM media_jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def job_id(ref):
+    return int(ref.split(":")[1])
+
+
+def test_jobs_wait_for_their_message(conn):
+    image, video = enqueue(conn, 7, [{"kind": "image", "url": "https://x/a.jpg"},
+                                     {"kind": "video", "url": "https://x/b.mp4"}])
+    assert status(conn, job_id(image)) == ("waiting", 0)
+    assert claim_media_jobs(conn, 10) == []
+
+    insert_message(conn, 7, images=[image], videos=[video])
+    assert status(conn, job_id(image)) == ("pending", 0)
+    assert status(conn, job_id(video)) == ("pending", 0)
+
+    claimed = claim_media_jobs(conn, 10)
+    assert sorted(job["id"] for job in claimed) == [job_id(image), job_id(video)]
+    assert all(job["attempts"] == 1 for job in claimed)
+    assert status(conn, job_id(image)) == ("running", 1)
+    # Em andamento com lease válido: não é pego de novo
+    assert claim_media_jobs(conn, 10) == []
+
+    by_kind = {job["kind"]: job for job in claimed}
+    assert complete_media_job(conn, by_kind["image"], "abc.jpg")
+    assert complete_media_job(conn, by_kind["video"], "def.mp4")
+    row = conn.execute("SELECT images, video FROM messages WHERE source_post_id = 7").fetchone()
+    assert [json.loads(value) for value in row] == [["abc.jpg"], ["def.mp4"]]
+    assert status(conn, job_id(image)) == ("done", 1)
+
+
+def test_duplicate_post_never_activates_its_jobs(conn):
+    insert_message(conn, 8)
+    ref, = enqueue(conn, 8, [{"kind": "image", "url": "https://x/c.jpg"}])
+    # A segunda inserção do mesmo post é ignorada, então o job nunca fica pronto
+    insert_message(conn, 8, images=[ref])
+    assert status(conn, job_id(ref)) == ("waiting", 0)
+    assert media_queue_stats(conn)["waiting"] == 1
+
+    assert purge_waiting_jobs(conn, ttl=3600) == 0
+    assert purge_waiting_jobs(conn, ttl=-1) == 1
+    assert status(conn, job_id(ref)) is None
+
+
+def test_failures_back_off_then_go_dead(conn, monkeypatch):
+    monkeypatch.setattr(jobs, "MEDIA_JOB_MAX_ATTEMPTS", 2)
+    ref, = enqueue(conn, 9, [{"kind": "image", "url": "https://x/d.jpg"}])
+    insert_message(conn, 9, images=[ref])
+
+    job, = claim_media_jobs(conn, 10)
+    assert fail_media_job(conn, job, "timeout") == "pending"
+    # Backoff: ainda não vence
+    assert claim_media_jobs(conn, 10) == []
+    conn.execute("UPDATE media_jobs SET next_attempt_at = 0 WHERE id = ?", (job["id"],))
+
+    job, = claim_media_jobs(conn, 10)
+    assert job["attempts"] == 2
+    assert fail_media_job(conn, job, "timeout") == "dead"
+    assert status(conn, job["id"]) == ("dead", 2)
+    # A referência pendente continua na mensagem para reprocessar
+    assert json.loads(conn.execute("SELECT images FROM messages WHERE source_post_id = 9").fetchone()[0]) == [ref]
+
+    assert requeue_dead_jobs(conn) == 1
+    assert status(conn, job["id"]) == ("pending", 0)
+
+
+def test_missing_message_defers_without_spending_attempt(conn):
+    ref, = enqueue(conn, 10, [{"kind": "image", "url": "https://x/e.jpg"}])
+    insert_message(conn, 10, images=[ref])
+    job, = claim_media_jobs(conn, 10)
+    assert job["attempts"] == 1
+    conn.execute("DELETE FROM messages WHERE source_post_id = 10")
+
+    assert complete_media_job(conn, job, "e.jpg") is False
+    assert status(conn, job["id"]) == ("pending", 0)
+    next_attempt, error = conn.execute("SELECT next_attempt_at, last_error FROM media_jobs WHERE id = ?",
+                                       (job["id"],)).fetchone()
+    assert next_attempt > time.time()
+    assert error == "mensagem não encontrada"
+
+    # Depois do TTL de órfão, desiste
+    stale = {**job, "created_at": time.time() - MEDIA_JOB_ORPHAN_TTL - 1}
+    assert complete_media_job(conn, stale, "e.jpg") is False
+    assert status(conn, job["id"])[0] == "dead"
+
+
+def test_expired_lease_is_reclaimed(conn):
+    ref, = enqueue(conn, 11, [{"kind": "image", "url": "https://x/f.jpg"}])
+    insert_message(conn, 11, images=[ref])
+    claim_media_jobs(conn, 10, lease=-1)
+    # Worker morreu com o job: o lease vencido devolve o job
+    job, = claim_media_jobs(conn, 10)
+    assert job["attempts"] == 2
@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+from app.database.migrations import MIGRATIONS, current_version, explain_hot_queries, migrate, pending_migrations
+
+# Esquema anterior ao motor de migrações (o initialize_database original)
+BASELINE_SCHEMA = """
+    CREATE TABLE countrys (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+    CREATE TABLE priorities (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE channels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        link TEXT NOT NULL UNIQUE,
+        country_id INTEGER,
+        FOREIGN KEY (country_id) REFERENCES countrys(id)
+    );
+    CREATE TABLE alert_categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel_id INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        text TEXT,
+        links TEXT,
+        images TEXT,
+        video TEXT,
+        FOREIGN KEY (channel_id) REFERENCES channels(id)
+    );
+    CREATE TABLE alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_ids TEXT,
+        priority_id INTEGER,
+        country_id INTEGER,
+        title TEXT,
+        short_description TEXT,
+        alert_body TEXT,
+        images TEXT,
+        video TEXT,
+        timestamp TEXT,
+        coordinates TEXT,
+        FOREIGN KEY (priority_id) REFERENCES alert_categories(id),
+        FOREIGN KEY (country_id) REFERENCES countrys(id)
+    );
+    INSERT INTO countrys (name) VALUES ('BR');
+    INSERT INTO channels (link, country_id) VALUES ('https://t.me/s/antigo', 1);
+    INSERT INTO messages (channel_id, timestamp, text) VALUES
+        (1, '2025-06-13T22:14:22.186161', 'Enchente no centro'),
+        (1, '2025-06-13T22:15:00', 'Trânsito parado');
+    INSERT INTO alerts (message_ids, priority_id, country_id, title, timestamp, coordinates) VALUES
+        ('[1, 2]', 1, 1, 'Enchente', '2025-06-13T22:20:00', '-23.55, -46.63'),
+        ('2', 1, 1, 'Trânsito', '2025-06-13T22:21:00', 'sem coordenadas');
+"""
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    conn = sqlite3.connect(tmp_path / "baseline.db", isolation_level=None)
+    conn.executescript(BASELINE_SCHEMA)
+    yield conn
+    conn.close()
+
+
+def tables(conn: sqlite3.Connection):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+
+
+def test_migrate_baseline_database(baseline):
+    applied = migrate(baseline)
+    assert [m["version"] for m in applied] == [version for version, _, _ in MIGRATIONS]
+    assert current_version(baseline) == MIGRATIONS[-1][0]
+    assert pending_migrations(baseline) == []
+
+    # Dados antigos preservados e tabelas derivadas preenchidas
+    assert baseline.execute("SELECT COUNT(*) FROM messages").fetchone() == (2,)
+    assert baseline.execute("SELECT alert_id, message_id FROM alert_messages ORDER BY 1, 2").fetchall() == [
+        (1, 1), (1, 2), (2, 2)
+    ]
+    assert baseline.execute("SELECT latitude, longitude FROM alerts ORDER BY id").fetchall() == [
+        (-23.55, -46.63), (None, None)
+    ]
+    assert baseline.execute("SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'enchente'").fetchall() == [(1,)]
+    assert baseline.execute("SELECT SUM(count) FROM stats_messages_minute").fetchone() == (2,)
+    assert {"idx_messages_channel_post", "alert_messages", "alerts_geo", "media_jobs"} <= tables(baseline)
+
+
+def test_migrate_is_idempotent(baseline):
+    migrate(baseline)
+    before = tables(baseline)
+    assert migrate(baseline) == []
+    assert tables(baseline) == before
+    assert baseline.execute("SELECT COUNT(*) FROM schema_version").fetchone() == (len(MIGRATIONS),)
+
+
+def test_dry_run_rolls_back(baseline):
+    before = tables(baseline)
+    applied = migrate(baseline, dry_run=True)
+    assert len(applied) == len(MIGRATIONS)
+    assert current_version(baseline) == 0
+    assert tables(baseline) - before == {"schema_version"}
+    assert [row[1] for row in baseline.execute("PRAGMA table_info(messages)")] == [
+        "id", "channel_id", "timestamp", "text", "links", "images", "video"
+    ]
+
+
+def test_failed_migration_rolls_back(baseline, monkeypatch):
+    def broken(cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("falhou no meio")
+
+    monkeypatch.setattr("app.database.migrations.MIGRATIONS", MIGRATIONS + [(MIGRATIONS[-1][0] + 1, "broken", broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(baseline)
+    assert current_version(baseline) == 0
+    assert "half_done" not in tables(baseline)
+
+
+def test_hot_queries_use_indexes(baseline):
+    migrate(baseline)
+    report = explain_hot_queries(baseline)
+    assert {name: result["full_scans"] for name, result in report.items() if result["full_scans"]} == {}
@@ -0,0 +1,51 @@
+import json
+
+
+def walk(client, path: str, after_id: int, limit: int):
+    # Segue X-Next-After-Id até a última página
+    pages = []
+    while True:
+        response = client.get(path, params={"after_id": after_id, "limit": limit})
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        next_after = response.headers.get("X-Next-After-Id")
+        if next_after is None:
+            return pages
+        after_id = int(next_after)
+
+
+def test_messages_keyset_pages(client, channel):
+    ids = [client.post("/messages/create", json={"channel_id": channel, "text": f"página {i}"}).json()["id"]
+           for i in range(5)]
+    pages = walk(client, "/messages/get", ids[0] - 1, 2)
+    assert pages == [ids[0:2], ids[2:4], ids[4:]]
+
+
+def test_exact_multiple_ends_with_empty_page(client, channel):
+    ids = [client.post("/messages/create", json={"channel_id": channel, "text": f"par {i}"}).json()["id"]
+           for i in range(4)]
+    assert walk(client, "/messages/get", ids[0] - 1, 2) == [ids[0:2], ids[2:4], []]
+
+
+def test_messages_stream_ndjson(client, channel):
+    ids = [client.post("/messages/create", json={"channel_id": channel, "text": f"stream {i}"}).json()["id"]
+           for i in range(3)]
+    response = client.get("/messages/get", params={"after_id": ids[0] - 1, "stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert rows[0]["text"] == "stream 0"
+
+    limited = client.get("/messages/get", params={"after_id": ids[0] - 1, "stream": True, "limit": 2})
+    assert len(limited.text.splitlines()) == 2
+
+
+def test_alerts_keyset_pages(client):
+    ids = [client.post("/alerts/create", json={"message_ids": [], "title": f"alerta {i}"}).json()["id"]
+           for i in range(3)]
+    assert walk(client, "/alerts/get", ids[0] - 1, 2) == [ids[0:2], ids[2:]]
+
+
+def test_page_size_is_bounded(client):
+    assert client.get("/messages/get", params={"limit": 0}).status_code == 422
+    assert client.get("/messages/get", params={"limit": 10 ** 6}).status_code == 422
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from app.database import retention
+from app.database.migrations import migrate
+from app.database.queries import utc_timestamp
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(retention, "MEDIA_IMAGE_PATH", str(tmp_path / "image"))
+    monkeypatch.setattr(retention, "MEDIA_VIDEO_PATH", str(tmp_path / "video"))
+    os.makedirs(tmp_path / "image")
+    conn = sqlite3.connect(tmp_path / "retention.db", isolation_level=None)
+    migrate(conn)
+    conn.execute("INSERT INTO channels (link) VALUES ('https://t.me/s/arquivo')")
+    rows = [
+        (1, "2020-01-05T10:00:00", "enchente antiga", '["velha.jpg", "comum.jpg"]'),
+        (2, "2020-01-20T10:00:00", "deslizamento antigo", None),
+        (3, "2020-02-02T10:00:00", "seca antiga", None),
+        (4, utc_timestamp(), "notícia recente", '["comum.jpg"]'),
+    ]
+    conn.executemany("INSERT INTO messages (id, channel_id, timestamp, text, images) VALUES (?, 1, ?, ?, ?)", rows)
+    conn.execute("INSERT INTO alerts (id, message_ids, title, timestamp) VALUES (1, '[1, 4]', 'a', ?)",
+                 (utc_timestamp(),))
+    conn.executemany("INSERT INTO alert_messages (alert_id, message_id) VALUES (1, ?)", [(1,), (4,)])
+    yield conn
+    conn.close()
+
+
+def fts_ids(conn, query):
+    return [row[0] for row in conn.execute("SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rowid",
+                                           (query,))]
+
+
+def test_archive_and_restore_round_trip(conn):
+    summary = retention.apply_retention(conn, days=30)
+    assert summary["months"] == {"2020-01": 2, "2020-02": 1}
+    assert summary["archived"] == 3
+    assert conn.execute("SELECT id FROM messages").fetchall() == [(4,)]
+    assert fts_ids(conn, "antiga OR antigo") == []
+    # Vínculo da mensagem arquivada sai junto com ela
+    assert conn.execute("SELECT message_id FROM alert_messages").fetchall() == [(4,)]
+    assert os.path.exists(retention.archive_path("2020-01"))
+    assert not os.path.exists(retention.archive_path("2020-01", compressed=False))
+
+    assert retention.restore_month(conn, "2020-01") == 2
+    assert conn.execute("SELECT id, timestamp, text FROM messages WHERE id < 4 ORDER BY id").fetchall() == [
+        (1, "2020-01-05T10:00:00", "enchente antiga"),
+        (2, "2020-01-20T10:00:00", "deslizamento antigo"),
+    ]
+    assert fts_ids(conn, "antiga OR antigo") == [1, 2]
+    assert conn.execute("SELECT message_id FROM alert_messages ORDER BY 1").fetchall() == [(1,), (4,)]
+    # Restaurar de novo não duplica
+    assert retention.restore_month(conn, "2020-01") == 0
+
+
+def test_dry_run_changes_nothing(conn):
+    summary = retention.apply_retention(conn, days=30, dry_run=True)
+    assert summary["months"] == {"2020-01": 2, "2020-02": 1}
+    assert conn.execute("SELECT COUNT(*) FROM messages").fetchone() == (4,)
+    assert not os.path.exists(retention.ARCHIVE_DIR)
+
+
+def test_media_is_kept_unless_deletion_is_requested(conn):
+    image_dir = retention.MEDIA_IMAGE_PATH
+    for name in ("velha.jpg", "comum.jpg"):
+        with open(os.path.join(image_dir, name), "wb") as f:
+            f.write(b"x")
+
+    summary = retention.apply_retention(conn, days=30)
+    assert summary["media_deleted"] == {"files": 0, "bytes": 0}
+    assert sorted(os.listdir(image_dir)) == ["comum.jpg", "velha.jpg"]
+
+
+def test_opt_in_media_deletion_keeps_hot_references(conn):
+    image_dir = retention.MEDIA_IMAGE_PATH
+    for name in ("velha.jpg", "comum.jpg"):
+        with open(os.path.join(image_dir, name), "wb") as f:
+            f.write(b"x")
+
+    summary = retention.apply_retention(conn, days=30, delete_media=True)
+    assert summary["media_deleted"] == {"files": 1, "bytes": 1}
+    # comum.jpg ainda é usada pela mensagem recente
+    assert os.listdir(image_dir) == ["comum.jpg"]
+
+
+def test_cutoff_is_a_utc_date():
+    assert retention.retention_cutoff(0) == datetime.utcnow().strftime("%Y-%m-%d")
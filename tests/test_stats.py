@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.stats import STATS_MAX_WINDOW_MINUTES, StatsQueryError, parse_window, rebuild_stats
+
+
+@pytest.fixture
+def non_utc_host(monkeypatch):
+    # datetime.now() local != UTC: era o que deslocava os baldes por minuto
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def message_total(client, channel: int, window: str) -> dict:
+    response = client.get("/stats/messages", params={"window": window, "channel_id": channel})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_parse_window():
+    assert parse_window("30m") == 30
+    assert parse_window("2h") == 120
+    assert parse_window("90") == 90
+    assert parse_window("1d") == 1440
+    for value in ("0m", "abc", "", f"{STATS_MAX_WINDOW_MINUTES + 1}"):
+        with pytest.raises(StatsQueryError):
+            parse_window(value)
+
+
+def test_window_above_retention_is_rejected(client):
+    assert client.get("/stats/messages", params={"window": "99999999d"}).status_code == 400
+
+
+def test_created_message_is_counted_in_window(client, channel, non_utc_host):
+    assert message_total(client, channel, "30m")["total"] == 0
+
+    created = client.post("/messages/create", json={"channel_id": channel, "text": "contagem"}).json()
+    # Gravado em UTC, não na hora local do servidor
+    stored = datetime.fromisoformat(created["timestamp"])
+    assert abs(stored - datetime.utcnow()) < timedelta(minutes=1)
+
+    recent = message_total(client, channel, "30m")
+    assert recent["total"] == 1
+    assert recent["source"] == "memory"
+    # Janela maior que o anel em memória: soma direto na tabela de resumo
+    wide = message_total(client, channel, "2d")
+    assert wide["total"] == 1
+    assert wide["source"] == "table"
+
+
+def test_rebuild_keeps_archived_minutes(client, channel, db):
+    client.post("/messages/create", json={"channel_id": channel, "text": "linha quente"})
+    # Minuto de 60 dias atrás cujas mensagens já foram arquivadas
+    old_minute = int(time.time() // 60) - 60 * 1440
+    db.execute("INSERT INTO stats_messages_minute (minute, country_id, channel_id, count) VALUES (?, 0, ?, 5)",
+               (old_minute, channel))
+    db.commit()
+
+    rebuild_stats(db, ["messages"], days=30)
+
+    archived = db.execute("SELECT count FROM stats_messages_minute WHERE minute = ? AND channel_id = ?",
+                          (old_minute, channel)).fetchone()
+    assert archived == (5,)
+    hot = db.execute("SELECT SUM(count) FROM stats_messages_minute WHERE minute > ? AND channel_id = ?",
+                     (old_minute, channel)).fetchone()
+    assert hot == (1,)
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.functions.collect_messages import FallbackRequired, fetch_messages_http
+from app.functions.telegram_html import parse_channel_html
+
+# Páginas t.me/s/<canal> salvas. Os valores esperados são os que os seletores
+# do fetch_messages() (Playwright) extraem das mesmas páginas.
+FIXTURES = Path(__file__).parent / "fixtures" / "telegram"
+CHANNEL_URL = "https://t.me/s/noticias"
+
+
+def load(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def collect(name: str):
+    # fetch_messages_http com a fixture na primeira página e páginas antigas vazias
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params.get("before"):
+            return httpx.Response(200, text=load("empty.html"))
+        return httpx.Response(200, text=load(name))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            # Com cursor não há corte por minutos, então datas antigas passam
+            return await fetch_messages_http(client, CHANNEL_URL, minutes=10, after_post_id=0)
+
+    return asyncio.run(run())
+
+
+def test_normal_page_blocks():
+    blocks = parse_channel_html(load("normal.html"))
+    assert [b["post_id"] for b in blocks] == [101, 102]
+    assert blocks[0]["post"] == "noticias/101"
+    assert blocks[0]["text"] == "Chuva forte em São Paulo & região\nDetalhes: https://example.com/chuva"
+    assert blocks[0]["datetime"] == "2025-01-15T10:30:00+00:00"
+    assert blocks[0]["photos"] == [] and blocks[0]["videos"] == []
+    assert blocks[1]["text"] == "Trânsito liberado na via principal."
+    assert blocks[1]["datetime"] == "2025-01-15T10:45:12+00:00"
+
+
+def test_normal_page_messages():
+    messages = collect("normal.html")
+    # Mais recente primeiro, como no Playwright
+    assert [m["post_id"] for m in messages] == [102, 101]
+    first = messages[1]
+    assert first["timestamp"] == "2025-01-15T10:30:00"
+    assert json.loads(first["links"]) == ["https://example.com/chuva"]
+    assert first["media"] == []
+
+
+def test_media_page_blocks():
+    blocks = parse_channel_html(load("media.html"))
+    assert [b["post_id"] for b in blocks] == [201, 203, 204]
+    # <img src> tem prioridade sobre o background-image do mesmo link
+    assert blocks[0]["photos"] == ["https://cdn4.telesco.pe/file/foto1.jpg",
+                                   "https://cdn4.telesco.pe/file/foto2-full.jpg"]
+    assert blocks[0]["text"] == "Fotos do incêndio"
+    assert blocks[1]["videos"] == [{"src": "https://cdn4.telesco.pe/file/video.mp4?token=abc", "poster": None}]
+    assert blocks[1]["datetime"] == "2025-01-15T11:05:00+00:00"
+    assert blocks[2]["text"] == ""
+
+
+def test_media_page_messages():
+    messages = {m["post_id"]: m for m in collect("media.html")}
+    assert messages[201]["media"] == [
+        {"kind": "image", "url": "https://cdn4.telesco.pe/file/foto1.jpg"},
+        {"kind": "image", "url": "https://cdn4.telesco.pe/file/foto2-full.jpg"},
+    ]
+    assert messages[203]["media"] == [{"kind": "video", "url": "https://cdn4.telesco.pe/file/video.mp4?token=abc"}]
+    assert json.loads(messages[203]["links"]) == ["https://example.com/video"]
+    # Vídeo que não é .mp4: só o poster entra, como imagem
+    assert messages[204]["media"] == [{"kind": "image", "url": "https://cdn4.telesco.pe/file/anim-poster.jpg"}]
+    assert messages[204]["timestamp"] == "2025-01-15T11:06:00"
+
+
+def test_forwarded_post():
+    blocks = parse_channel_html(load("forwarded.html"))
+    assert len(blocks) == 1
+    block = blocks[0]
+    assert block["post_id"] == 301
+    # Único ponto em que difere do Playwright: o texto citado da resposta
+    # (js-message_reply_text) vem antes no HTML e não é tomado como texto do post
+    assert block["text"] == "Atualização: ponte interditada\nFonte: https://example.org/ponte"
+    assert block["datetime"] == "2025-01-16T08:00:00+00:00"
+
+    message = collect("forwarded.html")[0]
+    assert json.loads(message["links"]) == ["https://example.org/ponte"]
+    assert message["timestamp"] == "2025-01-16T08:00:00"
+
+
+def test_changed_layout():
+    blocks = parse_channel_html(load("changed_layout.html"))
+    assert len(blocks) == 2
+    # Sem data-post e sem link de data: usa o primeiro <time> do bloco
+    assert blocks[0]["post_id"] is None
+    assert blocks[0]["datetime"] == "2025-01-17T09:15:00+00:00"
+    assert blocks[0]["text"] == "Post sem data-post nem link de data"
+    # data-post malformado e sem horário
+    assert blocks[1]["post"] == "noticias/abc"
+    assert blocks[1]["post_id"] is None
+    assert blocks[1]["datetime"] is None
+
+    # Bloco sem horário é ignorado, como no Playwright
+    messages = collect("changed_layout.html")
+    assert [m["text"] for m in messages] == ["Post sem data-post nem link de data"]
+
+
+def test_empty_page_requires_fallback():
+    assert parse_channel_html(load("empty.html")) == []
+    with pytest.raises(FallbackRequired):
+        collect("empty.html")